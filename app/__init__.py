@@ -1,17 +1,38 @@
+import logging
 from flask import Flask, jsonify
 from flask_cors import CORS
 from app.config import config
+from app.utils.json_provider import init_json
+from app.utils.compression import init_compression
+from app.utils.metrics import init_metrics
+
+logger = logging.getLogger(__name__)
 
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
+    logging.basicConfig(level=app.config['LOG_LEVEL'], format='%(asctime)s %(levelname)s [%(name)s] %(message)s')
+
     CORS(app, supports_credentials=True)
 
+    # Métricas por request y etapa (/api/metrics), Server-Timing y log de requests lentos.
+    # Se instala antes que la compresión para que su tiempo quede incluido.
+    init_metrics(app)
+
+    # JSON rápido (orjson) con soporte nativo de tipos numpy/pandas
+    init_json(app)
+
+    # Respuestas JSON grandes comprimidas con brotli/gzip (p. ej. /search, /alerts, /unique-brands)
+    init_compression(app)
+
+    from app.services.inventory_service import InventoryService
+    InventoryService.init_app(app)
+
     # Error handler global para excepciones no capturadas
     @app.errorhandler(Exception)
     def handle_exception(e):
-        print(f"Unhandled error: {type(e).__name__}: {e}")
+        logger.exception("Error no manejado: %s: %s", type(e).__name__, e)
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
     # Registro de Blueprints
@@ -1,12 +1,44 @@
 import os
+import tempfile
 
 class Config:
     """Configuración base de la aplicación."""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'seventeen_secret_key_2024'
     MAX_CONTENT_LENGTH = 250 * 1024 * 1024  # 250MB
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or '/tmp'
+    # Snapshots Feather de inventarios ya parseados (None, o SNAPSHOT_DIR=off en el entorno, desactiva la caché)
+    SNAPSHOT_DIR = None if os.environ.get('SNAPSHOT_DIR', '').lower() == 'off' else (
+        os.environ.get('SNAPSHOT_DIR') or os.path.join(UPLOAD_FOLDER, 'seventeen_snapshots'))
     SESSION_COOKIE_SAMESITE = 'Lax'
     SESSION_COOKIE_HTTPONLY = True
+    # 'memory': sesiones en el proceso (1 worker). 'shared': archivos Arrow en SHARED_STORE_DIR (varios workers)
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND') or 'memory'
+    SHARED_STORE_DIR = os.environ.get('SHARED_STORE_DIR') or os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'seventeen')
+    # Ciclo de vida de las sesiones: sin uso por más de TTL se descartan; si los datasets en memoria superan
+    # el presupuesto se liberan los de las sesiones menos usadas (0 = sin límite), bajándolos a SESSION_SPILL_DIR
+    SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS') or 2 * 3600)
+    SESSION_MEMORY_BUDGET_MB = int(os.environ.get('SESSION_MEMORY_BUDGET_MB') or 1024)
+    SESSION_SPILL_DIR = os.environ.get('SESSION_SPILL_DIR') or os.path.join(UPLOAD_FOLDER, 'seventeen_spill')
+    # Respuestas JSON desde este tamaño se comprimen (brotli o gzip, según Accept-Encoding)
+    COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES') or 1024)
+    # Caché LRU de consultas de /api/search y /api/export (filas ordenadas por combinación de filtros); 0 lo desactiva
+    QUERY_CACHE_ENTRIES = int(os.environ.get('QUERY_CACHE_ENTRIES') or 256)
+    QUERY_CACHE_MB = int(os.environ.get('QUERY_CACHE_MB') or 64)
+    # Límite superior (inclusive) de cada estado de stock y cortes ABC (% del valor acumulado)
+    STOCK_THRESHOLDS = {'critical': 5, 'low': 20, 'optimal': 100}
+    ABC_CUTOFFS = (80, 95)
+    # Threads por worker para uploads y exportaciones en segundo plano
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS') or 2)
+    # Procesos para parsear en paralelo las hojas de una carga masiva (varias tiendas)
+    BULK_PARSE_PROCESSES = int(os.environ.get('BULK_PARSE_PROCESSES') or os.cpu_count() or 1)
+    # Nivel de logging (DEBUG muestra el detalle por request y las columnas de cada archivo leído)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    # Requests más lentos que esto se registran con sus etapas; con PROFILE_SLOW_REQUESTS=1 también se
+    # muestrea su pila cada PROFILE_INTERVAL_MS y se registran las pilas más frecuentes
+    SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS') or 1.0)
+    PROFILE_SLOW_REQUESTS = os.environ.get('PROFILE_SLOW_REQUESTS', '').lower() in ('1', 'true', 'yes')
+    PROFILE_INTERVAL_MS = int(os.environ.get('PROFILE_INTERVAL_MS') or 5)
     DEBUG = False
     TESTING = False
 
@@ -1,47 +1,83 @@
-from flask import Blueprint, jsonify, request, session
+from functools import wraps
+from flask import Blueprint, jsonify, make_response, request, session
 from app.services.inventory_service import InventoryService
+from app.services.jobs import public_job
+from app.services.filter_index import FILTER_COLUMNS
+from app.services.sort_index import parse_sort
+from app.services.serializers import products_to_records
+from app.utils.json_provider import dumps_bytes, json_response
+from app.utils.metrics import metrics, stage, cache_access
+from app.services.exporter import EXPORT_FORMATS, iter_delimited, iter_file, remove_file, write_xlsx
 from app.utils.constants import *
 from datetime import datetime
+import os
+import logging
 import pandas as pd
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 @api_bp.errorhandler(Exception)
 def handle_api_error(e):
     """Captura excepciones no manejadas en endpoints de API."""
-    print(f"API Error: {type(e).__name__}: {e}")
+    logger.exception("Error en %s: %s: %s", request.path, type(e).__name__, e)
     return jsonify({'error': f'Error interno: {str(e)}'}), 500
 
 def check_data_loaded():
     """Helper para verificar datos."""
-    if 'user_id' not in session:
-        print(f"DEBUG: No user_id in session for request {request.path}")
-    else:
-        print(f"DEBUG: Session user_id: {session['user_id']} for request {request.path}")
-
     user_data = InventoryService.get_user_session()
     
     if user_data['inventory_data'] is None:
-        print(f"DEBUG: inventory_data is None for user {session.get('user_id')}")
+        logger.debug("Sesión %s sin inventario en %s: se carga el inventario por defecto", session.get('user_id'), request.path)
         InventoryService.load_default_inventory()
         if user_data['inventory_data'] is None:
-            print("DEBUG: Still None after load_default_inventory")
+            logger.debug("Sesión %s sigue sin inventario", session.get('user_id'))
             return jsonify({'error': 'No data loaded'}), 400
-    else:
-        print(f"DEBUG: Data found for user {session.get('user_id')}")
         
     return None
 
+def conditional(view):
+    """Lectura que depende solo de los datos de la sesión: su versión es el ETag (débil) de la respuesta.
+
+    Si el cliente ya tiene esa versión (If-None-Match) se responde 304 sin
+    ejecutar el endpoint. Con `Cache-Control: no-cache` el navegador revalida
+    siempre, así que un cambio de datos (nueva carga o delta) se ve de inmediato.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_data = InventoryService.get_user_session()
+        version = user_data['version']
+        if request.if_none_match:
+            cache_access('etag', version is not None and request.if_none_match.contains_weak(version))
+        if version is not None and request.if_none_match.contains_weak(version):
+            response = make_response('', 304)
+            response.set_etag(version, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        # Sin versión previa el endpoint pudo cargar el inventario por defecto; si la versión
+        # cambió mientras tanto (delta concurrente) la respuesta no se etiqueta
+        current = user_data['version']
+        if response.status_code == 200 and current is not None and version in (None, current):
+            response.set_etag(current, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
+
 @api_bp.route('/metadata')
+@conditional
 def get_metadata():
     user_data = InventoryService.get_user_session()
     return jsonify(user_data['metadata'])
 
 @api_bp.route('/health')
 def health_check():
-    user_data = InventoryService.get_user_session()
-    inventory_data = user_data['inventory_data']
+    # Sin crear sesión: las sondas no deben ocupar una entrada en el store
+    user_data = InventoryService.find_user_session()
+    inventory_data = user_data['inventory_data'] if user_data else None
     return jsonify({
         'status': 'ok',
         'timestamp': datetime.now().isoformat(),
@@ -50,6 +86,21 @@ def health_check():
         'total_products': len(inventory_data) if inventory_data is not None else 0
     })
 
+@api_bp.route('/memory')
+def memory_report():
+    """Memoria de la sesión actual y de todas las sesiones de este worker."""
+    user_data = InventoryService.get_user_session()
+    report = InventoryService.memory_report()
+    report['current'] = InventoryService.memory_footprint(user_data)
+    return jsonify(report)
+
+@api_bp.route('/metrics')
+def get_metrics():
+    """Métricas de este worker en formato de texto de Prometheus: requests, etapas (parse, análisis,
+    filtros, serialización), filas procesadas, hit rate de cachés y memoria de sesiones."""
+    from flask import Response
+    return Response(metrics.render(InventoryService.metric_gauges()), mimetype='text/plain; version=0.0.4')
+
 @api_bp.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -59,191 +110,168 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    # Obtener tamaño aproximado
-    file.seek(0, 2)
-    file_size = file.tell()
-    file.seek(0)
-    file_size_mb = round(file_size / (1024 * 1024), 2)
-    
+    # El parseo y el análisis corren en segundo plano: se responde apenas se recibe el archivo
     try:
-        rows, cols_or_error = InventoryService.process_app_upload(file, file.filename)
-
-        if rows is None:
-             return jsonify({'error': cols_or_error}), 400
-
-        # Pre-computar análisis para evitar race condition en peticiones paralelas
-        try:
-            InventoryService.get_analysis()
-        except Exception as e:
-            print(f"Warning: pre-analysis failed: {e}")
-
-        return jsonify({
-            'success': True,
-            'message': f'Cargados {rows:,} productos ({file_size_mb} MB)',
-            'columns': cols_or_error,
-            'total_rows': rows,
-            'file_size_mb': file_size_mb
-        })
-        
+        job = InventoryService.start_upload(file, file.filename)
     except MemoryError:
         return jsonify({'error': 'Archivo demasiado grande.'}), 507
     except Exception as e:
-        return jsonify({'error': f'Error procesando archivo: {str(e)}'}), 500
+        logger.warning("Error leyendo archivo subido: %s", e)
+        return jsonify({'error': f'Error leyendo el archivo: {str(e)}'}), 400
+    
+    return jsonify({'job_id': job['id'], 'status_url': f"{request.script_root}/api/jobs/{job['id']}"}), 202
+
+@api_bp.route('/upload/bulk', methods=['POST'])
+def upload_bulk():
+    """Carga masiva: varios archivos en `files` (Excel o zip); cada archivo u hoja es una tienda."""
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+    
+    try:
+        job = InventoryService.start_bulk_upload(files)
+    except Exception as e:
+        logger.warning("Error leyendo archivos subidos: %s", e)
+        return jsonify({'error': f'Error leyendo los archivos: {str(e)}'}), 400
+    
+    return jsonify({'job_id': job['id'], 'status_url': f"{request.script_root}/api/jobs/{job['id']}"}), 202
+
+@api_bp.route('/upload/delta', methods=['POST'])
+def upload_delta():
+    """Carga delta: Excel con solo las filas cambiadas (mismo layout), cruzadas por ID o SKU con el
+    inventario actual. En un inventario de varias tiendas, `store` indica la tienda del archivo."""
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'No file provided'}), 400
+
+    error = check_data_loaded()
+    if error: return error
+
+    try:
+        job = InventoryService.start_delta_upload(file, file.filename, request.form.get('store', '').strip())
+    except Exception as e:
+        logger.warning("Error leyendo archivo subido: %s", e)
+        return jsonify({'error': f'Error leyendo el archivo: {str(e)}'}), 400
+
+    return jsonify({'job_id': job['id'], 'status_url': f"{request.script_root}/api/jobs/{job['id']}"}), 202
+
+@api_bp.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Estado de un job en segundo plano: state, stage, progress (0-100), message, detail y result."""
+    job = InventoryService.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job no encontrado'}), 404
+    return jsonify(public_job(job))
+
+@api_bp.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    """Descarga el archivo de un job de exportación terminado (una sola vez: luego se borra)."""
+    from flask import Response
+    
+    job = InventoryService.get_job(job_id)
+    if job is None or job['kind'] != 'export':
+        return jsonify({'error': 'Job no encontrado'}), 404
+    if job['state'] != 'done':
+        return jsonify({'error': 'La exportación todavía no terminó'}), 409
+    result = job['result']
+    if not os.path.exists(result['_path']):
+        return jsonify({'error': 'El archivo ya fue descargado o expiró'}), 410
+    
+    _, mimetype = EXPORT_FORMATS[result['format']]
+    headers = {
+        'Content-Disposition': _attachment(result['filename']),
+        'Content-Length': str(os.path.getsize(result['_path']))
+    }
+    return Response(iter_file(result['_path']), mimetype=mimetype, headers=headers)
+
+def _summary_for_request():
+    """Resumen del dataset o, con ?store=, de esa tienda. Retorna (summary, store, respuesta de error)."""
+    store = request.args.get('store', '')
+    if store and not InventoryService.has_store(store):
+        if InventoryService.get_analysis() is None:
+            return None, store, (jsonify({'error': 'No data loaded'}), 400)
+        return None, store, (jsonify({'error': f'Tienda desconocida: {store}'}), 404)
+    summary = InventoryService.get_summary(store)
+    if summary is None:
+        return None, store, (jsonify({'error': 'No data loaded'}), 400)
+    return summary, store, None
 
 @api_bp.route('/kpis')
+@conditional
 def get_kpis():
     error = check_data_loaded()
     if error: return error
     
-    df = InventoryService.get_analysis()
-    
-    total_skus = len(df)
-    active_skus = len(df[df['_stock'] > 0])
-    total_stock = int(df['_stock'].sum())
-    total_value = float(df['_cost_t'].sum())
-    
-    out_of_stock = len(df[df['_stock'] == 0])
-    negative_stock = len(df[df['_stock'] < 0])
-    critical_stock = len(df[df['_stock'].between(1, 5)])
-    low_stock = len(df[df['_stock'].between(6, 20)])
-    overstock = len(df[df['_stock'] > 100])
-    
-    df_negative = df[df['_stock'] < 0]
-    
-    avg_margin_raw = df[df['margin_pct'] > 0]['margin_pct'].mean() if 'margin_pct' in df.columns else 0
-    avg_margin = float(avg_margin_raw) if pd.notna(avg_margin_raw) else 0
-    
-    return jsonify({
-        'total_skus': total_skus,
-        'active_skus': active_skus,
-        'inactive_skus': total_skus - active_skus,
-        'total_stock': total_stock,
-        'total_value': round(total_value, 2),
-        'avg_stock': round(total_stock / total_skus, 2) if total_skus > 0 else 0,
-        'avg_margin_pct': round(avg_margin, 2),
-        'diferencias_count': len(df_negative),
-        'diferencias_units': int(df_negative['_stock'].sum()),
-        'diferencias_value': float(df_negative['_cost_t'].sum()),
-        'alerts': {
-            'out_of_stock': out_of_stock,
-            'negative_stock': negative_stock,
-            'critical': critical_stock,
-            'low': low_stock,
-            'overstock': overstock,
-            'total_alerts': out_of_stock + negative_stock + critical_stock
-        }
-    })
+    summary, store, error = _summary_for_request()
+    if error: return error
+    return json_response(InventoryService.get_panel_json('kpis', store))
 
 @api_bp.route('/stock-status')
+@conditional
 def get_stock_status():
     error = check_data_loaded()
     if error: return error
-    df = InventoryService.get_analysis()
-    if df is None: return jsonify({'error': 'No data loaded'}), 400
-    
-    status_counts = df['stock_status'].value_counts().to_dict()
-    
-    status_map = {
-        'negative': {'label': 'Stock Negativo', 'color': '#dc2626', 'icon': '🔴'},
-        'out_of_stock': {'label': 'Sin Stock', 'color': '#f97316', 'icon': '🟠'},
-        'critical': {'label': 'Crítico (1-5)', 'color': '#eab308', 'icon': '🟡'},
-        'low': {'label': 'Bajo (6-20)', 'color': '#84cc16', 'icon': '🟢'},
-        'optimal': {'label': 'Óptimo (21-100)', 'color': '#22c55e', 'icon': '🟢'},
-        'overstock': {'label': 'Exceso (>100)', 'color': '#3b82f6', 'icon': '🔵'}
-    }
-    
-    result = []
-    for status, count in status_counts.items():
-        info = status_map.get(status, {'label': status, 'color': '#6b7280', 'icon': '⚫'})
-        result.append({
-            'status': status,
-            'label': info['label'],
-            'count': int(count),
-            'percentage': round(count / len(df) * 100, 1),
-            'color': info['color'],
-            'icon': info['icon']
-        })
-    
-    order = ['negative', 'out_of_stock', 'critical', 'low', 'optimal', 'overstock']
-    result.sort(key=lambda x: order.index(x['status']) if x['status'] in order else 99)
-    
-    return jsonify(result)
+    summary, store, error = _summary_for_request()
+    if error: return error
+    return json_response(InventoryService.get_panel_json('stock_status', store))
+
+# contains: subcadena (por defecto), prefix: Producto/SKU empiezan con q, sku: SKU exacto
+SEARCH_MATCH_MODES = ('contains', 'prefix', 'sku')
+
+DASHBOARD_PANELS = ('kpis', 'stock_status', 'categories', 'brands', 'suppliers', 'stores', 'top_products', 'alerts', 'metadata')
+
+@api_bp.route('/dashboard')
+@conditional
+def get_dashboard():
+    """Todos los paneles del dashboard en una respuesta. `panels=kpis,alerts,...` limita los incluidos y
+    `store=` los calcula para una sola tienda."""
+    panels = [p.strip() for p in request.args.get('panels', '').split(',') if p.strip()] or list(DASHBOARD_PANELS)
+    unknown = [p for p in panels if p not in DASHBOARD_PANELS]
+    if unknown:
+        return jsonify({'error': f"Paneles desconocidos: {', '.join(unknown)}"}), 400
+
+    error = check_data_loaded()
+    if error: return error
+    summary, store, error = _summary_for_request()
+    if error: return error
+
+    # Se arma el objeto con los paneles ya serializados (claves ordenadas, como jsonify).
+    # Paneles sin columna de origen (p. ej. sin Proveedor) se devuelven como null.
+    user_data = InventoryService.get_user_session()
+    parts = []
+    for panel in sorted(set(panels)):
+        body = dumps_bytes(user_data['metadata']) if panel == 'metadata' else InventoryService.get_panel_json(panel, store)
+        parts.append(b'"' + panel.encode() + b'":' + body)
+    return json_response(b'{' + b','.join(parts) + b'}')
 
 @api_bp.route('/search')
+@conditional
 def search_products():
     error = check_data_loaded()
     if error: return error
     
     query = request.args.get('q', '').lower()
-    status = request.args.get('status', '')
-    category = request.args.get('category', '')
-    brand = request.args.get('brand', '')
+    match = request.args.get('match', 'contains')
+    if match not in SEARCH_MATCH_MODES:
+        return jsonify({'error': f'match inválido: {match}'}), 400
+    filters = {param: request.args.get(param, '') for param in FILTER_COLUMNS}
     sort = request.args.get('sort', '')
     page = int(request.args.get('page', 1))
     limit = int(request.args.get('limit', 20))
     
     df = InventoryService.get_analysis()
     
-    # Filtrado (usando Pandas vectorizado para performance)
-    mask = pd.Series([True] * len(df))
-    
-    if query:
-        mask &= (
-            df[COL_PRODUCT].astype(str).str.lower().str.contains(query, na=False, regex=False) |
-            df[COL_SKU].astype(str).str.lower().str.contains(query, na=False, regex=False) |
-            df[COL_CATEGORY].astype(str).str.lower().str.contains(query, na=False, regex=False) |
-            df[COL_BRAND].astype(str).str.lower().str.contains(query, na=False, regex=False)
-        )
-    
-    if status:
-        mask &= (df['stock_status'] == status)
-    
-    if category:
-        mask &= (df[COL_CATEGORY].astype(str).str.lower() == category.lower())
-        
-    if brand:
-        if brand == 'SIN_MARCA':
-             mask &= (df[COL_BRAND].isna() | (df[COL_BRAND].astype(str).str.strip() == '') | (df[COL_BRAND].astype(str).str.lower() == 'nan'))
-        else:
-             mask &= (df[COL_BRAND].astype(str).str.lower() == brand.lower())
-
-    filtered = df[mask]
-    
-    # Ordenamiento
-    if sort:
-        sort_parts = [s.strip() for s in sort.split(',') if s.strip()]
-        sort_columns = []
-        sort_ascending = []
-        added_fecha_dt = False
-        
-        for s in sort_parts:
-            if s in ('date_desc', 'date_asc') and 'F. Creación' in filtered.columns:
-                if not added_fecha_dt:
-                    filtered = filtered.copy()
-                    filtered['_fecha_dt'] = pd.to_datetime(filtered['F. Creación'], dayfirst=True, errors='coerce')
-                    added_fecha_dt = True
-                sort_columns.append('_fecha_dt')
-                sort_ascending.append(s == 'date_asc')
-            elif s in ('stock_desc', 'stock_asc'):
-                sort_columns.append('_stock')
-                sort_ascending.append(s == 'stock_asc')
-            elif s in ('value_desc', 'value_asc'):
-                sort_columns.append('_cost_t')
-                sort_ascending.append(s == 'value_asc')
-        
-        if sort_columns:
-            if not added_fecha_dt:
-                filtered = filtered.copy() # Evitar SettingWithCopyWarning
-            filtered = filtered.sort_values(sort_columns, ascending=sort_ascending, na_position='last')
-            if added_fecha_dt:
-                filtered = filtered.drop(columns=['_fecha_dt'])
-    
-    # Paginación
-    total = len(filtered)
+    # Filtrado (índices de igualdad + índice de texto) y orden completo, en caché por consulta:
+    # las páginas siguientes son un corte de las mismas filas
+    sort_index = InventoryService.get_sort_index()
+    matched = InventoryService.query_rows(filters, query, match, parse_sort(sort, sort_index.keys))
     offset = (page - 1) * limit
-    paginated_df = filtered.iloc[offset:offset + limit]
+    rows = matched[offset:offset + limit]
+    total = len(matched)
+    paginated_df = df.iloc[rows]
     
-    results = [InventoryService.product_to_dict(row, include_price=True) for _, row in paginated_df.iterrows()]
+    with stage('records', len(rows)):
+        results = products_to_records(paginated_df, include_price=True)
     
     return jsonify({
         'results': results,
@@ -253,209 +281,138 @@ def search_products():
         'pages': (total + limit - 1) // limit
     })
 
-# Copiar el resto de endpoints (categories, brands, top-products, etc.)
-# ... Para brevedad, implementaremos los más importantes y los faltantes se pueden añadir igual
-# (En una implementación real migraríamos TODOS uno por uno)
+@api_bp.route('/facets')
+@conditional
+def get_facets():
+    """Conteos y valor por estado, categoría, marca, proveedor y tienda para la búsqueda y filtros actuales."""
+    error = check_data_loaded()
+    if error: return error
+    
+    query = request.args.get('q', '').lower()
+    match = request.args.get('match', 'contains')
+    if match not in SEARCH_MATCH_MODES:
+        return jsonify({'error': f'match inválido: {match}'}), 400
+    filters = {param: request.args.get(param, '') for param in FILTER_COLUMNS}
+    
+    return jsonify(InventoryService.get_facets(filters, query, match))
 
 @api_bp.route('/categories')
+@conditional
 def get_categories():
-    df = InventoryService.get_analysis()
-    if df is None: return jsonify({'error': 'No data loaded'}), 400
-    
-    if COL_CATEGORY not in df.columns: return jsonify({'error': 'Category column not found'}), 400
-    
-    cat_analysis = df.groupby(COL_CATEGORY).agg({
-        'ID': 'count', '_stock': 'sum', '_cost_t': 'sum'
-    }).reset_index()
-    
-    cat_analysis.columns = ['category', 'products', 'stock', 'value']
-    cat_analysis = cat_analysis.sort_values('value', ascending=False)
-    total_value = cat_analysis['value'].sum()
+    summary, store, error = _summary_for_request()
+    if error: return error
     
-    result = []
-    for _, row in cat_analysis.head(15).iterrows():
-        result.append({
-            'category': row['category'] if pd.notna(row['category']) else 'Sin Categoría',
-            'products': int(row['products']),
-            'stock': int(row['stock']),
-            'value': round(float(row['value']), 2),
-            'value_pct': round(row['value'] / total_value * 100, 1) if total_value > 0 else 0
-        })
-    return jsonify(result)
+    if summary['categories'] is None: return jsonify({'error': 'Category column not found'}), 400
+    return json_response(InventoryService.get_panel_json('categories', store))
 
 @api_bp.route('/brands')
+@conditional
 def get_brands():
-    df = InventoryService.get_analysis()
-    if df is None: return jsonify({'error': 'No data loaded'}), 400
-    
-    brand_analysis = df.groupby(COL_BRAND).agg({
-        'ID': 'count', '_stock': 'sum', '_cost_t': 'sum'
-    }).reset_index()
-    
-    brand_analysis.columns = ['brand', 'products', 'stock', 'value']
-    brand_analysis = brand_analysis.sort_values('value', ascending=False)
-    total_value = brand_analysis['value'].sum()
+    summary, store, error = _summary_for_request()
+    if error: return error
     
-    result = []
-    for _, row in brand_analysis.head(15).iterrows():
-        result.append({
-            'brand': row['brand'],
-            'products': int(row['products']),
-            'stock': int(row['stock']),
-            'value': round(float(row['value']), 2),
-            'value_pct': round(row['value'] / total_value * 100, 1) if total_value > 0 else 0
-        })
-    return jsonify(result)
+    if summary['brands'] is None: return jsonify({'error': 'Brand column not found'}), 400
+    return json_response(InventoryService.get_panel_json('brands', store))
 
 @api_bp.route('/unique-brands')
+@conditional
 def get_unique_brands():
     df = InventoryService.get_analysis()
     if df is None: return jsonify({'error': 'No data loaded'}), 400
     
-    category = request.args.get('category')
-    if category:
-        df = df[df[COL_CATEGORY].astype(str).str.lower() == category.lower()]
-        
-    unique_brands = df[COL_BRAND].unique()
-    cleaned_brands = sorted([str(b).strip() for b in unique_brands if pd.notna(b) and str(b).strip() != '' and str(b).lower() != 'nan'])
-    
-    mask_no_brand = df[COL_BRAND].isna() | (df[COL_BRAND].astype(str).str.strip() == '') | (df[COL_BRAND].astype(str).str.lower() == 'nan')
-    if mask_no_brand.any():
-        cleaned_brands.append('SIN_MARCA')
+    filter_index = InventoryService.get_filter_index()
+    if not filter_index.has('brand'):
+        return jsonify([])
+
+    # Marcas presentes en la categoría/tienda (o en todo el dataset), sin recorrer las columnas de texto
+    with stage('filter'):
+        rows = filter_index.select({'category': request.args.get('category', ''), 'store': request.args.get('store', '')})
+        cleaned_brands = filter_index.values('brand', rows)
         
     return jsonify(cleaned_brands)
 
 @api_bp.route('/suppliers')
+@conditional
 def get_suppliers():
-    df = InventoryService.get_analysis()
-    if df is None: return jsonify({'error': 'No data loaded'}), 400
-    
-    if COL_SUPPLIER not in df.columns: return jsonify({'error': 'Supplier column not found'}), 400
-    
-    supplier_analysis = df.groupby(COL_SUPPLIER).agg({
-        'ID': 'count', '_stock': 'sum', '_cost_t': 'sum'
-    }).reset_index()
+    summary, store, error = _summary_for_request()
+    if error: return error
     
-    supplier_analysis.columns = ['supplier', 'products', 'stock', 'value']
-    supplier_analysis = supplier_analysis.sort_values('value', ascending=False)
-    total_value = supplier_analysis['value'].sum()
+    if summary['suppliers'] is None: return jsonify({'error': 'Supplier column not found'}), 400
+    return json_response(InventoryService.get_panel_json('suppliers', store))
+
+@api_bp.route('/stores')
+@conditional
+def get_stores():
+    """Productos, stock y valor por tienda (solo datasets de carga masiva)."""
+    summary, store, error = _summary_for_request()
+    if error: return error
     
-    result = []
-    for _, row in supplier_analysis.head(15).iterrows():
-        if pd.notna(row['supplier']) and row['supplier'] != '':
-             result.append({
-                'supplier': row['supplier'],
-                'products': int(row['products']),
-                'stock': int(row['stock']),
-                'value': round(float(row['value']), 2),
-                'value_pct': round(row['value'] / total_value * 100, 1) if total_value > 0 else 0
-            })
-    return jsonify(result)
+    if summary['stores'] is None: return jsonify({'error': 'Store column not found'}), 400
+    return json_response(InventoryService.get_panel_json('stores', store))
 
 @api_bp.route('/alerts')
+@conditional
 def get_alerts():
-    df = InventoryService.get_analysis()
-    if df is None: return jsonify({'error': 'No data loaded'}), 400
-    
-    alerts_df = df[df['stock_status'].isin(['negative', 'out_of_stock', 'critical'])].copy()
-    alerts_df = alerts_df.sort_values('_cost_t', ascending=False).head(100)
-    
-    result = []
-    for _, row in alerts_df.iterrows():
-        result.append(InventoryService.product_to_dict(row, include_price=True))
-    return jsonify(result)
+    summary, store, error = _summary_for_request()
+    if error: return error
+    return json_response(InventoryService.get_panel_json('alerts', store))
 
 @api_bp.route('/top-products')
+@conditional
 def get_top_products():
-    df = InventoryService.get_analysis()
-    if df is None: return jsonify({'error': 'No data loaded'}), 400
-    
-    top_df = df[df['_stock'] > 0].sort_values('_cost_t', ascending=False).head(20)
-    result = [InventoryService.product_to_dict(row) for _, row in top_df.iterrows()]
-    return jsonify(result)
+    summary, store, error = _summary_for_request()
+    if error: return error
+    return json_response(InventoryService.get_panel_json('top_products', store))
+
+def _attachment(filename):
+    """Content-Disposition de descarga con nombre ASCII de respaldo y nombre UTF-8 (RFC 5987)."""
+    import unicodedata
+    from urllib.parse import quote
+    fallback = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii').replace('"', '') or 'export'
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
 
 @api_bp.route('/export')
 def export_excel():
-    """Exporta los datos filtrados a Excel."""
-    from flask import send_file
-    from io import BytesIO
+    """Exporta los datos filtrados (en el orden de `sort`) en streaming: format=xlsx (por defecto), csv o tsv;
+    async=1 la encola como job."""
+    from flask import Response, current_app, stream_with_context
     
     df = InventoryService.get_analysis()
     if df is None: return jsonify({'error': 'No data loaded'}), 400
     
     query = request.args.get('q', '').lower()
-    status = request.args.get('status', '')
-    category = request.args.get('category', '')
-    brand = request.args.get('brand', '')
-    
-    mask = pd.Series([True] * len(df))
-    
-    if query:
-        mask &= (
-            df[COL_PRODUCT].astype(str).str.lower().str.contains(query, na=False, regex=False) |
-            df[COL_SKU].astype(str).str.lower().str.contains(query, na=False, regex=False) |
-            df[COL_CATEGORY].astype(str).str.lower().str.contains(query, na=False, regex=False) |
-            df[COL_BRAND].astype(str).str.lower().str.contains(query, na=False, regex=False)
-        )
-    
-    if status:
-        mask &= (df['stock_status'] == status)
-    if category:
-        mask &= (df[COL_CATEGORY].astype(str).str.lower() == category.lower())
-    if brand:
-        if brand == 'SIN_MARCA':
-            mask &= (df[COL_BRAND].isna() | (df[COL_BRAND].astype(str).str.strip() == '') | (df[COL_BRAND].astype(str).str.lower() == 'nan'))
-        else:
-            mask &= (df[COL_BRAND].astype(str).str.lower() == brand.lower())
-    
-    filtered = df[mask]
-    
-    # Seleccionar columnas para exportar
-    export_cols = []
-    col_names = {}
-    
-    if 'F. Creación' in filtered.columns:
-        export_cols.append('F. Creación')
-        col_names['F. Creación'] = 'Fecha'
-    if COL_SKU in filtered.columns:
-        export_cols.append(COL_SKU)
-    if COL_PRODUCT in filtered.columns:
-        export_cols.append(COL_PRODUCT)
-    if COL_CATEGORY in filtered.columns:
-        export_cols.append(COL_CATEGORY)
-    if COL_BRAND in filtered.columns:
-        export_cols.append(COL_BRAND)
-    
-    export_cols.extend(['_stock', '_cost_u', '_cost_t', '_price'])
-    col_names.update({
-        '_stock': 'Stock',
-        '_cost_u': 'Costo Unitario',
-        '_cost_t': 'Costo Total',
-        '_price': 'Precio'
-    })
-    
-    if 'stock_status' in filtered.columns:
-        export_cols.append('stock_status')
-        col_names['stock_status'] = 'Estado'
-    
-    # Solo columnas que existen
-    export_cols = [c for c in export_cols if c in filtered.columns]
-    export_df = filtered[export_cols].copy()
-    export_df.rename(columns=col_names, inplace=True)
-    
-    # Generar Excel en memoria
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        export_df.to_excel(writer, index=False, sheet_name='Inventario')
-    output.seek(0)
+    match = request.args.get('match', 'contains')
+    if match not in SEARCH_MATCH_MODES:
+        return jsonify({'error': f'match inválido: {match}'}), 400
+    export_format = request.args.get('format', 'xlsx').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format inválido: {export_format}'}), 400
+    filters = {param: request.args.get(param, '') for param in FILTER_COLUMNS}
+    sort_keys = parse_sort(request.args.get('sort', ''), InventoryService.get_sort_index().keys)
+    
+    # Misma consulta que la tabla de /api/search: si ya se paginó, las filas salen del caché
+    rows = InventoryService.query_rows(filters, query, match, sort_keys)
     
     user_data = InventoryService.get_user_session()
     store_name = user_data.get('metadata', {}).get('store_name', 'inventario')
-    filename = f"{store_name}_export.xlsx"
     
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=filename
-    )
+    if request.args.get('async') == '1':
+        # Exportaciones grandes: se escriben en un job y se descargan desde /api/jobs/<id>/download
+        job = InventoryService.start_export(df, rows, export_format, store_name)
+        return jsonify({'job_id': job['id'], 'status_url': f"{request.script_root}/api/jobs/{job['id']}"}), 202
+    sep, mimetype = EXPORT_FORMATS[export_format]
+    headers = {'Content-Disposition': _attachment(f"{store_name}_export.{export_format}")}
+    
+    if sep is not None:
+        # CSV/TSV: se envía cada bloque apenas se genera, la descarga empieza de inmediato
+        return Response(stream_with_context(iter_delimited(df, rows, sep)), mimetype=mimetype, headers=headers)
+    
+    # .xlsx: el zip solo se puede cerrar al final, así que se escribe a un temporal (write-only)
+    # y se envía por bloques, sin armar el libro en memoria
+    with stage('export', len(rows)):
+        path = write_xlsx(df, rows, current_app.config.get('UPLOAD_FOLDER'))
+    headers['Content-Length'] = str(os.path.getsize(path))
+    response = Response(iter_file(path), mimetype=mimetype, headers=headers)
+    # Si la respuesta se cierra sin llegar a leerse, el temporal se borra igual
+    response.call_on_close(lambda: remove_file(path))
+    return response
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+from app.utils.constants import *
+
+# Representación compacta del análisis
+STOCK_STATUSES = ['negative', 'out_of_stock', 'critical', 'low', 'optimal', 'overstock']
+ABC_CLASSES = ['A', 'B', 'C']
+CATEGORY_MAX_RATIO = 0.5  # columnas de texto con <= 50% de valores distintos se guardan como category
+
+# Límites superiores (inclusive) de cada estado de stock y cortes ABC en % del valor acumulado
+DEFAULT_STOCK_THRESHOLDS = {'critical': 5, 'low': 20, 'optimal': 100}
+DEFAULT_ABC_CUTOFFS = (80, 95)
+
+# Columnas que agrega analyze_inventory (el resto son las del Excel, en su orden original)
+DERIVED_COLUMNS = ('_stock', '_cost_u', '_cost_t', '_price', '_created', 'stock_status', 'abc_class', 'margin', 'margin_pct')
+# Margen relativo alrededor de un corte ABC dentro del cual se reclasifica todo (redondeo de cumsum vs sum)
+ABC_BOUNDARY_EPS = 1e-9
+
+
+def classify_stock_status(stock, thresholds=DEFAULT_STOCK_THRESHOLDS):
+    """Estado de stock de cada fila como Categorical (np.select, sin bucles por fila)."""
+    stock = np.asarray(stock)
+    conditions = [
+        stock < 0,
+        stock == 0,
+        stock <= thresholds['critical'],
+        stock <= thresholds['low'],
+        stock <= thresholds['optimal'],
+    ]
+    codes = np.select(conditions, np.arange(len(conditions), dtype=np.int8), default=len(conditions))
+    return pd.Categorical.from_codes(codes.astype(np.int8), STOCK_STATUSES)
+
+
+def classify_abc(values, cutoffs=DEFAULT_ABC_CUTOFFS):
+    """Clase ABC por valor acumulado: orden descendente con argsort y corte con searchsorted."""
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(-values, kind='stable')
+    total = values.sum()
+    if total > 0:
+        cumulative_pct = np.cumsum(values[order]) / total * 100
+    else:
+        cumulative_pct = np.zeros(len(values))
+    # pct <= A -> 0, A < pct <= B -> 1, resto -> 2
+    sorted_codes = np.searchsorted(np.asarray(cutoffs, dtype=np.float64), cumulative_pct, side='left')
+    codes = np.empty(len(values), dtype=np.int8)
+    codes[order] = sorted_codes
+    return pd.Categorical.from_codes(codes, ABC_CLASSES)
+
+
+def update_abc(abc, values, changed, cutoffs=DEFAULT_ABC_CUTOFFS):
+    """Clase ABC tras cambiar el valor de las filas `changed`, sin reordenar todo el inventario.
+
+    Las filas cambiadas se ubican según el menor valor de A y de B entre las
+    filas sin cambios. El resultado vale solo si los cortes acumulados siguen
+    en el mismo lugar: todo A va antes que el resto en el orden de
+    classify_abc, el acumulado de A no pasa
+    el primer corte y el mejor producto fuera de A sí lo haría (igual para
+    A+B y el segundo corte). Retorna None cuando eso no se cumple y hay que
+    reclasificar con classify_abc.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.asarray(abc.codes, dtype=np.int8).copy()
+    if len(codes) < len(values):
+        codes = np.concatenate((codes, np.full(len(values) - len(codes), 2, dtype=np.int8)))
+    total = values.sum()
+    if total <= 0:
+        return None
+
+    unchanged = np.ones(len(values), dtype=bool)
+    unchanged[changed] = False
+    new_values = values[changed]
+    new_codes = np.full(len(new_values), 2, dtype=np.int8)
+    for code in (1, 0):
+        members = values[unchanged & (codes == code)]
+        if len(members):
+            new_codes[new_values >= members.min()] = code
+    codes[changed] = new_codes
+
+    for code, cutoff in enumerate(cutoffs):
+        inside = codes <= code
+        if not inside.any() or inside.all():
+            return None
+        inside_values = values[inside]
+        last_value, next_value = inside_values.min(), values[~inside].max()
+        if last_value < next_value:
+            return None
+        if last_value == next_value:
+            # Empate en el borde: el orden estable de classify_abc ubica primero la fila de menor posición
+            tied = values == last_value
+            if np.flatnonzero(tied & inside).max() > np.flatnonzero(tied & ~inside).min():
+                return None
+        limit = total * cutoff / 100
+        cumulative = inside_values.sum()
+        if cumulative > limit or cumulative + next_value <= limit:
+            return None
+        if min(abs(cumulative - limit), abs(cumulative + next_value - limit)) <= abs(limit) * ABC_BOUNDARY_EPS:
+            return None
+    return pd.Categorical.from_codes(codes, ABC_CLASSES)
+
+
+def _numeric_col(df, idx):
+    s = pd.to_numeric(df.iloc[:, idx], errors='coerce').fillna(0)
+    return s.replace([np.inf, -np.inf], 0)
+
+
+def analyze_inventory(inventory_data, stock_thresholds=DEFAULT_STOCK_THRESHOLDS, abc_cutoffs=DEFAULT_ABC_CUTOFFS):
+    """Genera el DataFrame de análisis (estado de stock, ABC y márgenes) a partir del inventario crudo."""
+    # Copia superficial: las columnas nuevas no tocan el frame original
+    df = inventory_data.copy(deep=False)
+
+    # Sanitizar columnas de Texto (por nombre; las numéricas se leen por posición IDX_...)
+    if COL_BRAND in df.columns:
+        df[COL_BRAND] = df[COL_BRAND].fillna('SIN MARCA').astype(str).replace(['nan', 'NaN', ''], 'SIN MARCA')
+
+    if COL_CATEGORY in df.columns:
+        df[COL_CATEGORY] = df[COL_CATEGORY].fillna('SIN CATEGORÍA').astype(str).replace(['nan', 'NaN', ''], 'SIN CATEGORÍA')
+
+    if COL_PRODUCT in df.columns:
+        df[COL_PRODUCT] = df[COL_PRODUCT].fillna('').astype(str).replace(['nan', 'NaN'], '')
+
+    if COL_SKU in df.columns:
+        df[COL_SKU] = df[COL_SKU].fillna('').astype(str).replace(['nan', 'NaN'], '')
+
+    df['_stock'] = _numeric_col(df, IDX_STOCK)
+    df['_cost_u'] = _numeric_col(df, IDX_COST_U)
+    df['_cost_t'] = _numeric_col(df, IDX_COST_T)
+    df['_price'] = _numeric_col(df, IDX_PRICE)
+
+    # Fecha de creación parseada una sola vez por dataset (orden por fecha y serialización)
+    if COL_CREATED in df.columns:
+        df['_created'] = pd.to_datetime(df[COL_CREATED], dayfirst=True, errors='coerce')
+
+    df['stock_status'] = classify_stock_status(df['_stock'].to_numpy(), stock_thresholds)
+    df['abc_class'] = classify_abc(df['_cost_t'].to_numpy(), abc_cutoffs)
+
+    price = df['_price'].to_numpy(dtype=np.float64)
+    margin = price - df['_cost_u'].to_numpy(dtype=np.float64)
+    df['margin'] = margin
+    # Evitar división por cero y NaNs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin_pct = np.where(price > 0, margin / price * 100, 0.0)
+    df['margin_pct'] = np.nan_to_num(margin_pct, nan=0.0, posinf=0.0, neginf=0.0)
+
+    return compact_frame(df)
+
+
+def compact_frame(df):
+    """Reduce la memoria del análisis: textos repetidos como category y enteros a int32."""
+    int32 = np.iinfo(np.int32)
+    for col in df.columns:
+        s = df[col]
+        if col in (COL_PRODUCT, COL_SKU) or isinstance(s.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_string_dtype(s.dtype):
+            if s.nunique() <= len(s) * CATEGORY_MAX_RATIO:
+                df[col] = s.astype('category')
+        elif pd.api.types.is_integer_dtype(s.dtype) and s.dtype.itemsize > 4:
+            if len(s) == 0 or (s.min() >= int32.min and s.max() <= int32.max):
+                df[col] = s.astype(np.int32)
+        elif col == '_stock' and (s % 1 == 0).all() and s.abs().max() <= int32.max:
+            df[col] = s.astype(np.int32)
+    return df
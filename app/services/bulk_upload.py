@@ -0,0 +1,122 @@
+import os
+import zipfile
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from app.utils.constants import *
+from app.services.excel_reader import read_inventory_excel, sheet_names
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+# Límite de lo que se descomprime de un zip (evita zip bombs)
+ZIP_MAX_UNCOMPRESSED = 1024 * 1024 * 1024
+
+
+def _store_label(name):
+    return os.path.splitext(os.path.basename(name))[0].strip() or 'Tienda'
+
+
+def extract_zip(path, directory):
+    """Extrae los Excel de un zip a temporales; retorna [(nombre_original, ruta)]."""
+    files = []
+    with zipfile.ZipFile(path) as zf:
+        members = [
+            info for info in zf.infolist()
+            if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+            and os.path.splitext(info.filename)[1].lower() in EXCEL_EXTENSIONS
+        ]
+        if sum(info.file_size for info in members) > ZIP_MAX_UNCOMPRESSED:
+            raise ValueError('el zip descomprimido supera 1 GB')
+        for info in members:
+            fd, target = tempfile.mkstemp(suffix=os.path.splitext(info.filename)[1].lower(), dir=directory)
+            with os.fdopen(fd, 'wb') as out, zf.open(info) as src:
+                while True:
+                    block = src.read(1024 * 1024)
+                    if not block:
+                        break
+                    out.write(block)
+            files.append((info.filename, target))
+    return files
+
+
+def plan_tasks(files):
+    """Una tarea por hoja: (tienda, ruta, extensión, hoja). Retorna (tareas, {tienda: error}).
+
+    Un libro con una sola hoja es una tienda con el nombre del archivo; en un
+    libro con varias hojas cada hoja es una tienda con el nombre de la hoja.
+    Los archivos que no se pueden abrir se omiten, igual que las hojas que no
+    se pueden parsear.
+    """
+    tasks, errors = [], {}
+    for name, path in files:
+        ext = os.path.splitext(name)[1].lower()
+        try:
+            with open(path, 'rb') as f:
+                sheets = sheet_names(f, ext)
+        except ValueError as e:
+            errors[_store_label(name)] = str(e)
+            continue
+        if len(sheets) == 1:
+            tasks.append((_store_label(name), path, ext, 0))
+        else:
+            tasks.extend((sheet.strip() or _store_label(name), path, ext, sheet) for sheet in sheets)
+
+    # Nombres de tienda repetidos (mismo archivo subido dos veces, hojas homónimas): sufijo " (n)"
+    seen = {}
+    unique = []
+    for store, path, ext, sheet in tasks:
+        seen[store] = seen.get(store, 0) + 1
+        unique.append((store if seen[store] == 1 else f"{store} ({seen[store]})", path, ext, sheet))
+    return unique, errors
+
+
+def _parse_task(path, ext, sheet):
+    """Se ejecuta en un proceso del pool: parsea una hoja y retorna (df, None) o (None, error)."""
+    try:
+        with open(path, 'rb') as f:
+            return read_inventory_excel(f, ext, sheet=sheet), None
+    except MemoryError:
+        return None, 'memoria insuficiente'
+    except Exception as e:
+        return None, str(e)
+
+
+def _mp_context():
+    # Los jobs corren en threads: fork desde un proceso con threads puede heredar locks tomados
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def parse_parallel(tasks, max_workers, progress=None):
+    """Parsea las hojas en un pool de procesos; retorna ({tienda: df}, {tienda: error}) en el orden de `tasks`."""
+    frames, errors = {}, {}
+    workers = max(1, min(max_workers, len(tasks)))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context()) as pool:
+        futures = {pool.submit(_parse_task, path, ext, sheet): store for store, path, ext, sheet in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            store = futures[future]
+            df, error = future.result()
+            if error is None:
+                frames[store] = df
+            else:
+                errors[store] = error
+            if progress:
+                progress(done, len(tasks), store)
+    order = [store for store, _, _, _ in tasks]
+    return {s: frames[s] for s in order if s in frames}, {s: errors[s] for s in order if s in errors}
+
+
+def merge_stores(frames):
+    """Une los inventarios de cada tienda en un solo dataset con la columna COL_STORE al final.
+
+    Las columnas se alinean por nombre con el orden de la primera tienda, así
+    las columnas numéricas que el análisis lee por posición no se desplazan.
+    """
+    parts = []
+    for store, df in frames.items():
+        df = df.copy(deep=False)
+        df[COL_STORE] = store
+        parts.append(df)
+    merged = pd.concat(parts, ignore_index=True, sort=False)
+    columns = [c for c in merged.columns if c != COL_STORE] + [COL_STORE]
+    return merged[columns]
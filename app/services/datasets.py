@@ -0,0 +1,117 @@
+import threading
+import weakref
+from contextlib import contextmanager
+
+
+class Dataset:
+    """Inventario analizado con su resumen e índices, identificado por el contenido de origen.
+
+    Es inmutable: las sesiones con el mismo archivo comparten la misma
+    instancia (mismos DataFrames, sin copias). Una sesión que modifica sus
+    datos (carga delta) arma frames nuevos y deja de apuntar al Dataset; las
+    columnas que no cambian siguen compartidas por el copy-on-write de pandas.
+    Los cachés internos que se llenan al primer uso (paneles codificados,
+    permutaciones de orden) producen el mismo valor para todas las sesiones.
+    """
+
+    def __init__(self, key, df, summary, search_index, filter_index, sort_index):
+        self.key = key
+        self.df = df
+        self.summary = summary
+        self.search_index = search_index
+        self.filter_index = filter_index
+        self.sort_index = sort_index
+
+    def attach(self, user_data):
+        """Apunta los campos de datos de una sesión a este dataset (sin copiar)."""
+        # La sesión guarda también el Dataset: es la referencia que lo mantiene en el registro
+        user_data['dataset'] = self
+        user_data['dataset_key'] = self.key
+        user_data['inventory_data'] = self.df
+        user_data['analysis_cache'] = self.df
+        user_data['summary'] = self.summary
+        user_data['search_index'] = self.search_index
+        user_data['filter_index'] = self.filter_index
+        user_data['sort_index'] = self.sort_index
+
+
+class DatasetRegistry:
+    """Datasets analizados del proceso por clave de contenido.
+
+    Las referencias son débiles: un dataset vive mientras alguna sesión lo use,
+    salvo los fijados con `pin` (el inventario por defecto), que se conservan
+    aunque no quede ninguna sesión.
+    """
+
+    def __init__(self):
+        self._datasets = weakref.WeakValueDictionary()
+        self._pinned = {}
+        self._lock = threading.Lock()
+        # built: análisis registrados; duplicated: análisis repetidos de un contenido ya registrado
+        self._counters = {'built': 0, 'duplicated': 0}
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            return self._datasets.get(key)
+
+    def add(self, dataset, pin=False):
+        """Registra `dataset`; si otra sesión ya registró la misma clave, retorna ese."""
+        with self._lock:
+            existing = self._datasets.get(dataset.key)
+            if existing is not None:
+                dataset = existing
+                self._counters['duplicated'] += 1
+            else:
+                self._datasets[dataset.key] = dataset
+                self._counters['built'] += 1
+            if pin:
+                self._pinned[dataset.key] = dataset
+            return dataset
+
+    def unpin(self, key):
+        """Deja de conservar `key`: vive solo mientras alguna sesión lo use."""
+        with self._lock:
+            self._pinned.pop(key, None)
+
+    def is_pinned(self, key):
+        with self._lock:
+            return key in self._pinned
+
+    def stats(self):
+        with self._lock:
+            return {'datasets': len(self._datasets), 'datasets_pinned': len(self._pinned), **self._counters}
+
+
+class KeyedLock:
+    """Un lock por clave (dataset o sesión), creado al pedirlo y descartado cuando nadie lo usa.
+
+    Da semántica single-flight con un double-check después de `hold`: los
+    pedidos concurrentes de una misma clave esperan al primero y reutilizan su
+    resultado, y claves distintas avanzan en paralelo.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, key):
+        with self._lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._locks)
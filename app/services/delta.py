@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from app.utils.constants import *
+from app.services.analysis import (
+    analyze_inventory, classify_abc, update_abc, compact_frame, DERIVED_COLUMNS,
+    DEFAULT_STOCK_THRESHOLDS, DEFAULT_ABC_CUTOFFS,
+)
+
+# Columnas que identifican un producto en una carga delta, en orden de preferencia
+KEY_COLUMNS = (COL_ID, COL_SKU)
+
+
+def _key_values(df, col):
+    s = df[col]
+    if col == COL_STORE:
+        return s.astype(str).str.strip().str.lower().to_numpy(dtype=object)
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        return s.to_numpy()
+    return s.astype(str).str.strip().to_numpy(dtype=object)
+
+
+def _key_index(df, columns):
+    arrays = [_key_values(df, col) for col in columns]
+    return pd.Index(arrays[0]) if len(arrays) == 1 else pd.MultiIndex.from_arrays(arrays)
+
+
+def match_key(df, delta):
+    """Columnas con las que se cruzan las filas del delta con el inventario ([Tienda,] ID o SKU).
+
+    Se usa la primera columna de KEY_COLUMNS que identifica una sola fila en el
+    inventario y no tiene vacíos en el delta.
+    """
+    scope = [COL_STORE] if COL_STORE in df.columns else []
+    for col in KEY_COLUMNS:
+        if col not in df.columns or col not in delta.columns:
+            continue
+        if df[col].isna().any() or delta[col].isna().any():
+            continue
+        if col == COL_SKU and ((df[col] == '').any() or (delta[col] == '').any()):
+            continue
+        if _key_index(df, scope + [col]).is_unique:
+            return scope + [col]
+    raise ValueError(f"ni {COL_ID} ni {COL_SKU} identifican un producto único en el inventario y en el delta")
+
+
+def _differs(old, new):
+    return not pd.Series(old.to_numpy(dtype=object)).equals(pd.Series(new.to_numpy(dtype=object)))
+
+
+def _assign(series, positions, values):
+    """Copia de `series` con `values` en `positions`; amplía categorías o dtype si hace falta."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        new_values = pd.Index(values.astype(object))
+        missing = new_values.dropna().unique().difference(categories, sort=False)
+        if len(missing):
+            categories = categories.append(missing)
+        codes = series.cat.codes.to_numpy().copy()
+        codes[positions] = categories.get_indexer(new_values)
+        return pd.Series(pd.Categorical.from_codes(codes, categories), index=series.index, name=series.name)
+
+    result = series.copy()
+    try:
+        result.iloc[positions] = values.to_numpy()
+    except (TypeError, ValueError):
+        # p. ej. stock con decimales en una columna int32: se amplía el dtype de toda la columna
+        numeric = pd.api.types.is_numeric_dtype(series.dtype) and pd.api.types.is_numeric_dtype(values.dtype)
+        result = series.astype(np.result_type(series.dtype, values.dtype) if numeric else object)
+        result.iloc[positions] = values.to_numpy()
+    return result
+
+
+def _append_rows(df, rows):
+    """`df` con `rows` agregadas al final; las columnas category conservan su dtype (categorías unidas)."""
+    df = df.copy(deep=False)
+    rows = rows.copy(deep=False)
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            missing = pd.Index(rows[col].astype(object)).dropna().unique().difference(s.cat.categories, sort=False)
+            if len(missing):
+                df[col] = s.cat.add_categories(missing)
+            rows[col] = rows[col].astype(object).astype(df[col].dtype)
+        elif isinstance(rows[col].dtype, pd.CategoricalDtype):
+            rows[col] = rows[col].astype(object)
+    return compact_frame(pd.concat([df, rows], ignore_index=True))
+
+
+def apply_delta(df, delta, stock_thresholds=DEFAULT_STOCK_THRESHOLDS, abc_cutoffs=DEFAULT_ABC_CUTOFFS):
+    """Aplica las filas cambiadas `delta` (mismo layout que el Excel completo) al inventario analizado `df`.
+
+    Las filas cuya clave (ver match_key) ya existe se reemplazan en su lugar y
+    las nuevas se agregan al final. Solo se analizan las filas del delta: el
+    estado de stock y los márgenes son por fila, y la clase ABC se actualiza
+    con update_abc, que reclasifica todo solo si se movieron los cortes.
+    `df` no se modifica.
+
+    Retorna un dict con el nuevo frame ('df'), las posiciones reemplazadas
+    ('updated') y agregadas ('added'), las filas anteriores de las reemplazadas
+    ('old_rows'), las columnas con algún valor distinto en las reemplazadas ('changed_columns'),
+    la clave usada ('key') y si se reclasificó todo el ABC ('abc_recomputed').
+    """
+    raw_columns = [c for c in df.columns if c not in DERIVED_COLUMNS]
+    missing = [c for c in raw_columns if c not in delta.columns]
+    if missing:
+        raise ValueError(f"faltan columnas del inventario: {', '.join(missing)}")
+    if len(delta) == 0:
+        raise ValueError("el archivo no tiene filas")
+
+    # Mismo orden de columnas que el inventario: el análisis lee las numéricas por posición
+    changes = analyze_inventory(delta[raw_columns], stock_thresholds, abc_cutoffs)
+    key = match_key(df, changes)
+    changes = changes[~_key_index(changes, key).duplicated(keep='last')].reset_index(drop=True)
+
+    positions = _key_index(df, key).get_indexer(_key_index(changes, key))
+    existing = positions >= 0
+    updated = positions[existing]
+    replacements = changes[existing]
+
+    out = df.copy(deep=False)
+    changed_columns = set()
+    for col in df.columns:
+        if col == 'abc_class' or col not in changes.columns:
+            continue
+        if _differs(df[col].iloc[updated], replacements[col]):
+            changed_columns.add(col)
+            out[col] = _assign(out[col], updated, replacements[col])
+
+    added = np.arange(len(df), len(df) + int((~existing).sum()))
+    if len(added):
+        out = _append_rows(out, changes[~existing])
+
+    abc_recomputed = False
+    if '_cost_t' in changed_columns or len(added):
+        changed_rows = np.concatenate((updated, added))
+        abc = update_abc(df['abc_class'].array, out['_cost_t'].to_numpy(), changed_rows, abc_cutoffs)
+        if abc is None:
+            abc = classify_abc(out['_cost_t'].to_numpy(), abc_cutoffs)
+            abc_recomputed = True
+        out['abc_class'] = abc
+
+    return {
+        'df': out,
+        'updated': updated,
+        'added': added,
+        'old_rows': df.iloc[updated],
+        'changed_columns': changed_columns,
+        'key': key,
+        'abc_recomputed': abc_recomputed,
+    }
@@ -0,0 +1,306 @@
+import logging
+from itertools import chain, islice, repeat
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Filas candidatas a encabezado, en orden de preferencia (fila 0 suele ser el título del reporte)
+HEADER_CANDIDATES = (1, 0, 2)
+MIN_COLUMNS = 10
+
+# Filas acumuladas antes de convertirlas a columnas tipadas
+CHUNK_ROWS = 20000
+
+# Textos que pandas.read_excel interpreta como nulos por defecto
+NA_STRINGS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+NA_VALUES = NA_STRINGS | {None}
+# Celdas con error: openpyxl (values_only) las entrega como texto y pandas.read_excel como nulo
+EXCEL_ERRORS = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'}
+NA_VALUES |= EXCEL_ERRORS
+# Textos que el parser de pandas convierte a bool (true_values/false_values por defecto)
+BOOL_STRINGS = {'True', 'TRUE', 'true', 'False', 'FALSE', 'false'}
+
+# Firmas de archivo: .xlsx es un zip, .xls es un documento OLE2
+_XLSX_MAGIC = b'PK\x03\x04'
+_XLS_MAGIC = b'\xd0\xcf\x11\xe0'
+
+
+def detect_engine(source, ext):
+    """Elige el engine por la firma del archivo y, si no se reconoce, por la extensión."""
+    source.seek(0)
+    head = source.read(8)
+    source.seek(0)
+    if head.startswith(_XLSX_MAGIC):
+        return 'openpyxl'
+    if head.startswith(_XLS_MAGIC):
+        return 'xlrd'
+    return 'openpyxl' if ext in ('.xlsx', '') else 'xlrd'
+
+
+def _non_empty(row):
+    return [v for v in row if v is not None and str(v).strip() != '']
+
+
+def _looks_like_header(row):
+    """Un encabezado tiene al menos MIN_COLUMNS celdas y todas son texto."""
+    cells = _non_empty(row)
+    return len(cells) >= MIN_COLUMNS and all(isinstance(v, str) for v in cells)
+
+
+def sniff_header_row(rows):
+    """Elige la fila de encabezado a partir de las primeras filas del libro.
+
+    Prefiere la primera fila candidata que parezca encabezado; si ninguna lo
+    parece, usa la primera con suficientes columnas y datos debajo (el mismo
+    criterio que el antiguo reintento con `skiprows`).
+    """
+    width = max((len(r) for r in rows), default=0)
+    with_data = [i for i in HEADER_CANDIDATES if i + 1 < len(rows)]
+
+    for i in with_data:
+        if _looks_like_header(rows[i]):
+            return i
+    if width >= MIN_COLUMNS and with_data:
+        return with_data[0]
+    raise ValueError(f"solo {width} columnas o {max(len(rows) - 1, 0)} filas en las primeras filas")
+
+
+def _column_names(header):
+    """Nombres de columna como los genera pandas: 'Unnamed: i' para vacíos y sufijos '.n' para duplicados."""
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = str(value).strip() if value is not None and str(value).strip() != '' else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _typed_chunk(values):
+    """Columna de un bloque en la forma más compacta que conserva sus valores: (tipo, datos).
+
+    'int'/'float': solo números; 'text': texto que no parece número ni booleano;
+    'datetime': solo fechas; 'na': vacía (datos = cantidad de filas); 'raw': el
+    resto (tipos mezclados, booleanos, textos numéricos), tal cual. El dtype de
+    la columna se decide en _ColumnBuilder con todos los bloques.
+    """
+    s = pd.Series(values)
+    if s.dtype == object or isinstance(s.dtype, pd.StringDtype):
+        s = s.mask(s.isin(NA_VALUES))
+        if s.isna().all():
+            return 'na', len(s)
+        s = s.infer_objects()
+        if isinstance(s.dtype, pd.StringDtype):
+            text = s.dropna()
+            # Un texto así hace fallar la conversión a número y a bool de pandas en toda la columna
+            if (pd.to_numeric(text, errors='coerce').isna() & ~text.isin(BOOL_STRINGS)).any():
+                return 'text', s
+        if s.dtype.kind not in 'iM':
+            return 'raw', np.array(values, dtype=object)
+    if s.dtype == np.float64:
+        values = s.to_numpy()
+        # pandas.read_excel lee como int los números enteros de la celda
+        if not np.isnan(values).any() and (values % 1 == 0).all():
+            return 'int', values.astype(np.int64)
+        return 'float', values
+    if s.dtype == np.int64:
+        return 'int', s.to_numpy()
+    if s.dtype.kind == 'M':
+        return 'datetime', s
+    return 'raw', np.array(values, dtype=object)
+
+
+def _raw_values(kind, data):
+    """Valores de un bloque como los entrega el lector de pandas a su parser ('' para celdas vacías)."""
+    if kind == 'na':
+        return np.full(data, '', dtype=object)
+    if kind in ('int', 'float'):
+        out = data.astype(object)
+        if kind == 'float':
+            whole = np.isfinite(data) & (data % 1 == 0)
+            out[whole] = data[whole].astype(np.int64).astype(object)
+            out[np.isnan(data)] = ''
+        return out
+    if kind == 'text':
+        return data.to_numpy(dtype=object, na_value='')
+    if kind == 'datetime':
+        out = data.dt.to_pydatetime().astype(object)
+        out[data.isna().to_numpy()] = ''
+        return out
+    out = data.copy()
+    out[pd.isna(out)] = ''
+    out[np.isin(out, list(EXCEL_ERRORS))] = np.nan
+    return out
+
+
+def _parse_column(values):
+    """Tipos de una columna con el mismo parser que usa pandas.read_excel."""
+    from pandas.io.parsers import TextParser
+    return TextParser([[v] for v in values], header=None, skip_blank_lines=False).read().iloc[:, 0]
+
+
+class _ColumnBuilder:
+    """Acumula bloques compactos por columna para no materializar nunca la hoja completa como objetos.
+
+    El dtype de cada columna se decide una sola vez con todos sus bloques, con
+    el resultado de pandas.read_excel: enteros con vacíos pasan a float64, una
+    columna de fechas queda datetime64 y las mezclas se resuelven con su parser.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.chunks = [[] for _ in self.names]
+        self.n_rows = 0
+
+    def add_rows(self, rows):
+        width = max(len(r) for r in rows)
+        if width > len(self.names):
+            for i in range(len(self.names), width):
+                self.names.append(f"Unnamed: {i}")
+                # Columnas que aparecen tarde: los bloques anteriores quedan vacíos
+                self.chunks.append([('na', self.n_rows)] if self.n_rows else [])
+        padded = [r + (None,) * (width - len(r)) for r in rows] if any(len(r) < width for r in rows) else rows
+        columns = list(zip(*padded))
+        for i in range(len(self.names)):
+            self.chunks[i].append(_typed_chunk(columns[i]) if i < width else ('na', len(rows)))
+        self.n_rows += len(rows)
+
+    def _concat(self, chunks):
+        kinds = {kind for kind, _ in chunks if kind != 'na'}
+        if kinds <= {'int', 'float'}:
+            if kinds == {'int'} and all(kind == 'int' for kind, _ in chunks):
+                return pd.Series(np.concatenate([data for _, data in chunks]))
+            return pd.Series(np.concatenate([np.full(data, np.nan) if kind == 'na' else data.astype(np.float64)
+                                             for kind, data in chunks]) if chunks else np.empty(0))
+        if len(kinds) == 1 and kinds <= {'text', 'datetime'}:
+            dtype = next(data for kind, data in chunks if kind != 'na').dtype
+            parts = [pd.Series(None, index=range(data), dtype=dtype) if kind == 'na' else data for kind, data in chunks]
+            return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+        # Tipos mezclados entre bloques: se resuelve con el parser de pandas sobre la columna completa
+        return _parse_column(np.concatenate([_raw_values(kind, data) for kind, data in chunks]))
+
+    def to_frame(self):
+        data = {}
+        for i, name in enumerate(self.names):
+            data[name] = self._concat(self.chunks[i])
+            self.chunks[i] = None  # liberar los bloques a medida que se concatenan
+        return pd.DataFrame(data)
+
+
+def _data_rows(rows):
+    """Filas de datos como las toma pandas.read_excel: las vacías intermedias se conservan, las del final no."""
+    blank = 0
+    for row in rows:
+        if all(v is None for v in row):
+            blank += 1
+            continue
+        if blank:
+            yield from repeat((), blank)
+            blank = 0
+        yield row
+
+
+def _read_openpyxl(source, progress=None, sheet=0):
+    """Recorre la primera hoja en modo read-only: detecta el encabezado con las primeras filas y
+    construye las columnas por bloques de CHUNK_ROWS filas."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = wb.worksheets[sheet] if isinstance(sheet, int) else wb[sheet]
+        # Dimensión declarada en el libro (puede faltar): solo sirve para estimar el avance
+        total_rows = sheet.max_row
+        rows = sheet.iter_rows(values_only=True)
+        head = list(islice(rows, max(HEADER_CANDIDATES) + 2))
+        header_row = sniff_header_row([list(r) for r in head])
+
+        builder = _ColumnBuilder(_column_names(head[header_row]))
+        rows = _data_rows(chain(head[header_row + 1:], rows))
+        while True:
+            chunk = list(islice(rows, CHUNK_ROWS))
+            if not chunk:
+                break
+            builder.add_rows(chunk)
+            if progress:
+                progress(builder.n_rows, total_rows)
+    finally:
+        wb.close()
+    return builder.to_frame(), header_row
+
+
+def _read_xlrd(source, sheet=0):
+    """Libros .xls: xlrd carga el archivo completo, así que solo se evita el reintento."""
+    import xlrd
+
+    source.seek(0)
+    book = xlrd.open_workbook(file_contents=source.read(), on_demand=True)
+    try:
+        ws = book.sheet_by_index(sheet) if isinstance(sheet, int) else book.sheet_by_name(sheet)
+        head = [ws.row_values(i) for i in range(min(max(HEADER_CANDIDATES) + 2, ws.nrows))]
+    finally:
+        book.release_resources()
+    header_row = sniff_header_row(head)
+
+    source.seek(0)
+    df = pd.read_excel(source, sheet_name=sheet, skiprows=header_row, engine='xlrd')
+    df.columns = df.columns.astype(str).str.strip()
+    return df, header_row
+
+
+def sheet_names(source, ext):
+    """Nombres de las hojas del libro, sin leer sus filas."""
+    engine = detect_engine(source, ext)
+    try:
+        if engine == 'openpyxl':
+            from openpyxl import load_workbook
+            wb = load_workbook(source, read_only=True)
+            try:
+                return list(wb.sheetnames)
+            finally:
+                wb.close()
+        import xlrd
+        book = xlrd.open_workbook(file_contents=source.read(), on_demand=True)
+        try:
+            return book.sheet_names()
+        finally:
+            book.release_resources()
+    except Exception as e:
+        raise ValueError(f"{engine}: {type(e).__name__}: {e}")
+    finally:
+        source.seek(0)
+
+
+def read_inventory_excel(source, ext, progress=None, sheet=0):
+    """Lee una hoja de un Excel (la primera por defecto; .xlsx en streaming, .xls con xlrd) en una sola pasada.
+
+    `progress(filas_leídas, filas_estimadas)` se llama después de cada bloque (.xlsx) o al final (.xls);
+    las filas estimadas pueden ser None si el libro no declara su dimensión.
+    """
+    engine = detect_engine(source, ext)
+    try:
+        if engine == 'openpyxl':
+            df, header_row = _read_openpyxl(source, progress, sheet)
+        else:
+            df, header_row = _read_xlrd(source, sheet)
+            if progress:
+                progress(len(df), len(df))
+    except (MemoryError, ValueError):
+        raise
+    except Exception as e:
+        raise ValueError(f"{engine}: {type(e).__name__}: {e}")
+
+    if len(df.columns) < MIN_COLUMNS or len(df) == 0:
+        raise ValueError(f"skiprows={header_row}: solo {len(df.columns)} columnas o {len(df)} filas")
+
+    logger.info("Excel leído: engine=%s, skiprows=%s, %d filas, %d cols", engine, header_row, len(df), len(df.columns))
+    logger.debug("Columnas detectadas: %s", df.columns.tolist())
+    return df
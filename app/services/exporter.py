@@ -0,0 +1,135 @@
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+from app.utils.constants import *
+
+# Formatos de /api/export: separador (None = libro Excel) y mimetype
+EXPORT_FORMATS = {
+    'xlsx': (None, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': (',', 'text/csv; charset=utf-8'),
+    'tsv': ('\t', 'text/tab-separated-values; charset=utf-8'),
+}
+
+# Filas que se convierten y escriben por bloque, y tamaño de lectura del .xlsx temporal
+EXPORT_CHUNK_ROWS = 10000
+EXPORT_READ_BLOCK = 256 * 1024
+
+SHEET_NAME = 'Inventario'
+
+
+def export_columns(df):
+    """Columnas exportadas (en orden) con su encabezado."""
+    columns = [
+        (COL_STORE, COL_STORE),
+        (COL_CREATED, 'Fecha'),
+        (COL_SKU, COL_SKU),
+        (COL_PRODUCT, COL_PRODUCT),
+        (COL_CATEGORY, COL_CATEGORY),
+        (COL_BRAND, COL_BRAND),
+        ('_stock', 'Stock'),
+        ('_cost_u', 'Costo Unitario'),
+        ('_cost_t', 'Costo Total'),
+        ('_price', 'Precio'),
+        ('stock_status', 'Estado'),
+    ]
+    return [(col, header) for col, header in columns if col in df.columns]
+
+
+def _chunks(df, rows, columns):
+    """Bloques de EXPORT_CHUNK_ROWS filas con solo las columnas exportadas (una copia pequeña por vez)."""
+    positions = df.columns.get_indexer([col for col, _ in columns])
+    for start in range(0, len(rows), EXPORT_CHUNK_ROWS):
+        yield df.iloc[rows[start:start + EXPORT_CHUNK_ROWS], positions]
+
+
+def iter_delimited(df, rows, sep):
+    """CSV/TSV en bloques de texto UTF-8 (con BOM para que Excel reconozca la codificación)."""
+    columns = export_columns(df)
+    header = pd.DataFrame(columns=[h for _, h in columns]).to_csv(index=False, sep=sep)
+    yield ('\ufeff' + header).encode('utf-8')
+    for chunk in _chunks(df, rows, columns):
+        yield chunk.to_csv(index=False, header=False, sep=sep).encode('utf-8')
+
+
+def _cell_rows(chunk):
+    """Filas de un bloque como listas de valores nativos de Python (None para nulos)."""
+    values = chunk.astype(object).where(chunk.notna(), None).to_numpy()
+    for row in values.tolist():
+        yield [v.item() if isinstance(v, np.generic) else v for v in row]
+
+
+def write_xlsx(df, rows, directory=None):
+    """Escribe el libro con un workbook write-only (filas a disco a medida que se agregan).
+
+    Devuelve la ruta del .xlsx temporal; quien lo envía debe borrarlo al terminar.
+    """
+    from openpyxl import Workbook
+
+    columns = export_columns(df)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(SHEET_NAME)
+    ws.append([h for _, h in columns])
+    for chunk in _chunks(df, rows, columns):
+        for row in _cell_rows(chunk):
+            ws.append(row)
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx', prefix='export-', dir=directory)
+    os.close(fd)
+    try:
+        wb.save(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def write_export_file(df, rows, export_format, directory=None):
+    """Escribe la exportación completa a un temporal (para los jobs de exportación); retorna su ruta."""
+    sep, _ = EXPORT_FORMATS[export_format]
+    if sep is None:
+        return write_xlsx(df, rows, directory)
+    fd, path = tempfile.mkstemp(suffix=f'.{export_format}', prefix='export-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for block in iter_delimited(df, rows, sep):
+                f.write(block)
+    except Exception:
+        remove_file(path)
+        raise
+    return path
+
+
+def remove_stale_exports(directory, max_age):
+    """Borra los temporales de exportación de más de `max_age` segundos (jobs cuyo archivo nunca se descargó)."""
+    expired = time.time() - max_age
+    for name in os.listdir(directory or tempfile.gettempdir()):
+        if name.startswith('export-'):
+            path = os.path.join(directory or tempfile.gettempdir(), name)
+            try:
+                if os.path.getmtime(path) < expired:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def remove_file(path):
+    """Borra un archivo temporal si todavía existe."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def iter_file(path):
+    """Lee un archivo temporal por bloques de EXPORT_READ_BLOCK bytes y lo borra al terminar."""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(EXPORT_READ_BLOCK)
+                if not block:
+                    break
+                yield block
+    finally:
+        remove_file(path)
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+from app.utils.constants import *
+
+# Columnas filtrables por igualdad (parámetro de la API -> columna del análisis)
+FILTER_COLUMNS = {
+    'status': 'stock_status',
+    'category': COL_CATEGORY,
+    'brand': COL_BRAND,
+    'supplier': COL_SUPPLIER,
+    'store': COL_STORE,
+}
+
+# Valor del filtro de marca para productos sin marca
+NO_BRAND = 'SIN_MARCA'
+# Claves normalizadas que cuentan como "sin marca" (vacío, nulos y el valor que pone el análisis)
+NO_BRAND_KEYS = ('', 'nan', 'none', 'sin marca')
+
+
+def normalize_key(value):
+    """Clave de comparación de un valor de filtro: sin espacios en los extremos y en minúsculas."""
+    return str(value).strip().lower()
+
+
+class _ColumnIndex:
+    """Códigos por fila de una columna normalizada y, por cada clave, sus filas ordenadas (int32)."""
+
+    def __init__(self, values, no_value_keys=()):
+        s = pd.Series(values).reset_index(drop=True)
+        keys = s.astype(str).str.strip().str.lower().where(s.notna(), '')
+        codes, uniques = pd.factorize(keys)
+        self.codes = codes.astype(np.int32)
+        self.keys = {key: i for i, key in enumerate(uniques)}
+        self.no_value = [self.keys[k] for k in no_value_keys if k in self.keys]
+
+        # Valor a mostrar de cada clave: la primera aparición, sin espacios en los extremos
+        _, first = np.unique(self.codes, return_index=True)
+        self.labels = [str(s.iloc[i]).strip() for i in first]
+
+        # Postings: filas agrupadas por código (sort estable -> filas ordenadas dentro de cada clave)
+        self.rows = np.argsort(self.codes, kind='stable').astype(np.int32)
+        self.starts = np.concatenate(([0], np.cumsum(np.bincount(self.codes, minlength=len(uniques)))))
+
+    def code_rows(self, code):
+        return self.rows[self.starts[code]:self.starts[code + 1]]
+
+    def rows_for(self, value, no_value_token=None):
+        """Filas (ordenadas) cuya clave es la de `value`; `no_value_token` selecciona las filas sin valor."""
+        if no_value_token is not None and value == no_value_token:
+            codes = self.no_value
+        else:
+            code = self.keys.get(normalize_key(value))
+            codes = [] if code is None else [code]
+        if not codes:
+            return np.empty(0, dtype=np.int32)
+        if len(codes) == 1:
+            return self.code_rows(codes[0])
+        return np.sort(np.concatenate([self.code_rows(c) for c in codes]))
+
+    def memory_usage(self):
+        return self.codes.nbytes + self.rows.nbytes + self.starts.nbytes
+
+
+class FilterIndex:
+    """Índices de igualdad para los filtros de estado, categoría, marca, proveedor y tienda.
+
+    Las claves se normalizan una sola vez por dataset (strip + minúsculas), así
+    que cada filtro es una búsqueda en un dict que devuelve las filas de ese
+    valor. Varios filtros se resuelven intersectando esas listas, empezando por
+    la más corta, sin comparar columnas de texto completas en cada request.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self._columns = {}
+        self._build(df, FILTER_COLUMNS)
+
+    def _build(self, df, params):
+        for param in params:
+            col = FILTER_COLUMNS[param]
+            if col in df.columns:
+                no_value_keys = NO_BRAND_KEYS if col == COL_BRAND else ()
+                self._columns[param] = _ColumnIndex(df[col], no_value_keys)
+
+    def rebuild(self, df, columns):
+        """Índice de `df` (mismas filas) que reconstruye solo los filtros sobre `columns` y comparte el resto."""
+        index = FilterIndex.__new__(FilterIndex)
+        index.n_rows = len(df)
+        index._columns = {p: c for p, c in self._columns.items() if FILTER_COLUMNS[p] not in columns}
+        index._build(df, [p for p in FILTER_COLUMNS if p not in index._columns])
+        return index
+
+    def has(self, param):
+        return param in self._columns
+
+    def rows(self, param, value):
+        """Filas con `param` igual a `value` (None si el dataset no tiene esa columna)."""
+        index = self._columns.get(param)
+        if index is None:
+            return None
+        return index.rows_for(value, NO_BRAND if param == 'brand' else None)
+
+    def select(self, filters):
+        """Filas que cumplen todos los filtros no vacíos de `filters` ({param: valor}); None si no hay filtros.
+
+        Un filtro sobre una columna inexistente no deja ninguna fila, igual que comparar contra una columna vacía.
+        """
+        postings = []
+        for param, value in filters.items():
+            if not value:
+                continue
+            rows = self.rows(param, value)
+            postings.append(rows if rows is not None else np.empty(0, dtype=np.int32))
+        if not postings:
+            return None
+
+        postings.sort(key=len)
+        selected = postings[0]
+        for rows in postings[1:]:
+            if len(selected) == 0:
+                break
+            pos = np.minimum(np.searchsorted(rows, selected), len(rows) - 1)
+            selected = selected[rows[pos] == selected]
+        return selected
+
+    def mask(self, filters):
+        """Máscara booleana equivalente a `select` (todas las filas si no hay filtros)."""
+        selected = self.select(filters)
+        if selected is None:
+            return np.ones(self.n_rows, dtype=bool)
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[selected] = True
+        return mask
+
+    def values(self, param, rows=None):
+        """Valores distintos de `param` presentes en `rows` (o en todo el dataset), como se muestran al usuario.
+
+        Para la marca, los productos sin marca se devuelven al final como NO_BRAND.
+        """
+        index = self._columns[param]
+        codes = index.codes if rows is None else index.codes[rows]
+        present = np.flatnonzero(np.bincount(codes, minlength=len(index.labels)))
+        no_value = set(index.no_value)
+        values = sorted(index.labels[c] for c in present if c not in no_value)
+        if param == 'brand' and any(c in no_value for c in present):
+            values.append(NO_BRAND)
+        return values
+
+    def facet(self, param, rows, weights):
+        """Filas y suma de `weights` por valor de `param` entre `rows`, con un bincount sobre los códigos.
+
+        Retorna [(valor, filas, suma)] de los valores presentes, de más a menos filas. Las filas sin
+        valor se omiten, salvo en la marca, donde se agrupan como NO_BRAND (el valor que acepta el filtro).
+        """
+        index = self._columns[param]
+        codes = index.codes[rows]
+        counts = np.bincount(codes, minlength=len(index.labels))
+        sums = np.bincount(codes, weights=weights[rows], minlength=len(index.labels))
+
+        no_value = set(index.no_value)
+        empty = index.keys.get('')
+        facet = [(index.labels[c], int(counts[c]), float(sums[c]))
+                 for c in np.flatnonzero(counts) if c not in no_value and c != empty]
+        if param == 'brand' and no_value:
+            n = int(counts[index.no_value].sum())
+            if n:
+                facet.append((NO_BRAND, n, float(sums[index.no_value].sum())))
+        facet.sort(key=lambda item: (-item[1], item[0]))
+        return facet
+
+    def memory_usage(self):
+        return sum(index.memory_usage() for index in self._columns.values())
@@ -1,35 +1,101 @@
-import pandas as pd
 import numpy as np
 import os
 import uuid
+import logging
+import hashlib
+import tempfile
 import threading
 from datetime import datetime
-from flask import session
+from flask import session, current_app
 from app.utils.constants import *
+from app.services.session_store import MemorySessionStore, create_session_store, frame_bytes, index_bytes, JOB_TTL_SECONDS
+from app.services.snapshot_cache import SnapshotCache
+from app.services.excel_reader import read_inventory_excel
+from app.services.analysis import analyze_inventory
+from app.services import summary as summary_builder
+from app.services.search_index import SearchIndex
+from app.services.filter_index import FilterIndex, FILTER_COLUMNS, normalize_key
+from app.services.sort_index import SortIndex
+from app.services.jobs import JobQueue, JobError
+from app.services.exporter import write_export_file, remove_stale_exports, remove_file
+from app.services.bulk_upload import extract_zip, plan_tasks, parse_parallel, merge_stores
+from app.services.delta import apply_delta
+from app.services.datasets import Dataset, DatasetRegistry, KeyedLock
+from app.services.query_cache import QueryCache
+from app.utils.json_provider import dumps_bytes
+from app.utils.metrics import stage, cache_access
 
-# Almacenamiento en memoria (simulado)
-# Estructura: session_id -> { 'inventory_data': df, 'analysis_cache': df, 'metadata': {...} }
-SESSIONS = {}
-_analysis_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+# Backend de sesiones (ver session_store.py). Se reemplaza en init_app según la configuración.
+# Estructura por sesión: { 'user_id', 'version', 'inventory_data': df, 'analysis_cache': df, 'summary': {...},
+#                         'search_index': SearchIndex, 'filter_index': FilterIndex,
+#                         'sort_index': SortIndex, 'dataset': Dataset, 'dataset_key', 'metadata': {...} }
+# Los datos analizados de un mismo contenido se comparten entre sesiones a través de _datasets.
+_datasets = DatasetRegistry()
+_store = MemorySessionStore(datasets=_datasets)
+_snapshots = None
+_jobs = JobQueue(_store)
+# Un lock por dataset (o por sesión si sus datos son propios): análisis de datasets distintos corren en paralelo
+_analysis_locks = KeyedLock()
+# Filas ordenadas de cada combinación de filtros/búsqueda/orden ya consultada (ver query_cache.py)
+_queries = QueryCache()
+# Clave de contenido del inventario por defecto (su dataset queda fijado en el registro)
+_default_key = None
+_default_lock = threading.Lock()
+
+# Subidas: hasta SPOOL_MAX_MEMORY en RAM, el resto se vuelca a disco en UPLOAD_FOLDER
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+SPOOL_BLOCK_SIZE = 1024 * 1024
 
 class InventoryService:
+    @staticmethod
+    def init_app(app):
+        """Configura el backend de sesiones, la caché de snapshots, el caché de consultas y la cola de jobs."""
+        global _store, _snapshots, _jobs, _queries
+        _store = create_session_store(app.config, _datasets)
+        snapshot_dir = app.config.get('SNAPSHOT_DIR')
+        _snapshots = SnapshotCache(snapshot_dir) if snapshot_dir else None
+        _jobs = JobQueue(_store, app.config.get('JOB_WORKERS', 2))
+        _queries = QueryCache(app.config.get('QUERY_CACHE_ENTRIES', 256),
+                              app.config.get('QUERY_CACHE_MB', 64) * 1024 * 1024)
+
     @staticmethod
     def get_user_session():
         """Obtiene o crea el ID de sesión del usuario y retorna sus datos."""
         if 'user_id' not in session:
             session['user_id'] = str(uuid.uuid4())
         
-        user_id = session['user_id']
-        if user_id not in SESSIONS:
-            SESSIONS[user_id] = {
-                'inventory_data': None,
-                'analysis_cache': None,
-                'metadata': {
-                    'store_name': 'Sin datos',
-                    'upload_date': '-'
-                }
-            }
-        return SESSIONS[user_id]
+        return _store.get(session['user_id'])
+
+    @staticmethod
+    def find_user_session():
+        """Datos de la sesión actual si ya existe, sin crearla (para sondas como /api/health)."""
+        user_id = session.get('user_id')
+        return _store.find(user_id) if user_id else None
+
+    @staticmethod
+    def set_inventory(user_data, df, metadata, dataset_key=None):
+        """Reemplaza el inventario de la sesión, invalida el análisis y lo persiste en el store.
+
+        `dataset_key` identifica el contenido (clave del snapshot): si otra sesión
+        ya lo analizó, se comparte ese dataset y `df` puede ser None.
+        """
+        dataset = _datasets.get(dataset_key)
+        if dataset is not None:
+            dataset.attach(user_data)
+        else:
+            user_data['inventory_data'] = df
+            user_data['analysis_cache'] = None
+            user_data['summary'] = None
+            user_data['search_index'] = None
+            user_data['filter_index'] = None
+            user_data['sort_index'] = None
+            user_data['dataset'] = None
+            user_data['dataset_key'] = dataset_key
+        user_data['metadata'] = metadata
+        user_data['version'] = uuid.uuid4().hex
+        _store.save(user_data)
 
     @staticmethod
     def load_default_inventory():
@@ -43,19 +109,41 @@ class InventoryService:
         # Buscar en raíz o directorios superiores si es necesario, 
         # pero por ahora asumimos que está en el CWD donde se corre run.py
         if os.path.exists(default_file):
+            global _default_key
             try:
-                inventory_data = pd.read_excel(default_file, skiprows=1)
-                inventory_data.columns = inventory_data.columns.str.strip()
-                
-                user_data['inventory_data'] = inventory_data
-                user_data['analysis_cache'] = None
-                user_data['metadata'] = {
+                metadata = {
                     'store_name': 'Inventario General',
                     'upload_date': datetime.now().strftime("%d/%m/%Y %H:%M")
                 }
+                with _default_lock:
+                    snapshot_key = SnapshotCache.key_for_file(default_file)
+                    if _default_key is not None and _default_key != snapshot_key:
+                        # El archivo cambió: la versión anterior queda solo para las sesiones que la usan
+                        _datasets.unpin(_default_key)
+                    _default_key = snapshot_key
+                    shared = _datasets.get(snapshot_key) is not None
+                    cache_access('dataset', shared)
+                    if shared:
+                        # Ya analizado en este proceso: la sesión comparte ese dataset
+                        InventoryService.set_inventory(user_data, None, metadata, snapshot_key)
+                        return True
+
+                    # Primera sesión del proceso: se parsea (o se lee el snapshot) y se analiza una sola vez
+                    inventory_data = _snapshots.load(snapshot_key) if _snapshots else None
+                    if _snapshots:
+                        cache_access('snapshot', inventory_data is not None)
+                    if inventory_data is None:
+                        with stage('parse') as parsing, open(default_file, 'rb') as f:
+                            inventory_data = read_inventory_excel(f, '.xlsx')
+                            parsing.rows = len(inventory_data)
+                        if _snapshots:
+                            _snapshots.store(snapshot_key, inventory_data)
+
+                    InventoryService.set_inventory(user_data, inventory_data, metadata, snapshot_key)
+                    InventoryService.analyze_session(user_data)
                 return True
             except Exception as e:
-                print(f"Error cargando inventario por defecto: {e}")
+                logger.exception("Error cargando inventario por defecto: %s", e)
                 return False
         return False
 
@@ -70,177 +158,575 @@ class InventoryService:
             if user_data['inventory_data'] is None:
                 return None
 
+        return InventoryService.analyze_session(user_data)
+
+    @staticmethod
+    def analyze_session(user_data):
+        """Analiza el inventario de una sesión (una vez por versión) y construye sus agregados e índices."""
         if user_data['analysis_cache'] is not None:
             return user_data['analysis_cache']
 
-        with _analysis_lock:
-            # Double-check después de adquirir el lock
-            if user_data['analysis_cache'] is not None:
-                return user_data['analysis_cache']
-
-            df = user_data['inventory_data'].copy()
-
-            # Helpers seguros para columnas
-            def get_col(idx):
-                 s = pd.to_numeric(df.iloc[:, idx], errors='coerce').fillna(0)
-                 return s.replace([np.inf, -np.inf], 0)
-
-            # Sanitizar columnas de Texto
-            # Asumimos que las constantes de índices (IDX_...) coinciden con posición
-            # Pero en process_app_upload ya se asignaron nombres de columnas si se usó header
-            # Mejor usar los nombres de columnas definidos en constants si existen en df
-            
-            if COL_BRAND in df.columns:
-                df[COL_BRAND] = df[COL_BRAND].fillna('SIN MARCA').astype(str).replace(['nan', 'NaN', ''], 'SIN MARCA')
-            
-            if COL_CATEGORY in df.columns:
-                df[COL_CATEGORY] = df[COL_CATEGORY].fillna('SIN CATEGORÍA').astype(str).replace(['nan', 'NaN', ''], 'SIN CATEGORÍA')
-
-            if COL_PRODUCT in df.columns:
-                 df[COL_PRODUCT] = df[COL_PRODUCT].fillna('').astype(str).replace(['nan', 'NaN'], '')
-
-            if COL_SKU in df.columns:
-                 df[COL_SKU] = df[COL_SKU].fillna('').astype(str).replace(['nan', 'NaN'], '')
-
-            df['_stock'] = get_col(IDX_STOCK)
-            df['_cost_u'] = get_col(IDX_COST_U)
-            df['_cost_t'] = get_col(IDX_COST_T)
-            df['_price'] = get_col(IDX_PRICE)
-
-            df['stock_status'] = df['_stock'].apply(InventoryService._classify_stock_status)
-            df = InventoryService._apply_abc_classification(df)
-
-            df['margin'] = df['_price'] - df['_cost_u']
-            # Evitar división por cero y NaNs
-            df['margin_pct'] = np.where(df['_price'] > 0, (df['margin'] / df['_price'] * 100), 0)
-            df['margin_pct'] = df['margin_pct'].replace([np.inf, -np.inf, np.nan], 0)
-
-            user_data['analysis_cache'] = df
-            return df
-
-    @staticmethod
-    def _classify_stock_status(stock):
-        if stock < 0: return 'negative'
-        if stock == 0: return 'out_of_stock'
-        if stock <= 5: return 'critical'
-        if stock <= 20: return 'low'
-        if stock <= 100: return 'optimal'
-        return 'overstock'
-
-    @staticmethod
-    def _apply_abc_classification(df):
-        df_sorted = df.sort_values('_cost_t', ascending=False)
-        total_value = df_sorted['_cost_t'].sum()
-        df_sorted['cumulative_value'] = df_sorted['_cost_t'].cumsum()
-        df_sorted['cumulative_pct'] = (df_sorted['cumulative_value'] / total_value * 100) if total_value > 0 else 0
-        
-        df_sorted['abc_class'] = df_sorted['cumulative_pct'].apply(
-            lambda pct: 'A' if pct <= 80 else ('B' if pct <= 95 else 'C')
-        )
-        # Retornamos el df original con la columna añadida correctamente mapeada por índice
-        df['abc_class'] = df_sorted['abc_class']
-        return df
+        while True:
+            key = InventoryService._analysis_key(user_data)
+            with _analysis_locks.hold(key):
+                if InventoryService._analysis_key(user_data) != key:
+                    continue  # Los datos cambiaron mientras se esperaba: tomar el lock de los nuevos
+                # Double-check después de adquirir el lock: otro request pudo terminar este mismo análisis
+                if user_data['analysis_cache'] is not None:
+                    cache_access('analysis', True)
+                    return user_data['analysis_cache']
+
+                # Mismo contenido ya analizado por otra sesión: compartirlo
+                dataset = _datasets.get(user_data['dataset_key'])
+                cache_access('analysis', dataset is not None)
+                if dataset is not None:
+                    dataset.attach(user_data)
+                    return dataset.df
+
+                version = user_data['version']
+                with stage('analysis', len(user_data['inventory_data'])):
+                    df = analyze_inventory(
+                        user_data['inventory_data'],
+                        stock_thresholds=current_app.config['STOCK_THRESHOLDS'],
+                        abc_cutoffs=current_app.config['ABC_CUTOFFS']
+                    )
+                with stage('summary', len(df)):
+                    summary = InventoryService._build_summary(df)
+                with stage('index_build', len(df)):
+                    indexes = SearchIndex(df), FilterIndex(df), SortIndex(df)
+                dataset = Dataset(user_data['dataset_key'], df, summary, *indexes)
+                if user_data['version'] != version:
+                    # Un upload reemplazó los datos mientras se analizaban: no pisar el inventario nuevo
+                    return df
+
+                if dataset.key is not None:
+                    dataset = _datasets.add(dataset, pin=(dataset.key == _default_key))
+                # El análisis contiene todas las columnas originales: no se conserva el frame crudo aparte
+                dataset.attach(user_data)
+                return dataset.df
 
     @staticmethod
-    def product_to_dict(row, include_price=False):
-        """Convierte una fila de DataFrame a diccionario serializable."""
-        created_at = ''
-        if 'F. Creación' in row.index and pd.notna(row['F. Creación']):
-            try:
-                created_at = pd.to_datetime(row['F. Creación']).strftime('%d/%m/%Y')
-            except:
-                created_at = str(row['F. Creación'])[:10]
-        
-        def safe_str(val, default=''):
-            s = str(val)
-            if s.lower() in ['nan', 'none', 'nat', '']:
-                return default
-            return s
-
-        result = {
-            'id': int(row[COL_ID]) if COL_ID in row and pd.notna(row[COL_ID]) else 0,
-            'sku': safe_str(row.get(COL_SKU)),
-            'product': safe_str(row.get(COL_PRODUCT)),
-            'category': safe_str(row.get(COL_CATEGORY), 'SIN CATEGORÍA'),
-            'brand': safe_str(row.get(COL_BRAND), 'SIN MARCA'),
-            'stock': int(row['_stock']) if pd.notna(row['_stock']) else 0,
-            'value': round(float(row['_cost_t']), 2),
-            'status': row['stock_status'],
-            'abc_class': row.get('abc_class', 'C'),
-            'created_at': created_at
+    def _analysis_key(user_data):
+        """Clave del lock de análisis: el contenido si tiene clave (sesiones con el mismo archivo esperan
+        un solo análisis) o la sesión y su versión."""
+        if user_data['dataset_key'] is not None:
+            return 'dataset', user_data['dataset_key']
+        return 'session', user_data['user_id'], user_data['version']
+
+    @staticmethod
+    def _build_summary(df, totals=None, previous=None, changed=None):
+        """Resumen del dashboard de `df` (ver summary_builder.build_summary)."""
+        summary = summary_builder.build_summary(df, current_app.config['STOCK_THRESHOLDS'], totals, previous, changed)
+        # Paneles ya serializados a JSON y resúmenes por tienda, se completan al primer pedido
+        summary['_encoded'] = {}
+        summary['_stores'] = {}
+        return summary
+
+    @staticmethod
+    def get_summary(store=''):
+        """Agregados precalculados del dashboard (se recalculan solo cuando cambian los datos).
+
+        Con `store` se devuelven los de esa tienda (carga masiva), calculados al primer pedido.
+        """
+        df = InventoryService.get_analysis()
+        if df is None:
+            return None
+        summary = InventoryService.get_user_session()['summary']
+        if not store:
+            return summary
+        key = normalize_key(store)
+        cache_access('store_summary', key in summary['_stores'])
+        if key not in summary['_stores']:
+            rows = InventoryService.get_filter_index().rows('store', store)
+            summary['_stores'][key] = InventoryService._build_summary(df.iloc[rows])
+        return summary['_stores'][key]
+
+    @staticmethod
+    def has_store(store):
+        """Si el dataset actual tiene filas de la tienda `store`."""
+        filter_index = InventoryService.get_filter_index()
+        if filter_index is None or not filter_index.has('store'):
+            return False
+        return len(filter_index.rows('store', store)) > 0
+
+    @staticmethod
+    def get_panel_json(panel, store=''):
+        """Panel del dashboard serializado a JSON (bytes); se codifica una vez por dataset (y tienda)."""
+        summary = InventoryService.get_summary(store)
+        if summary is None:
+            return None
+        encoded = summary['_encoded']
+        cache_access('panel', panel in encoded)
+        if panel not in encoded:
+            encoded[panel] = dumps_bytes(summary[panel])
+        return encoded[panel]
+
+    @staticmethod
+    def get_filter_index():
+        """Índices de igualdad (estado, categoría, marca, proveedor) del dataset analizado."""
+        if InventoryService.get_analysis() is None:
+            return None
+        return InventoryService.get_user_session()['filter_index']
+
+    @staticmethod
+    def get_sort_index():
+        """Órdenes precalculados (stock, valor, fecha) del dataset analizado."""
+        if InventoryService.get_analysis() is None:
+            return None
+        return InventoryService.get_user_session()['sort_index']
+
+    @staticmethod
+    def query_rows(filters, query='', match='contains', sort_keys=()):
+        """Filas del dataset analizado que cumplen filtros y búsqueda, en el orden de `sort_keys` (int32, solo lectura).
+
+        El resultado se guarda en el caché de consultas por dataset (o sesión y
+        versión si sus datos son propios): paginar o exportar la misma consulta
+        no vuelve a filtrar ni a ordenar.
+        """
+        df = InventoryService.get_analysis()
+        if df is None:
+            return None
+        user_data = InventoryService.get_user_session()
+        key = (InventoryService._analysis_key(user_data), tuple(sorted(filters.items())),
+               query, match if query else '', tuple(sort_keys))
+        rows = _queries.get(key)
+        cache_access('query', rows is not None)
+        if rows is not None:
+            return rows
+
+        with stage('filter', len(df)):
+            mask = user_data['filter_index'].mask(filters)
+        if query:
+            with stage('search', len(df)):
+                mask &= user_data['search_index'].mask(query, match)
+        with stage('sort'):
+            rows = user_data['sort_index'].order(mask, list(sort_keys))
+        return _queries.put(key, rows)
+
+    @staticmethod
+    def get_facets(filters, query='', match='contains'):
+        """Filas y valor por estado, categoría, marca, proveedor y tienda de las filas que cumplen la consulta.
+
+        El facet de un filtro activo se cuenta sin ese filtro (los demás sí se
+        aplican): muestra las alternativas a la selección actual, como un
+        drill-down. Las filas de cada combinación salen del caché de consultas.
+        """
+        df = InventoryService.get_analysis()
+        if df is None:
+            return None
+        filter_index = InventoryService.get_user_session()['filter_index']
+        value = df['_cost_t'].to_numpy()
+        rows = InventoryService.query_rows(filters, query, match)
+        facet_rows = {
+            param: InventoryService.query_rows({**filters, param: ''}, query, match) if filters.get(param) else rows
+            for param in FILTER_COLUMNS if filter_index.has(param)
+        }
+
+        facets = {}
+        with stage('facets', sum(len(selected) for selected in facet_rows.values())):
+            for param, selected in facet_rows.items():
+                facets[param] = [{param: label, 'count': count, 'value': round(total, 2)}
+                                 for label, count, total in filter_index.facet(param, selected, value)]
+        return {'total': len(rows), 'value': round(float(value[rows].sum()), 2), 'facets': facets}
+
+    @staticmethod
+    def memory_footprint(user_data):
+        """Memoria ocupada por los DataFrames e índices de una sesión (sin contar dos veces el mismo frame)."""
+        indexes = index_bytes(user_data)
+        total = frame_bytes(user_data) + indexes
+        inventory_data = user_data['inventory_data']
+        return {
+            'session_id': user_data['user_id'],
+            'rows': len(inventory_data) if inventory_data is not None else 0,
+            'analyzed': user_data['analysis_cache'] is not None,
+            'dataset_key': user_data['dataset_key'],
+            'index_bytes': indexes,
+            'bytes': total,
+            'mb': round(total / (1024 * 1024), 2)
         }
-        if include_price:
-            result['price'] = round(float(row['_price']), 2) if pd.notna(row['_price']) else 0
-        return result
 
     @staticmethod
-    def process_app_upload(file, filename):
-        """Procesa la subida de un archivo Excel directamente desde memoria."""
-        from io import BytesIO
-        import gc
-        
+    def memory_report():
+        """Memoria por sesión de este worker, ordenada de mayor a menor (el total cuenta una vez cada dataset compartido)."""
+        sessions, total, counted = [], 0, set()
+        for user_data in _store.sessions():
+            footprint = InventoryService.memory_footprint(user_data)
+            sessions.append(footprint)
+            # Un dataset compartido por varias sesiones ocupa memoria una sola vez
+            owner = id(user_data['dataset']) if user_data['dataset'] is not None else user_data['user_id']
+            if owner not in counted:
+                counted.add(owner)
+                total += footprint['bytes']
+        sessions.sort(key=lambda x: x['bytes'], reverse=True)
+        return {
+            'sessions': sessions,
+            'session_count': len(sessions),
+            'total_bytes': total,
+            'total_mb': round(total / (1024 * 1024), 2),
+            'store': _store.stats(),
+            'datasets': _datasets.stats(),
+            'query_cache': _queries.stats()
+        }
+
+    @staticmethod
+    def metric_gauges():
+        """Estado actual del worker para /api/metrics: sesiones, memoria retenida, datasets, locks de análisis
+        y caché de consultas."""
+        store = _store.stats()
+        datasets = _datasets.stats()
+        queries = _queries.stats()
+        return [
+            ('worker_info', 'gauge', 'Worker que respondió el scrape.', [({'pid': os.getpid()}, 1)]),
+            ('sessions', 'gauge', 'Sesiones del store por estado.', [
+                ({'state': 'live'}, store['sessions']),
+                ({'state': 'loaded'}, store['sessions_loaded']),
+                ({'state': 'spilled'}, store['sessions_spilled']),
+            ]),
+            ('session_memory_bytes', 'gauge', 'Bytes de datos de sesiones en memoria (datasets compartidos una vez).',
+             [({}, store['bytes_held'])]),
+            ('session_memory_budget_bytes', 'gauge', 'Presupuesto de memoria de sesiones (0 = sin límite).',
+             [({}, store['memory_budget'] or 0)]),
+            ('session_events_total', 'counter', 'Eventos del ciclo de vida de las sesiones.', [
+                ({'event': event}, store[event]) for event in ('created', 'expired', 'evicted', 'spilled', 'reloaded')
+            ]),
+            ('datasets', 'gauge', 'Datasets analizados en el registro del worker.', [
+                ({'state': 'registered'}, datasets['datasets']),
+                ({'state': 'pinned'}, datasets['datasets_pinned']),
+            ]),
+            ('dataset_analyses_total', 'counter', 'Análisis registrados y análisis repetidos de un contenido ya registrado.', [
+                ({'result': 'built'}, datasets['built']),
+                ({'result': 'duplicated'}, datasets['duplicated']),
+            ]),
+            ('analysis_locks', 'gauge', 'Locks de análisis por dataset en uso.', [({}, len(_analysis_locks))]),
+            ('query_cache_entries', 'gauge', 'Consultas de búsqueda/exportación en caché.', [({}, queries['entries'])]),
+            ('query_cache_bytes', 'gauge', 'Bytes de las filas guardadas en el caché de consultas.',
+             [({}, queries['bytes'])]),
+            ('query_cache_evictions_total', 'counter', 'Consultas descartadas del caché por límite de entradas o bytes.',
+             [({}, queries['evicted'])]),
+        ]
+
+    @staticmethod
+    def start_upload(file, filename):
+        """Recibe la subida y encola su procesamiento; retorna el job (ver jobs.py)."""
+        spool, digest, size = InventoryService._spool_upload(file)
+        user_data = InventoryService.get_user_session()
+        job = _jobs.submit('upload', user_data['user_id'], InventoryService._run_upload,
+                           spool, digest, size, filename, user_data)
+        return job
+
+    @staticmethod
+    def _run_upload(report, spool, digest, size, filename, user_data):
+        """Job de subida: parseo del Excel (o snapshot), reemplazo del inventario y análisis."""
         store_name = os.path.splitext(filename)[0]
         ext = os.path.splitext(filename)[1].lower()
-        
-        # Leer archivo directamente a memoria (evita problemas con /tmp en Render)
+        file_size_mb = round(size / (1024 * 1024), 2)
+        report('received', 10, f'Archivo recibido ({file_size_mb} MB)', bytes_received=size)
+
+        def parsed(rows, total_rows):
+            # 10% -> 70% según las filas leídas (la dimensión declarada del libro es solo una estimación)
+            share = min(rows / total_rows, 1) if total_rows else 0
+            report('parsing', 10 + 60 * share, f'Leyendo Excel: {rows:,} filas', rows_parsed=rows)
+
+        with spool:
+            # Mismo contenido ya analizado en este proceso (se comparte) o parseado antes (snapshot): saltar el Excel
+            snapshot_key = SnapshotCache.key_for_digest(digest)
+            dataset = _datasets.get(snapshot_key)
+            df = dataset.df if dataset is not None else (_snapshots.load(snapshot_key) if _snapshots else None)
+            cache_access('dataset', dataset is not None)
+            if dataset is None and _snapshots:
+                cache_access('snapshot', df is not None)
+            if dataset is not None:
+                logger.info("Upload de un dataset ya analizado: %d filas", len(df))
+            elif df is not None:
+                logger.info("Upload desde snapshot: %d filas, %d cols", len(df), len(df.columns))
+            else:
+                try:
+                    with stage('parse') as parsing:
+                        df = read_inventory_excel(spool, ext, progress=parsed)
+                        parsing.rows = len(df)
+                except MemoryError:
+                    raise
+                except Exception as e:
+                    logger.warning("Upload falló: %s: %s", type(e).__name__, e)
+                    raise JobError(f"No se pudo parsear el archivo Excel. Detalle: {e}")
+                if _snapshots:
+                    _snapshots.store(snapshot_key, df)
+        report('parsed', 70, f'{len(df):,} filas leídas', rows_parsed=len(df))
+
+        InventoryService.set_inventory(user_data, df, {
+            'store_name': store_name,
+            'upload_date': datetime.now().strftime("%d/%m/%Y %H:%M")
+        }, snapshot_key)
+        report('analyzing', 75, 'Analizando inventario...')
+        InventoryService.analyze_session(user_data)
+        report('analyzed', 95, 'Análisis completo')
+
+        return {
+            'success': True,
+            'message': f'Cargados {len(df):,} productos ({file_size_mb} MB)',
+            'columns': df.columns.tolist()[:10],
+            'total_rows': len(df),
+            'file_size_mb': file_size_mb
+        }
+
+    @staticmethod
+    def start_bulk_upload(files):
+        """Recibe varios archivos (Excel o zip) de distintas tiendas y encola su carga masiva."""
+        saved = []
         try:
-            file_bytes = BytesIO(file.read())
-        except Exception as e:
-            print(f"Error leyendo archivo en memoria: {e}")
-            return None, f"Error leyendo el archivo: {str(e)}"
-        
-        gc.collect()
-        
-        # Determinar engine según extensión
-        engine = 'openpyxl' if ext in ('.xlsx', '') else 'xlrd'
-        
-        df = None
-        errors = []
-        
-        for skiprows in [1, 0, 2]:
-            try:
-                file_bytes.seek(0)
-                df = pd.read_excel(file_bytes, skiprows=skiprows, engine=engine)
-                df.columns = df.columns.astype(str).str.strip()
-                
-                if len(df.columns) >= 10 and len(df) > 0:
-                    print(f"Upload OK: skiprows={skiprows}, {len(df)} filas, {len(df.columns)} cols")
-                    print(f"Columnas detectadas: {df.columns.tolist()}")
-                    break
-                    
-                errors.append(f"skiprows={skiprows}: solo {len(df.columns)} columnas o {len(df)} filas")
-                df = None
-            except Exception as e:
-                errors.append(f"skiprows={skiprows}: {type(e).__name__}: {e}")
-                print(f"Upload parse intento fallido: skiprows={skiprows}: {e}")
-                df = None
-                continue
-        
-        # Si openpyxl falló, intentar con xlrd por si es .xls disfrazado de .xlsx
-        if df is None and engine == 'openpyxl':
+            for file in files:
+                saved.append((file.filename,) + InventoryService._save_upload(file))
+        except Exception:
+            for _, path, _, _ in saved:
+                remove_file(path)
+            raise
+        user_data = InventoryService.get_user_session()
+        return _jobs.submit('bulk_upload', user_data['user_id'], InventoryService._run_bulk_upload, saved, user_data)
+
+    @staticmethod
+    def _run_bulk_upload(report, saved, user_data):
+        """Job de carga masiva: una tienda por archivo u hoja, parseadas en paralelo en un pool de procesos."""
+        directory = current_app.config['UPLOAD_FOLDER']
+        size = sum(s for _, _, _, s in saved)
+        file_size_mb = round(size / (1024 * 1024), 2)
+        report('received', 5, f'{len(saved)} archivos recibidos ({file_size_mb} MB)', bytes_received=size)
+
+        temp_paths = [path for _, path, _, _ in saved]
+        try:
+            # Mismo lote ya procesado antes (mismos nombres y contenidos): usar el snapshot del dataset unido
+            batch_digest = hashlib.sha256('\n'.join(f"{name}:{digest}" for name, _, digest, _ in saved).encode()).hexdigest()
+            snapshot_key = SnapshotCache.key_for_digest(batch_digest)
+            dataset = _datasets.get(snapshot_key)
+            df = dataset.df if dataset is not None else (_snapshots.load(snapshot_key) if _snapshots else None)
+            cache_access('dataset', dataset is not None)
+            if dataset is None and _snapshots:
+                cache_access('snapshot', df is not None)
+            skipped = {}
+            if df is None:
+                files = []
+                for name, path, _, _ in saved:
+                    if os.path.splitext(name)[1].lower() == '.zip':
+                        extracted = extract_zip(path, directory)
+                        temp_paths.extend(p for _, p in extracted)
+                        files.extend(extracted)
+                    else:
+                        files.append((name, path))
+                tasks, skipped = plan_tasks(files)
+                if not tasks:
+                    if skipped:
+                        raise JobError(f"No se pudo leer ningún archivo. Detalle: {'; '.join(skipped.values())}")
+                    raise JobError('No se encontraron archivos Excel en la carga')
+
+                def parsed(done, total, store):
+                    report('parsing', 5 + 65 * done / total, f'Leídas {done} de {total} tiendas ({store})',
+                           sheets_parsed=done, sheets_total=total)
+
+                with stage('parse') as parsing:
+                    frames, parse_errors = parse_parallel(tasks, current_app.config['BULK_PARSE_PROCESSES'], parsed)
+                    skipped.update(parse_errors)
+                    for store, error in skipped.items():
+                        logger.warning("Carga masiva: se omite %s: %s", store, error)
+                    if not frames:
+                        raise JobError(f"No se pudo parsear ninguna hoja. Detalle: {'; '.join(skipped.values())}")
+                    df = merge_stores(frames)
+                    parsing.rows = len(df)
+                if _snapshots:
+                    _snapshots.store(snapshot_key, df)
+        finally:
+            for path in temp_paths:
+                remove_file(path)
+
+        stores = df[COL_STORE].unique().tolist()
+        report('parsed', 70, f'{len(df):,} filas de {len(stores)} tiendas', rows_parsed=len(df))
+        InventoryService.set_inventory(user_data, df, {
+            'store_name': f'{len(stores)} tiendas' if len(stores) > 1 else stores[0],
+            'upload_date': datetime.now().strftime("%d/%m/%Y %H:%M"),
+            'stores': stores
+        }, snapshot_key)
+        report('analyzing', 75, 'Analizando inventario...')
+        InventoryService.analyze_session(user_data)
+        report('analyzed', 95, 'Análisis completo')
+
+        return {
+            'success': True,
+            'message': f'Cargados {len(df):,} productos de {len(stores)} tiendas ({file_size_mb} MB)',
+            'stores': stores,
+            'skipped': skipped,
+            'columns': df.columns.tolist()[:10],
+            'total_rows': len(df),
+            'file_size_mb': file_size_mb
+        }
+
+    @staticmethod
+    def start_delta_upload(file, filename, store=''):
+        """Recibe un Excel con filas cambiadas (por ID o SKU) y encola su aplicación al inventario actual."""
+        spool, _, size = InventoryService._spool_upload(file)
+        user_data = InventoryService.get_user_session()
+        return _jobs.submit('delta_upload', user_data['user_id'], InventoryService._run_delta_upload,
+                            spool, size, filename, store, user_data)
+
+    @staticmethod
+    def _run_delta_upload(report, spool, size, filename, store, user_data):
+        """Job de carga delta: parsea solo las filas cambiadas y actualiza análisis, resumen e índices en su lugar."""
+        ext = os.path.splitext(filename)[1].lower()
+        report('received', 10, f'Archivo recibido ({round(size / 1024, 1)} KB)', bytes_received=size)
+        with spool:
             try:
-                file_bytes.seek(0)
-                df = pd.read_excel(file_bytes, skiprows=1, engine='xlrd')
-                df.columns = df.columns.astype(str).str.strip()
-                if len(df.columns) >= 10 and len(df) > 0:
-                    print(f"Upload OK con xlrd fallback: {len(df)} filas, {len(df.columns)} cols")
-                else:
-                    df = None
+                with stage('parse') as parsing:
+                    delta = read_inventory_excel(spool, ext)
+                    parsing.rows = len(delta)
+            except MemoryError:
+                raise
             except Exception as e:
-                errors.append(f"xlrd fallback: {type(e).__name__}: {e}")
-            
-        if df is None:
-            error_detail = "; ".join(errors) if errors else "Archivo vacío o formato no reconocido"
-            print(f"Upload falló completamente: {error_detail}")
-            return None, f"No se pudo parsear el archivo Excel. Detalle: {error_detail}"
-            
-        user_data = InventoryService.get_user_session()
+                raise JobError(f"No se pudo parsear el archivo Excel. Detalle: {e}")
+        report('parsed', 40, f'{len(delta):,} filas cambiadas leídas', rows_parsed=len(delta))
+
+        if user_data['inventory_data'] is None:
+            raise JobError('No hay inventario cargado al que aplicar los cambios')
+        df = InventoryService.analyze_session(user_data)
+        if COL_STORE in df.columns and COL_STORE not in delta.columns:
+            if not store:
+                raise JobError('El inventario tiene varias tiendas: indique la tienda del archivo (store)')
+            delta[COL_STORE] = store
+        elif store and COL_STORE not in df.columns:
+            raise JobError('El inventario cargado no tiene tiendas')
+
+        report('applying', 50, 'Aplicando cambios...')
+        # Por sesión: dos cargas delta de la misma sesión se aplican una tras otra; otras sesiones no esperan
+        with _analysis_locks.hold(('delta', user_data['user_id'])):
+            if user_data['analysis_cache'] is not df:
+                raise JobError('El inventario cambió mientras se aplicaban los cambios; vuelva a intentar')
+            version = user_data['version']
+            with stage('delta', len(delta)):
+                try:
+                    delta_result = apply_delta(
+                        df, delta,
+                        stock_thresholds=current_app.config['STOCK_THRESHOLDS'],
+                        abc_cutoffs=current_app.config['ABC_CUTOFFS']
+                    )
+                except ValueError as e:
+                    raise JobError(f"No se pudo aplicar la carga delta: {e}")
+                if user_data['version'] != version:
+                    raise JobError('El inventario cambió mientras se aplicaban los cambios; vuelva a intentar')
+                InventoryService._store_delta(user_data, delta_result)
+
+        updated, added = len(delta_result['updated']), len(delta_result['added'])
+        report('applied', 95, 'Cambios aplicados')
+        return {
+            'success': True,
+            'message': f'Actualizados {updated:,} productos, {added:,} nuevos',
+            'updated': updated,
+            'added': added,
+            'key': delta_result['key'],
+            'changed_columns': sorted(c for c in delta_result['changed_columns'] if not c.startswith('_')),
+            'abc_recomputed': delta_result['abc_recomputed'],
+            'total_rows': len(delta_result['df'])
+        }
+
+    @staticmethod
+    def _store_delta(user_data, delta_result):
+        """Guarda en la sesión el resultado de apply_delta: el resumen se ajusta con los totales de las filas
+        cambiadas y solo se reconstruyen los índices de las columnas que cambiaron."""
+        df = delta_result['df']
+        changed_columns = delta_result['changed_columns']
+        changed = np.concatenate((delta_result['updated'], delta_result['added']))
+
+        previous = user_data['summary']
+        totals = summary_builder.combine_totals(
+            previous['_totals'],
+            summary_builder.summary_totals(df.iloc[changed]),
+            summary_builder.summary_totals(delta_result['old_rows'])
+        )
+        summary = InventoryService._build_summary(df, totals, previous, changed)
+
+        if len(delta_result['added']):
+            indexes = (SearchIndex(df), FilterIndex(df), SortIndex(df))
+        else:
+            search_index = user_data['search_index']
+            if changed_columns & {COL_PRODUCT, COL_SKU, COL_CATEGORY, COL_BRAND}:
+                search_index = SearchIndex(df)
+            filter_index = user_data['filter_index'].rebuild(df, changed_columns & set(FILTER_COLUMNS.values()))
+            sort_index = user_data['sort_index']
+            if changed_columns & {'_stock', '_cost_t', '_created'}:
+                sort_index = SortIndex(df)
+            indexes = (search_index, filter_index, sort_index)
+
         user_data['inventory_data'] = df
-        user_data['analysis_cache'] = None
-        user_data['metadata'] = {
-            'store_name': store_name,
-            'upload_date': datetime.now().strftime("%d/%m/%Y %H:%M")
+        user_data['summary'] = summary
+        user_data['search_index'], user_data['filter_index'], user_data['sort_index'] = indexes
+        user_data['analysis_cache'] = df
+        # Datos propios de la sesión desde ahora: el dataset compartido no se toca (copy-on-write)
+        user_data['dataset'] = None
+        user_data['dataset_key'] = None
+        user_data['version'] = uuid.uuid4().hex
+        _store.save(user_data)
+
+    @staticmethod
+    def start_export(df, rows, export_format, store_name):
+        """Encola una exportación a archivo; el resultado se descarga con /api/jobs/<id>/download."""
+        remove_stale_exports(current_app.config.get('UPLOAD_FOLDER'), JOB_TTL_SECONDS)
+        user_data = InventoryService.get_user_session()
+        return _jobs.submit('export', user_data['user_id'], InventoryService._run_export,
+                            df, rows, export_format, store_name)
+
+    @staticmethod
+    def _run_export(report, df, rows, export_format, store_name):
+        report('writing', 10, f'Exportando {len(rows):,} filas...', rows=len(rows))
+        with stage('export', len(rows)):
+            path = write_export_file(df, rows, export_format, current_app.config.get('UPLOAD_FOLDER'))
+        return {
+            'message': f'Exportación lista ({len(rows):,} filas)',
+            'filename': f"{store_name}_export.{export_format}",
+            'format': export_format,
+            'rows': len(rows),
+            '_path': path
         }
-        
-        gc.collect()
-        return len(df), df.columns.tolist()[:10]
+
+    @staticmethod
+    def get_job(job_id):
+        """Job del usuario actual (None si no existe o es de otra sesión)."""
+        job = _jobs.get(job_id)
+        if job is None or job['user_id'] != InventoryService.get_user_session()['user_id']:
+            return None
+        return job
+
+    @staticmethod
+    def _save_upload(file):
+        """Copia la subida a un archivo en UPLOAD_FOLDER (los procesos del pool lo leen por ruta); retorna (ruta, sha256 hex, bytes)."""
+        ext = os.path.splitext(file.filename)[1].lower()
+        fd, path = tempfile.mkstemp(suffix=ext, prefix='upload-', dir=current_app.config['UPLOAD_FOLDER'])
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    block = file.read(SPOOL_BLOCK_SIZE)
+                    if not block:
+                        break
+                    hasher.update(block)
+                    out.write(block)
+                    size += len(block)
+        except Exception:
+            remove_file(path)
+            raise
+        return path, hasher.hexdigest(), size
+
+    @staticmethod
+    def _spool_upload(file):
+        """Copia la subida a un SpooledTemporaryFile por bloques y retorna (archivo, sha256 hex, bytes)."""
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, dir=current_app.config['UPLOAD_FOLDER'])
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            while True:
+                block = file.read(SPOOL_BLOCK_SIZE)
+                if not block:
+                    break
+                hasher.update(block)
+                spool.write(block)
+                size += len(block)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool, hasher.hexdigest(), size
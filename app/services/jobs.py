@@ -0,0 +1,88 @@
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class JobError(Exception):
+    """Error esperado de un job (archivo inválido, etc.): su mensaje se muestra tal cual al usuario."""
+
+
+def public_job(job):
+    """Job sin los campos internos (claves con '_', también dentro de `result`)."""
+    public = {k: v for k, v in job.items() if not k.startswith('_')}
+    if isinstance(public.get('result'), dict):
+        public['result'] = {k: v for k, v in public['result'].items() if not k.startswith('_')}
+    return public
+
+
+class JobQueue:
+    """Ejecuta uploads y exportaciones en un pool de threads del worker.
+
+    La función del job recibe `report(stage, progress, message, **detail)` para
+    informar su avance real. El estado ('queued', 'running', 'done' o 'error') se
+    guarda en el store de sesiones, así el polling de /api/jobs/<id> funciona
+    aunque lo atienda otro worker.
+    """
+
+    def __init__(self, store, max_workers=2):
+        self._store = store
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Se crea al primer uso: dentro del proceso del worker y no en el master de gunicorn
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='job')
+            return self._executor
+
+    def submit(self, kind, user_id, fn, *args):
+        """Encola `fn(report, *args)` y retorna el job recién creado (estado 'queued')."""
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'user_id': user_id,
+            'state': 'queued',
+            'stage': 'queued',
+            'progress': 0,
+            'message': 'En cola',
+            'detail': {},
+            'result': None,
+            'error': None,
+            'created': time.time(),
+            'finished': None,
+        }
+        self._store.save_job(job)
+        app = current_app._get_current_object()
+        self._pool().submit(self._run, app, job, fn, args)
+        return job
+
+    def get(self, job_id):
+        return self._store.load_job(job_id)
+
+    def _run(self, app, job, fn, args):
+        def report(stage, progress, message, **detail):
+            job.update(state='running', stage=stage, progress=int(progress), message=message)
+            job['detail'].update(detail)
+            self._store.save_job(job)
+
+        with app.app_context():
+            try:
+                result = fn(report, *args)
+                job.update(state='done', stage='done', progress=100, result=result,
+                           message=(result or {}).get('message', 'Completado'))
+            except JobError as e:
+                job.update(state='error', error=str(e), message=str(e))
+            except MemoryError:
+                job.update(state='error', error='Archivo demasiado grande.', message='Archivo demasiado grande.')
+            except Exception as e:
+                logger.exception("Job %s %s falló: %s: %s", job['kind'], job['id'], type(e).__name__, e)
+                job.update(state='error', error=f'Error procesando: {e}', message=f'Error procesando: {e}')
+            job['finished'] = time.time()
+            self._store.save_job(job)
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+# Bytes estimados por entrada además del arreglo de filas (clave, dict y objeto ndarray)
+ENTRY_OVERHEAD = 256
+
+
+class QueryCache:
+    """Caché LRU de resultados de /api/search y /api/export.
+
+    Guarda, por (dataset, filtros, búsqueda, orden), las filas que cumplen la
+    consulta ya ordenadas (arreglo de solo lectura). Las páginas siguientes, el
+    total y la exportación del mismo filtro son cortes del arreglo. Se limita
+    por cantidad de entradas y por bytes; un resultado que no entra en
+    `max_bytes` no se guarda. Las entradas de datos reemplazados (otra versión
+    de la sesión) no se vuelven a pedir y salen por LRU.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evicted': 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key):
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return rows
+
+    def put(self, key, rows):
+        """Guarda `rows` (queda de solo lectura: se comparte entre requests) y retorna el mismo arreglo."""
+        rows.flags.writeable = False
+        size = rows.nbytes + ENTRY_OVERHEAD
+        if not self.enabled or size > self.max_bytes:
+            return rows
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes + ENTRY_OVERHEAD
+            self._entries[key] = rows
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes + ENTRY_OVERHEAD
+                self._counters['evicted'] += 1
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_entries': self.max_entries,
+                    'max_bytes': self.max_bytes, **self._counters}
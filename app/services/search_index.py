@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+from app.utils.constants import *
+
+# Separador entre textos de filas distintas (nunca forma parte de un trigrama)
+_SEP = 0
+
+
+def _trigram_keys(codepoints):
+    """Clave uint32 de cada trigrama consecutivo. Las colisiones solo agregan candidatos, que luego se verifican."""
+    c0 = codepoints[:-2].astype(np.uint32)
+    c1 = codepoints[1:-1].astype(np.uint32)
+    c2 = codepoints[2:].astype(np.uint32)
+    with np.errstate(over='ignore'):
+        return (c0 * np.uint32(0x9E3779B1) + c1) * np.uint32(0x85EBCA77) + c2
+
+
+def _codepoints(text):
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+
+class SearchIndex:
+    """Índice de búsqueda por subcadena para /api/search y /api/export.
+
+    Producto y SKU (texto libre) se indexan con un índice invertido de trigramas
+    sobre el texto ya pasado a minúsculas: la consulta intersecta las listas de
+    filas de sus trigramas y verifica solo esos candidatos. Categoría y Marca
+    tienen pocos valores distintos, así que se busca en sus valores únicos y se
+    expande a filas por código.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        text_cols = [c for c in (COL_PRODUCT, COL_SKU) if c in df.columns]
+        self._text_cols = {c: df[c].astype(str).str.lower().reset_index(drop=True) for c in text_cols}
+        self._build_trigrams()
+
+        self._group_cols = {}
+        for col in (COL_CATEGORY, COL_BRAND):
+            if col in df.columns:
+                codes, uniques = pd.factorize(df[col])
+                lowered = [str(v).lower() for v in uniques]
+                self._group_cols[col] = (codes, lowered)
+
+        self._sorted = {}
+
+    def _build_trigrams(self):
+        """Postings de trigramas: claves únicas ordenadas, inicio de cada lista y filas (int32)."""
+        keys_parts = []
+        for text in self._text_cols.values():
+            joined = '\0'.join(text.tolist()) + '\0'
+            codepoints = _codepoints(joined)
+            lengths = text.str.len().to_numpy(dtype=np.int64) + 1
+            rows = np.repeat(np.arange(self.n_rows, dtype=np.uint64), lengths)
+            valid = (codepoints[:-2] != _SEP) & (codepoints[1:-1] != _SEP) & (codepoints[2:] != _SEP)
+            keys = _trigram_keys(codepoints)[valid].astype(np.uint64)
+            # Clave y fila en un solo uint64: un sort in-place ordena por clave y luego por fila
+            keys_parts.append((keys << np.uint64(32)) | rows[:-2][valid])
+            del codepoints, rows, valid, keys
+
+        combined = np.concatenate(keys_parts) if keys_parts else np.empty(0, dtype=np.uint64)
+        del keys_parts
+        combined.sort()
+        if len(combined):
+            combined = combined[np.concatenate(([True], combined[1:] != combined[:-1]))]
+
+        keys = (combined >> np.uint64(32)).astype(np.uint32)
+        self._rows = (combined & np.uint64(0xFFFFFFFF)).astype(np.int32)
+        del combined
+        # `keys` ya está ordenado: los inicios de cada lista son los cambios de valor
+        self._starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.empty(0, dtype=np.int64)
+        self._ends = np.append(self._starts[1:], len(keys))
+        self._keys = keys[self._starts]
+
+    def _postings(self, key):
+        i = np.searchsorted(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            return np.empty(0, dtype=np.int32)
+        return self._rows[self._starts[i]:self._ends[i]]
+
+    def _text_rows(self, query):
+        """Filas cuyo Producto o SKU contiene `query` (ya en minúsculas)."""
+        if not self._text_cols:
+            return np.empty(0, dtype=np.int32)
+        if len(query) < 3:
+            # Sin trigramas: recorrido lineal, pero sobre el texto ya en minúsculas
+            hits = np.zeros(self.n_rows, dtype=bool)
+            for text in self._text_cols.values():
+                hits |= text.str.contains(query, regex=False).to_numpy(dtype=bool)
+            return np.flatnonzero(hits)
+
+        postings = sorted((self._postings(k) for k in np.unique(_trigram_keys(_codepoints(query)))), key=len)
+        candidates = postings[0]
+        for rows in postings[1:]:
+            if len(candidates) == 0:
+                break
+            # Las listas están ordenadas: cada candidato se busca en la siguiente lista con searchsorted
+            pos = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+            candidates = candidates[rows[pos] == candidates]
+        if len(candidates) == 0:
+            return candidates
+
+        verified = np.zeros(len(candidates), dtype=bool)
+        for text in self._text_cols.values():
+            verified |= text.iloc[candidates].str.contains(query, regex=False).to_numpy(dtype=bool)
+        return candidates[verified]
+
+    def _group_mask(self, query):
+        """Filas cuya Categoría o Marca contiene `query`, comparando solo los valores únicos."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for codes, lowered in self._group_cols.values():
+            matched = [i for i, value in enumerate(lowered) if query in value]
+            if matched:
+                mask |= np.isin(codes, matched)
+        return mask
+
+    def _sorted_keys(self, col):
+        """Valores en minúsculas ordenados y su permutación (se construye al primer uso)."""
+        if col not in self._sorted:
+            text = self._text_cols[col]
+            order = text.argsort(kind='stable').to_numpy()
+            self._sorted[col] = (np.asarray(text.iloc[order], dtype=object), order)
+        return self._sorted[col]
+
+    def _prefix_rows(self, col, prefix, exact=False):
+        if col not in self._text_cols:
+            return np.empty(0, dtype=np.int64)
+        values, order = self._sorted_keys(col)
+        start = np.searchsorted(values, prefix, side='left')
+        end = np.searchsorted(values, prefix if exact else prefix + '\U0010ffff', side='right')
+        return np.sort(order[start:end])
+
+    def mask(self, query, match='contains'):
+        """Máscara booleana de filas que coinciden con `query`.
+
+        match='contains': subcadena en Producto, SKU, Categoría o Marca (comportamiento por defecto).
+        match='prefix': Producto o SKU empiezan con `query` (búsqueda binaria).
+        match='sku': SKU exactamente igual a `query` (búsqueda binaria).
+        """
+        query = query.lower()
+        mask = np.zeros(self.n_rows, dtype=bool)
+        if match == 'sku':
+            mask[self._prefix_rows(COL_SKU, query, exact=True)] = True
+        elif match == 'prefix':
+            mask[self._prefix_rows(COL_SKU, query)] = True
+            mask[self._prefix_rows(COL_PRODUCT, query)] = True
+        else:
+            mask[self._text_rows(query)] = True
+            mask |= self._group_mask(query)
+        return mask
+
+    def memory_usage(self):
+        """Bytes ocupados por el índice (sin contar los arreglos de prefijos construidos bajo demanda)."""
+        total = self._keys.nbytes + self._starts.nbytes + self._ends.nbytes + self._rows.nbytes
+        total += sum(int(t.memory_usage(deep=True)) for t in self._text_cols.values())
+        total += sum(codes.nbytes for codes, _ in self._group_cols.values())
+        return total
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from app.utils.constants import *
+
+# Textos que se consideran vacíos al serializar (comparados en minúsculas)
+EMPTY_TEXTS = {'nan', 'none', 'nat', ''}
+
+
+def _text(df, col, default=''):
+    """Columna como lista de str, con los valores vacíos/nulos reemplazados por `default`."""
+    if col not in df.columns:
+        return [default] * len(df)
+    values = df[col].to_numpy(dtype=object)
+    texts = [default if na else str(v) for v, na in zip(values, pd.isna(values))]
+    return [default if t.lower() in EMPTY_TEXTS else t for t in texts]
+
+
+def _integers(df, col):
+    if col not in df.columns:
+        return [0] * len(df)
+    values = df[col].to_numpy()
+    if values.dtype.kind in 'iu':
+        return values.tolist()
+    if values.dtype.kind != 'f':
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+    return np.nan_to_num(values, nan=0.0).astype(np.int64).tolist()
+
+
+def _rounded(df, col):
+    # round() de Python por valor: mismo redondeo que la serialización fila a fila
+    values = np.nan_to_num(df[col].to_numpy(dtype=np.float64), nan=0.0)
+    return [round(v, 2) for v in values.tolist()]
+
+
+def _created_at(df):
+    """Fecha de creación como dd/mm/aaaa; si no se pudo interpretar, los primeros 10 caracteres del original."""
+    if COL_CREATED not in df.columns:
+        return [''] * len(df)
+    raw = df[COL_CREATED]
+    created = df['_created'] if '_created' in df.columns else pd.to_datetime(raw, dayfirst=True, errors='coerce')
+    # 'AAAA-MM-DD' (o 'NaT') en bloque y reordenado a dd/mm/aaaa
+    iso = np.datetime_as_string(created.to_numpy(dtype='datetime64[ns]'), unit='D')
+    result = [f"{d[8:10]}/{d[5:7]}/{d[:4]}" if d != 'NaT' else '' for d in iso.tolist()]
+    unparsed = np.flatnonzero(created.isna().to_numpy() & raw.notna().to_numpy())
+    for i, value in zip(unparsed, raw.iloc[unparsed].tolist()):
+        result[i] = str(value)[:10]
+    return result
+
+
+def products_to_records(df, include_price=False):
+    """Convierte un tramo del análisis en la lista de productos de la API, columna por columna.
+
+    Mismo formato que la antigua conversión fila a fila (iterrows): nulos y textos
+    'nan'/'none'/'nat' pasan a los valores por defecto.
+    """
+    columns = {
+        'id': _integers(df, COL_ID),
+        'sku': _text(df, COL_SKU),
+        'product': _text(df, COL_PRODUCT),
+        'category': _text(df, COL_CATEGORY, 'SIN CATEGORÍA'),
+        'brand': _text(df, COL_BRAND, 'SIN MARCA'),
+        'stock': _integers(df, '_stock'),
+        'value': _rounded(df, '_cost_t'),
+        'status': np.asarray(df['stock_status'], dtype=object).tolist(),
+        'abc_class': np.asarray(df['abc_class'], dtype=object).tolist() if 'abc_class' in df.columns else ['C'] * len(df),
+        'created_at': _created_at(df),
+    }
+    if include_price:
+        columns['price'] = _rounded(df, '_price')
+    if COL_STORE in df.columns:
+        # Datasets de carga masiva: tienda de cada producto
+        columns['store'] = _text(df, COL_STORE)
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
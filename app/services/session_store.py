@@ -0,0 +1,570 @@
+import os
+import copy
+import json
+import logging
+import fcntl
+import shutil
+import time
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+import pyarrow.feather as feather
+from app.utils.frames import to_arrow_safe
+
+logger = logging.getLogger(__name__)
+
+# Segundos que se conservan los jobs terminados (ver jobs.py)
+JOB_TTL_SECONDS = 3600
+# Cada cuántos segundos se revisan TTL y presupuesto de memoria aunque la sesión actual no cambie
+SWEEP_INTERVAL_SECONDS = 30
+# Sesiones usadas hace menos de esto no se liberan por presupuesto (pueden tener un request en curso)
+EVICT_MIN_IDLE_SECONDS = 5
+
+# Campos de la sesión que ocupan memoria (se liberan al desalojarla)
+DATA_KEYS = ('inventory_data', 'analysis_cache', 'summary', 'search_index', 'filter_index', 'sort_index', 'dataset')
+INDEX_KEYS = ('search_index', 'filter_index', 'sort_index')
+
+
+def new_session_data(user_id):
+    """Estructura vacía de una sesión de usuario."""
+    return {
+        'user_id': user_id,
+        'version': None,
+        'inventory_data': None,
+        'analysis_cache': None,
+        'summary': None,
+        'search_index': None,
+        'filter_index': None,
+        'sort_index': None,
+        # Dataset compartido y su clave de contenido (ver datasets.py); None si la sesión modificó sus datos
+        'dataset': None,
+        'dataset_key': None,
+        'metadata': {
+            'store_name': 'Sin datos',
+            'upload_date': '-'
+        }
+    }
+
+
+def frame_bytes(user_data):
+    """Bytes de los DataFrames de una sesión (sin contar dos veces el mismo frame)."""
+    frames = {id(f): f for f in (user_data['inventory_data'], user_data['analysis_cache']) if f is not None}
+    return sum(int(f.memory_usage(index=True, deep=True).sum()) for f in frames.values())
+
+
+def index_bytes(user_data):
+    """Bytes de los índices de búsqueda, filtros y orden de una sesión."""
+    return sum(user_data[k].memory_usage() for k in INDEX_KEYS if user_data.get(k) is not None)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _main_frame(user_data):
+    return user_data['analysis_cache'] if user_data['analysis_cache'] is not None else user_data['inventory_data']
+
+
+def _usage_key(user_data):
+    # Cambia cuando cambian los datos de la sesión (upload, carga delta, análisis terminado)
+    return user_data['version'], user_data['analysis_cache'] is not None
+
+
+class MemorySessionStore:
+    """Sesiones en memoria del proceso. Solo válido con un único worker.
+
+    Las sesiones se guardan en orden LRU. Las que pasan `ttl` segundos sin uso
+    se descartan, y cuando los datasets en memoria superan `memory_budget`
+    bytes se liberan los de las sesiones usadas hace más tiempo. Con
+    `spill_dir` el dataset liberado se escribe antes a disco (Feather, en
+    `spill_dir/<pid>`) y se vuelve a cargar en el próximo pedido de esa
+    sesión; sin él se pierde.
+
+    Un dataset compartido entre sesiones (`datasets`, ver datasets.py) se
+    cuenta una sola vez y no se libera mientras lo use más de una sesión.
+    """
+
+    def __init__(self, ttl=None, memory_budget=None, spill_dir=None, datasets=None):
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.datasets = datasets
+        self._sessions = OrderedDict()
+        self._usage = {}
+        self._spilled = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._counters = {'created': 0, 'expired': 0, 'evicted': 0, 'spilled': 0, 'reloaded': 0}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._remove_orphan_spills()
+
+    def get(self, user_id):
+        """Sesión `user_id` (se crea si no existe); recarga su dataset si se había bajado a disco."""
+        now = time.monotonic()
+        with self._lock:
+            user_data = self._sessions.get(user_id)
+            if user_data is not None and self.ttl and now - self._usage[user_id]['touched'] > self.ttl:
+                # Vencida aunque el barrido todavía no la haya quitado: no se reutiliza
+                self._drop(user_id)
+                self._counters['expired'] += 1
+                user_data = None
+            if user_data is None:
+                user_data = self._sessions[user_id] = new_session_data(user_id)
+                self._usage[user_id] = {'touched': 0, 'bytes': 0, 'frame': None, 'key': _usage_key(user_data)}
+                self._counters['created'] += 1
+            else:
+                self._sessions.move_to_end(user_id)
+            self._usage[user_id]['touched'] = now
+            spilled = self._spilled.pop(user_id, None)
+            if spilled:
+                # Dentro del lock: un request concurrente de la misma sesión no debe verla vacía
+                self._reload(user_data, *spilled)
+        self._enforce(user_data)
+        return user_data
+
+    def find(self, user_id):
+        """Sesión existente sin crearla, sin cargar datos ni contarla como uso (None si no existe)."""
+        with self._lock:
+            return self._sessions.get(user_id)
+
+    def save(self, user_data):
+        """Persiste los cambios de una sesión (no-op en memoria)."""
+        pass
+
+    def sessions(self):
+        """Sesiones de este proceso (las liberadas por presupuesto sin sus datos)."""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def _held(self):
+        # Bytes por frame distinto: las sesiones que comparten un dataset no lo cuentan dos veces
+        return sum({u['frame']: u['bytes'] for u in self._usage.values() if u['frame'] is not None}.values())
+
+    def stats(self):
+        """Sesiones vivas, con datos en memoria y en disco, bytes retenidos y contadores de ciclo de vida."""
+        with self._lock:
+            held = self._held()
+            loaded = sum(1 for u in self._sessions.values() if u['inventory_data'] is not None)
+            return {
+                'sessions': len(self._sessions),
+                'sessions_loaded': loaded,
+                'sessions_spilled': len(self._spilled),
+                'bytes_held': held,
+                'memory_budget': self.memory_budget,
+                'ttl_seconds': self.ttl,
+                **self._counters,
+            }
+
+    def _sweep_interval(self):
+        # Con un TTL menor que el intervalo, el barrido se hace con la frecuencia del TTL
+        return min(SWEEP_INTERVAL_SECONDS, self.ttl) if self.ttl else SWEEP_INTERVAL_SECONDS
+
+    def _enforce(self, current):
+        """Mide la sesión actual si cambió y aplica TTL y presupuesto (a lo sumo cada _sweep_interval())."""
+        user_id = current['user_id']
+        key = _usage_key(current)
+        now = time.monotonic()
+        with self._lock:
+            usage = self._usage.get(user_id)
+            changed = usage is not None and usage['key'] != key
+            if not changed and now - self._last_sweep < self._sweep_interval():
+                return
+        # Medir fuera del lock (recorre los DataFrames)
+        nbytes = frame_bytes(current) + index_bytes(current) if changed else None
+        frame = _main_frame(current)
+
+        with self._lock:
+            if nbytes is not None and user_id in self._usage:
+                self._usage[user_id].update(bytes=nbytes, key=key, frame=id(frame) if frame is not None else None)
+            self._last_sweep = now
+            expired = []
+            if self.ttl:
+                expired = [uid for uid, u in self._usage.items() if uid != user_id and now - u['touched'] > self.ttl]
+                for uid in expired:
+                    self._drop(uid)
+                self._counters['expired'] += len(expired)
+            victims = []
+            if self.memory_budget:
+                held = self._held()
+                refs = Counter(u['frame'] for u in self._usage.values())
+                for uid, user_data in self._sessions.items():
+                    if held <= self.memory_budget:
+                        break
+                    usage = self._usage[uid]
+                    if uid == user_id or not usage['bytes'] or now - usage['touched'] < EVICT_MIN_IDLE_SECONDS:
+                        continue
+                    if refs[usage['frame']] > 1 or self._is_pinned(user_data):
+                        continue  # liberarlo no devuelve memoria: el dataset sigue en uso
+                    victims.append((uid, user_data, usage['touched']))
+                    held -= usage['bytes']
+        for uid, user_data, touched in victims:
+            self._evict(uid, user_data, touched)
+
+    def _drop(self, user_id):
+        # Con self._lock tomado
+        del self._sessions[user_id], self._usage[user_id]
+        spilled = self._spilled.pop(user_id, None)
+        if spilled:
+            self._discard_spill(spilled[0])
+
+    def _evict(self, user_id, user_data, touched):
+        """Libera los datos de una sesión (antes los baja a disco si hay `spill_dir`)."""
+        version = user_data['version']
+        try:
+            path = self._spill(user_id, user_data)
+        except OSError as e:
+            logger.warning("No se pudo bajar a disco la sesión %s: %s", user_id, e)
+            path = None
+        with self._lock:
+            usage = self._usage.get(user_id)
+            if usage is None or usage['touched'] != touched or user_data['version'] != version:
+                # Se usó o cambió mientras se escribía: se conserva en memoria
+                if path:
+                    self._discard_spill(path)
+                return
+            for k in DATA_KEYS:
+                user_data[k] = None
+            user_data['version'] = None
+            if path:
+                self._spilled[user_id] = (path, version)
+                self._counters['spilled'] += 1
+            else:
+                user_data['metadata'] = new_session_data(user_id)['metadata']
+            usage.update(bytes=0, frame=None, key=_usage_key(user_data))
+            self._counters['evicted'] += 1
+
+    def _is_pinned(self, user_data):
+        return self.datasets is not None and user_data['dataset_key'] is not None \
+            and self.datasets.is_pinned(user_data['dataset_key'])
+
+    def _spill(self, user_id, user_data):
+        df = user_data['inventory_data']
+        if not self.spill_dir or df is None:
+            return None
+        # Un subdirectorio por proceso (pid al escribir, no al crear el store: gunicorn puede crearlo en el master)
+        spill_dir = os.path.join(self.spill_dir, str(os.getpid()))
+        os.makedirs(spill_dir, exist_ok=True)
+        path = os.path.join(spill_dir, f"{user_id}-{user_data['version']}.arrow")
+        tmp_path = f"{path}.tmp"
+        feather.write_feather(to_arrow_safe(df), tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+        return path
+
+    def _reload(self, user_data, path, version):
+        dataset = self.datasets.get(user_data['dataset_key']) if self.datasets is not None else None
+        if dataset is not None:
+            # Otra sesión tiene el mismo contenido en memoria: compartirlo en vez de leer el archivo
+            self._discard_spill(path)
+            dataset.attach(user_data)
+            user_data['version'] = version
+            self._counters['reloaded'] += 1
+            return
+        try:
+            df = feather.read_table(path).to_pandas()
+        except OSError as e:
+            logger.warning("No se pudo recargar la sesión %s desde %s: %s", user_data['user_id'], path, e)
+            user_data['metadata'] = new_session_data(user_data['user_id'])['metadata']
+            return
+        finally:
+            self._discard_spill(path)
+        # Se guardó el frame analizado: el análisis se rehace al primer pedido
+        user_data['inventory_data'] = df
+        user_data['version'] = version
+        self._counters['reloaded'] += 1
+
+    def _discard_spill(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _remove_orphan_spills(self):
+        """Borra los subdirectorios de procesos que ya no existen (sus sesiones se perdieron con ellos).
+
+        El directorio puede ser compartido: los archivos de procesos vivos (otra
+        app, el proceso que lanzó el pool de parseo) no se tocan.
+        """
+        for entry in os.scandir(self.spill_dir):
+            if not (entry.is_dir() and entry.name.isdigit()) or _process_alive(int(entry.name)):
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def save_job(self, job):
+        """Guarda una copia profunda del estado de un job y descarta los terminados hace más de JOB_TTL_SECONDS."""
+        expired = time.time() - JOB_TTL_SECONDS
+        with self._lock:
+            self._jobs[job['id']] = copy.deepcopy(job)
+            for job_id in [j['id'] for j in self._jobs.values() if j['finished'] and j['finished'] < expired]:
+                del self._jobs[job_id]
+
+    def load_job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+
+class SharedSessionStore(MemorySessionStore):
+    """Sesiones compartidas entre workers de un mismo host.
+
+    Cada dataset se guarda como archivo Arrow (Feather sin compresión) en
+    `base_dir/data`, normalmente bajo /dev/shm, y se abre con memory-map. Un
+    índice JSON pequeño (`index.json`) guarda por sesión la versión vigente,
+    la ruta del archivo y la metadata. Cada worker mantiene su copia local y la
+    recarga cuando la versión del índice cambia.
+
+    Los datasets con clave de contenido (el inventario por defecto, un mismo
+    archivo subido por varios usuarios) se escriben una sola vez como
+    `<clave>.arrow` y todas las sesiones del host apuntan a ese archivo; en
+    cada worker se comparten a través del registro de datasets.
+
+    Al abrirlo, las columnas numéricas y de fecha apuntan al archivo mapeado
+    (page cache compartido entre workers, solo lectura); las de texto, las
+    category y las columnas derivadas del análisis son privadas de cada
+    worker, así que la memoria sigue creciendo con la cantidad de workers.
+
+    El TTL se mide con el último uso en cualquier worker (`touched` en el
+    índice, actualizado a lo sumo cada _touch_interval()). Las entradas
+    vencidas se quitan del índice y su archivo se borra cuando ninguna otra
+    entrada lo usa; una sesión vencida no se vuelve a abrir desde el índice.
+    Una sesión liberada por presupuesto conserva su entrada: es de donde se
+    recarga.
+    """
+
+    def __init__(self, base_dir, ttl=None, memory_budget=None, datasets=None):
+        super().__init__(ttl, memory_budget, datasets=datasets)
+        self.base_dir = base_dir
+        self._data_dir = os.path.join(base_dir, 'data')
+        self._index_path = os.path.join(base_dir, 'index.json')
+        self._lock_path = os.path.join(base_dir, 'index.lock')
+        self._jobs_dir = os.path.join(base_dir, 'jobs')
+        self._index_cache = (None, {})
+        self._last_index_sweep = 0.0
+        os.makedirs(self._data_dir, exist_ok=True)
+        os.makedirs(self._jobs_dir, exist_ok=True)
+
+    @contextmanager
+    def _index_lock(self):
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            st = os.stat(self._index_path)
+        except FileNotFoundError:
+            return {}
+        key = (st.st_mtime_ns, st.st_size)
+        if self._index_cache[0] == key:
+            return self._index_cache[1]
+        try:
+            with open(self._index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return self._index_cache[1]
+        self._index_cache = (key, index)
+        return index
+
+    def _write_index(self, index):
+        tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self._index_path)
+
+    def get(self, user_id):
+        user_data = super().get(user_id)
+        now = time.time()
+        self._sweep_index(now)
+        entry = self._read_index().get(user_id)
+        if entry and self._expired(entry, now):
+            # Sin uso en ningún worker por más de `ttl`: se descarta en vez de volver a abrirla
+            self._remove_entries([user_id], now)
+            if user_data['version'] == entry['version']:
+                for k in DATA_KEYS:
+                    user_data[k] = None
+                user_data['dataset_key'] = None
+                user_data['version'] = None
+                user_data['metadata'] = new_session_data(user_id)['metadata']
+            return user_data
+        if entry and self.ttl and now - entry.get('touched', 0) > self._touch_interval():
+            self._touch(user_id, now)
+        if entry and entry['version'] != user_data['version']:
+            dataset = self.datasets.get(entry.get('dataset')) if self.datasets is not None else None
+            if dataset is not None:
+                dataset.attach(user_data)
+            else:
+                try:
+                    table = feather.read_table(entry['path'], memory_map=True)
+                except OSError as e:
+                    logger.error("Error abriendo dataset compartido %s: %s", entry['path'], e)
+                    return user_data
+                for k in DATA_KEYS:
+                    user_data[k] = None
+                # Un bloque por columna: las numéricas y de fecha quedan sobre el archivo mapeado (sin copia
+                # privada); las de texto y category sí se convierten en cada worker
+                user_data['inventory_data'] = table.to_pandas(split_blocks=True, self_destruct=True)
+                user_data['dataset_key'] = entry.get('dataset')
+            user_data['metadata'] = entry['metadata']
+            user_data['version'] = entry['version']
+        return user_data
+
+    def _expired(self, entry, now):
+        # `touched` puede atrasarse hasta _touch_interval(): ese margen evita vencerla antes de tiempo
+        return bool(self.ttl) and now - entry.get('touched', 0) > self.ttl + self._touch_interval()
+
+    def _touch_interval(self):
+        # Reescribir el índice en cada request sería caro: basta con una precisión bastante menor que el TTL
+        return min(SWEEP_INTERVAL_SECONDS, self.ttl / 4)
+
+    def _touch(self, user_id, now):
+        with self._index_lock():
+            self._index_cache = (None, {})
+            index = dict(self._read_index())
+            if user_id in index:
+                index[user_id] = {**index[user_id], 'touched': now}
+                self._write_index(index)
+
+    def _sweep_index(self, now):
+        """Quita del índice las sesiones vencidas y borra los archivos de datos que ya nadie usa."""
+        if not self.ttl or now - self._last_index_sweep < self._sweep_interval():
+            return
+        self._last_index_sweep = now
+        index = self._read_index()
+        expired = [uid for uid, entry in index.items() if self._expired(entry, now)]
+        if expired:
+            self._remove_entries(expired, now)
+        # Archivos sin entrada (proceso interrumpido entre escribirlo y registrarlo) más viejos que el TTL
+        with self._index_lock():
+            self._index_cache = (None, {})
+            in_use = {entry['path'] for entry in self._read_index().values()}
+            for entry in os.scandir(self._data_dir):
+                try:
+                    if entry.path not in in_use and now - entry.stat().st_mtime > self.ttl:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _remove_entries(self, user_ids, now):
+        """Quita las entradas todavía vencidas de `user_ids` (otro worker pudo usarlas) y borra sus archivos."""
+        with self._index_lock():
+            self._index_cache = (None, {})
+            index = dict(self._read_index())
+            removed = [index.pop(uid) for uid in user_ids if uid in index and self._expired(index[uid], now)]
+            if not removed:
+                return
+            self._write_index(index)
+            # Dentro del lock: save() no puede registrar un archivo de contenido mientras se borra
+            in_use = {entry['path'] for entry in index.values()}
+            for path in {entry['path'] for entry in removed} - in_use:
+                self._remove_file(path)
+
+    @staticmethod
+    def _remove_file(path):
+        # Los workers que aún tengan mapeado el archivo no se ven afectados
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _spill(self, user_id, user_data):
+        # El dataset ya está en el directorio compartido: basta con soltar la copia local
+        return self._read_index().get(user_id, {}).get('path')
+
+    def _reload(self, user_data, path, version):
+        # get() lo vuelve a abrir desde el índice (la versión local quedó en None)
+        pass
+
+    def _discard_spill(self, path):
+        # Los archivos compartidos los borra save() al reemplazarlos (otros workers pueden usarlos)
+        pass
+
+    def save(self, user_data):
+        df = user_data['inventory_data']
+        if df is None:
+            return
+        user_id = user_data['user_id']
+        dataset_key = user_data['dataset_key']
+        name = f"{dataset_key}.arrow" if dataset_key else f"{user_id}-{user_data['version']}.arrow"
+        path = os.path.join(self._data_dir, name)
+        if not (dataset_key and os.path.exists(path)):
+            self._write_frame(df, path)
+
+        with self._index_lock():
+            if not os.path.exists(path):
+                # Un barrido borró el archivo de contenido entre la verificación y el lock
+                self._write_frame(df, path)
+            # Releer sin caché: otro worker pudo escribir el índice
+            self._index_cache = (None, {})
+            index = dict(self._read_index())
+            previous = index.get(user_id)
+            index[user_id] = {
+                'version': user_data['version'],
+                'path': path,
+                'dataset': dataset_key,
+                'metadata': user_data['metadata'],
+                'touched': time.time()
+            }
+            self._write_index(index)
+            # Un archivo de contenido puede seguir en uso por otras sesiones
+            if previous and previous['path'] != path and all(e['path'] != previous['path'] for e in index.values()):
+                self._remove_file(previous['path'])
+
+    @staticmethod
+    def _write_frame(df, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        # Un solo record batch: con varios, to_pandas debe copiar para unir los trozos de cada columna
+        feather.write_feather(to_arrow_safe(df), tmp_path, compression='uncompressed', chunksize=max(len(df), 1))
+        os.replace(tmp_path, path)
+
+    def save_job(self, job):
+        """Estado del job en `jobs/<id>.json`, visible para cualquier worker que reciba el polling."""
+        path = os.path.join(self._jobs_dir, f"{job['id']}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        if job['state'] == 'queued':
+            self._prune_jobs()
+
+    def load_job(self, job_id):
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self._jobs_dir, f"{job_id}.json"), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prune_jobs(self):
+        # Los jobs activos se reescriben en cada avance, así que solo envejecen los terminados o abandonados
+        expired = time.time() - JOB_TTL_SECONDS
+        for name in os.listdir(self._jobs_dir):
+            path = os.path.join(self._jobs_dir, name)
+            try:
+                if os.path.getmtime(path) < expired:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def create_session_store(config, datasets=None):
+    """Crea el backend de sesiones según `SESSION_BACKEND` (`datasets`: registro de datasets compartidos)."""
+    backend = config.get('SESSION_BACKEND', 'memory')
+    ttl = config.get('SESSION_TTL_SECONDS')
+    budget_mb = config.get('SESSION_MEMORY_BUDGET_MB')
+    memory_budget = int(budget_mb * 1024 * 1024) if budget_mb else None
+    if backend == 'shared':
+        return SharedSessionStore(config['SHARED_STORE_DIR'], ttl, memory_budget, datasets)
+    if backend == 'memory':
+        return MemorySessionStore(ttl, memory_budget, config.get('SESSION_SPILL_DIR'), datasets)
+    raise ValueError(f"SESSION_BACKEND desconocido: {backend}")
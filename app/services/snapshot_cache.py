@@ -0,0 +1,77 @@
+import os
+import hashlib
+import logging
+import pyarrow.feather as feather
+from app.utils.frames import to_arrow_safe
+
+logger = logging.getLogger(__name__)
+
+# Incrementar cuando cambie el resultado del parseo para invalidar snapshots antiguos
+SNAPSHOT_VERSION = 3
+
+
+class SnapshotCache:
+    """Caché en disco de inventarios ya parseados (Feather), indexada por contenido.
+
+    Evita volver a parsear el Excel cuando se sube el mismo archivo o cuando el
+    proceso se reinicia con el inventario por defecto sin cambios.
+    """
+
+    def __init__(self, base_dir, max_files=50):
+        self.base_dir = base_dir
+        self.max_files = max_files
+        os.makedirs(base_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for_digest(digest):
+        """Clave por hash SHA-256 (hex) del contenido del archivo subido."""
+        return f"v{SNAPSHOT_VERSION}-{digest}"
+
+    @staticmethod
+    def key_for_file(path):
+        """Clave por ruta, mtime y tamaño (sin leer el archivo)."""
+        st = os.stat(path)
+        ident = f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}"
+        digest = hashlib.sha256(ident.encode('utf-8')).hexdigest()
+        return f"v{SNAPSHOT_VERSION}-file-{digest}"
+
+    def _path(self, key):
+        return os.path.join(self.base_dir, f"{key}.feather")
+
+    def load(self, key):
+        """Retorna el DataFrame del snapshot o None si no existe."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = feather.read_feather(path)
+        except Exception as e:
+            logger.warning("Snapshot corrupto %s: %s", path, e)
+            return None
+        os.utime(path)
+        return df
+
+    def store(self, key, df):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            feather.write_feather(to_arrow_safe(df), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning("No se pudo guardar snapshot %s: %s", path, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._prune()
+
+    def _prune(self):
+        """Elimina los snapshots menos usados si se supera `max_files`."""
+        entries = [e for e in os.scandir(self.base_dir) if e.name.endswith('.feather')]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
@@ -0,0 +1,110 @@
+import numpy as np
+from app.utils.metrics import cache_access
+
+# Claves de orden de /api/search: nombre -> columna del análisis
+SORT_KEYS = {
+    'stock': '_stock',
+    'value': '_cost_t',
+    'date': '_created',
+}
+
+
+def parse_sort(sort, available):
+    """Convierte `sort=value_desc,date_asc` en [(clave, ascendente)], ignorando claves desconocidas o sin columna."""
+    parsed = []
+    for part in (p.strip() for p in sort.split(',')):
+        key, _, direction = part.rpartition('_')
+        if key in available and direction in ('asc', 'desc'):
+            parsed.append((key, direction == 'asc'))
+    return parsed
+
+
+def _dense_rank(values):
+    """Rango denso ascendente (int32) con los nulos al final: rango == cantidad de valores distintos."""
+    if values.dtype.kind == 'M':
+        na = np.isnat(values)
+        values = values.view(np.int64)
+    else:
+        values = values.astype(np.float64, copy=False)
+        na = np.isnan(values)
+    ranks = np.empty(len(values), dtype=np.int32)
+    uniques, inverse = np.unique(values[~na], return_inverse=True)
+    ranks[~na] = inverse
+    ranks[na] = len(uniques)
+    return ranks, len(uniques)
+
+
+class SortIndex:
+    """Órdenes precalculados de /api/search por stock, valor y fecha de creación.
+
+    Cada clave guarda su rango denso por fila (los nulos siempre al final, como
+    na_position='last') y, al primer uso, la permutación estable de cada
+    dirección. Un orden por una sola clave recorre la permutación filtrando con
+    la máscara; con varias claves se combinan los rangos de las filas
+    seleccionadas en una clave int64 por fila.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self._ranks = {}
+        for key, col in SORT_KEYS.items():
+            if col in df.columns:
+                self._ranks[key] = _dense_rank(df[col].to_numpy())
+        self._permutations = {}
+
+    @property
+    def keys(self):
+        return tuple(self._ranks)
+
+    def _rank(self, key, ascending):
+        ranks, n_values = self._ranks[key]
+        if ascending:
+            return ranks, n_values
+        # Descendente con los nulos (rango n_values) todavía al final
+        return np.where(ranks == n_values, n_values, n_values - 1 - ranks).astype(np.int32), n_values
+
+    def _permutation(self, key, ascending):
+        cached = (key, ascending) in self._permutations
+        cache_access('sort_permutation', cached)
+        if not cached:
+            ranks, _ = self._rank(key, ascending)
+            self._permutations[(key, ascending)] = np.argsort(ranks, kind='stable').astype(np.int32)
+        return self._permutations[(key, ascending)]
+
+    def _composite(self, rows, sort_keys):
+        """Una clave int64 por fila (rangos de cada clave y la posición para desempatar), o None si no entra."""
+        composite = np.zeros(len(rows), dtype=np.int64)
+        capacity = 1
+        for key, ascending in sort_keys:
+            ranks, n_values = self._rank(key, ascending)
+            capacity *= n_values + 1
+            if capacity * self.n_rows >= np.iinfo(np.int64).max:
+                return None
+            composite = composite * (n_values + 1) + ranks[rows]
+        return composite * self.n_rows + rows
+
+    def order(self, mask, sort_keys):
+        """Todas las filas (posiciones, int32) que cumplen la máscara, en el orden pedido.
+
+        Sin claves quedan en el orden del dataset; el resultado completo se guarda
+        en el caché de consultas, así que las páginas siguientes son cortes.
+        """
+        if not sort_keys:
+            return np.flatnonzero(mask).astype(np.int32)
+
+        if len(sort_keys) == 1:
+            permutation = self._permutation(*sort_keys[0])
+            return permutation[mask[permutation]]
+
+        rows = np.flatnonzero(mask).astype(np.int32)
+        composite = self._composite(rows, sort_keys)
+        if composite is None:
+            # Demasiados valores distintos para una clave int64: orden lexicográfico completo (estable)
+            columns = [self._rank(key, ascending)[0][rows] for key, ascending in reversed(sort_keys)]
+            return rows[np.lexsort(columns)]
+        # La clave compuesta es única (incluye la fila): el orden es el mismo que el estable
+        return rows[np.argsort(composite)]
+
+    def memory_usage(self):
+        total = sum(ranks.nbytes for ranks, _ in self._ranks.values())
+        return total + sum(p.nbytes for p in self._permutations.values())
@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+from app.utils.constants import *
+from app.services.analysis import STOCK_STATUSES
+from app.services.serializers import products_to_records
+
+# Cantidad de filas que muestran los paneles agregados
+TOP_GROUPS = 15
+TOP_PRODUCTS = 20
+TOP_ALERTS = 100
+ALERT_STATUSES = ['negative', 'out_of_stock', 'critical']
+
+
+def stock_status_info(stock_thresholds):
+    """Etiqueta, color e ícono de cada estado de stock según los umbrales configurados."""
+    t = stock_thresholds
+    return {
+        'negative': {'label': 'Stock Negativo', 'color': '#dc2626', 'icon': '🔴'},
+        'out_of_stock': {'label': 'Sin Stock', 'color': '#f97316', 'icon': '🟠'},
+        'critical': {'label': f"Crítico (1-{t['critical']})", 'color': '#eab308', 'icon': '🟡'},
+        'low': {'label': f"Bajo ({t['critical'] + 1}-{t['low']})", 'color': '#84cc16', 'icon': '🟢'},
+        'optimal': {'label': f"Óptimo ({t['low'] + 1}-{t['optimal']})", 'color': '#22c55e', 'icon': '🟢'},
+        'overstock': {'label': f"Exceso (>{t['optimal']})", 'color': '#3b82f6', 'icon': '🔵'}
+    }
+
+
+# Columnas de los paneles agrupados (columna -> clave de cada fila del panel)
+GROUP_COLUMNS = {COL_CATEGORY: 'category', COL_BRAND: 'brand', COL_SUPPLIER: 'supplier', COL_STORE: 'store'}
+
+
+def summary_totals(df):
+    """Sumas y conteos aditivos de los que salen los KPIs y los paneles agrupados.
+
+    Se pueden restar y sumar por filas (combine_totals), así una carga delta
+    actualiza el resumen sin recorrer todo el inventario.
+    """
+    stock = df['_stock'].to_numpy()
+    value = df['_cost_t'].to_numpy()
+    margin_pct = df['margin_pct'].to_numpy()
+    negative = stock < 0
+    positive_margin = margin_pct[margin_pct > 0]
+
+    status_counts = df['stock_status'].value_counts().reindex(STOCK_STATUSES, fill_value=0)
+    return {
+        'rows': len(df),
+        'active': int(np.count_nonzero(stock > 0)),
+        'stock': int(stock.sum()),
+        'value': float(value.sum()),
+        'margin_sum': float(positive_margin.sum()),
+        'margin_count': len(positive_margin),
+        'negative_count': int(np.count_nonzero(negative)),
+        'negative_units': int(stock[negative].sum()),
+        'negative_value': float(value[negative].sum()),
+        'status': {status: int(count) for status, count in status_counts.items()},
+        'groups': {col: _group_table(df, col) for col in GROUP_COLUMNS if col in df.columns},
+    }
+
+
+def _group_table(df, col):
+    """Filas, productos, stock y valor por grupo con bincount sobre los códigos de la columna (orden de aparición)."""
+    codes, uniques = pd.factorize(df[col])
+    valid = codes >= 0
+    codes = codes[valid]
+    n_groups = len(uniques)
+    rows = np.bincount(codes, minlength=n_groups)
+    products = np.bincount(codes, weights=df[COL_ID].notna().to_numpy()[valid], minlength=n_groups) \
+        if COL_ID in df.columns else rows
+    return pd.DataFrame({
+        'rows': rows,
+        'products': products,
+        'stock': np.bincount(codes, weights=df['_stock'].to_numpy()[valid], minlength=n_groups),
+        'value': np.bincount(codes, weights=df['_cost_t'].to_numpy()[valid], minlength=n_groups),
+    }, index=pd.Index(uniques, dtype=object))
+
+
+def combine_totals(totals, added, removed):
+    """Totales de `totals` más los de `added` y menos los de `removed` (ver summary_totals)."""
+    combined = {}
+    for key, value in totals.items():
+        if key == 'status':
+            combined[key] = {s: value[s] + added[key][s] - removed[key][s] for s in STOCK_STATUSES}
+        elif key == 'groups':
+            combined[key] = {}
+            for col, table in value.items():
+                plus, minus = added['groups'][col], removed['groups'][col]
+                # Grupos nuevos al final: se conserva el orden de aparición (desempates del top)
+                index = table.index.append(plus.index.difference(table.index, sort=False))
+                table = table.reindex(index, fill_value=0) + plus.reindex(index, fill_value=0) \
+                    - minus.reindex(index, fill_value=0)
+                combined[key][col] = table[table['rows'] > 0]
+        else:
+            combined[key] = value + added[key] - removed[key]
+    return combined
+
+
+def _kpis(totals):
+    total_skus = totals['rows']
+    active_skus = totals['active']
+    total_stock = totals['stock']
+    status_counts = totals['status']
+    avg_margin = totals['margin_sum'] / totals['margin_count'] if totals['margin_count'] else 0
+
+    alerts = {
+        'out_of_stock': status_counts['out_of_stock'],
+        'negative_stock': status_counts['negative'],
+        'critical': status_counts['critical'],
+        'low': status_counts['low'],
+        'overstock': status_counts['overstock'],
+    }
+    alerts['total_alerts'] = alerts['out_of_stock'] + alerts['negative_stock'] + alerts['critical']
+
+    return {
+        'total_skus': total_skus,
+        'active_skus': active_skus,
+        'inactive_skus': total_skus - active_skus,
+        'total_stock': total_stock,
+        'total_value': round(totals['value'], 2),
+        'avg_stock': round(total_stock / total_skus, 2) if total_skus > 0 else 0,
+        'avg_margin_pct': round(avg_margin, 2),
+        'diferencias_count': totals['negative_count'],
+        'diferencias_units': totals['negative_units'],
+        'diferencias_value': round(totals['negative_value'], 2),
+        'alerts': alerts
+    }
+
+
+def _stock_status(totals, stock_thresholds):
+    info = stock_status_info(stock_thresholds)
+    result = []
+    for status in STOCK_STATUSES:
+        count = totals['status'][status]
+        if count == 0:
+            continue
+        result.append({
+            'status': status,
+            'label': info[status]['label'],
+            'count': count,
+            'percentage': round(count / totals['rows'] * 100, 1),
+            'color': info[status]['color'],
+            'icon': info[status]['icon']
+        })
+    return result
+
+
+def _group_totals(table, key):
+    """Top TOP_GROUPS grupos por valor de una tabla de _group_table."""
+    value = table['value'].to_numpy()
+    total_value = value.sum()
+
+    result = []
+    for i in np.argsort(-value, kind='stable')[:TOP_GROUPS]:
+        result.append({
+            key: table.index[i],
+            'products': int(table['products'].iat[i]),
+            'stock': int(table['stock'].iat[i]),
+            'value': round(float(value[i]), 2),
+            'value_pct': round(value[i] / total_value * 100, 1) if total_value > 0 else 0
+        })
+    return result
+
+
+def _with_stock(df):
+    return df['_stock'].to_numpy() > 0
+
+
+def _in_alert(df):
+    return df['stock_status'].isin(ALERT_STATUSES).to_numpy()
+
+
+# Listas "top" del resumen: filas candidatas y cantidad mostrada
+TOP_LISTS = {'top_products': (_with_stock, TOP_PRODUCTS), 'alerts': (_in_alert, TOP_ALERTS)}
+
+
+def top_rows(df, name):
+    """Filas (por etiqueta) de mayor valor entre las candidatas de la lista `name` de TOP_LISTS."""
+    candidates, limit = TOP_LISTS[name]
+    return df[candidates(df)].nlargest(limit, '_cost_t')
+
+
+def top_unchanged(df, name, positions, changed):
+    """Si la lista `name` (filas `positions` de `df`) sigue igual tras cambiar las filas `changed`.
+
+    Sigue igual si ninguna fila cambiada estaba en la lista y ninguna entra:
+    la lista estaba completa y las candidatas cambiadas valen menos que su
+    último elemento (un empate también obliga a recalcular).
+    """
+    if np.isin(changed, positions).any():
+        return False
+    candidates, limit = TOP_LISTS[name]
+    rows = df.iloc[changed]
+    values = rows['_cost_t'].to_numpy()[candidates(rows)]
+    if len(values) == 0:
+        return True
+    if len(positions) < limit:
+        return False
+    return values.max() < df['_cost_t'].to_numpy()[positions].min()
+
+
+def summary_from_totals(totals, stock_thresholds):
+    """Paneles del dashboard a partir de los totales de summary_totals."""
+    groups = totals['groups']
+    summary = {
+        'kpis': _kpis(totals),
+        'stock_status': _stock_status(totals, stock_thresholds),
+        'categories': _group_totals(groups[COL_CATEGORY], 'category') if COL_CATEGORY in groups else None,
+        'brands': _group_totals(groups[COL_BRAND], 'brand') if COL_BRAND in groups else None,
+        'suppliers': None,
+        'stores': _group_totals(groups[COL_STORE], 'store') if COL_STORE in groups else None,
+    }
+    if COL_SUPPLIER in groups:
+        summary['suppliers'] = [s for s in _group_totals(groups[COL_SUPPLIER], 'supplier') if s['supplier'] != '']
+    return summary
+
+
+def build_summary(df, stock_thresholds, totals=None, previous=None, changed=None):
+    """Agregados de los paneles del dashboard, calculados una vez por dataset analizado.
+
+    Los valores ya son serializables a JSON; los endpoints solo los devuelven.
+    En una carga delta se pasan los totales ya actualizados y el resumen
+    anterior: las listas top que no tocan las filas `changed` se reutilizan.
+    """
+    if totals is None:
+        totals = summary_totals(df)
+    summary = summary_from_totals(totals, stock_thresholds)
+    summary['_totals'] = totals
+    summary['_top_rows'] = {}
+    for name in TOP_LISTS:
+        if previous is not None and top_unchanged(df, name, previous['_top_rows'][name], changed):
+            summary[name] = previous[name]
+            summary['_top_rows'][name] = previous['_top_rows'][name]
+            continue
+        top = top_rows(df, name)
+        summary[name] = products_to_records(top, include_price=(name == 'alerts'))
+        summary['_top_rows'][name] = df.index.get_indexer(top.index)
+    return summary
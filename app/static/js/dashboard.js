@@ -57,70 +57,101 @@ function updateStatus(isConnected, message) {
   }
 }
 
+// Background jobs: consulta /api/jobs/<id> hasta que termina y reporta el avance real
+const JOB_POLL_MS = 500;
+
+async function pollJob(jobId, onProgress) {
+  while (true) {
+    const response = await fetch(`${API_URL}/jobs/${jobId}`, {
+      credentials: "include",
+    });
+    const job = await response.json();
+    if (!response.ok) throw new Error(job.error || "Job no encontrado");
+    if (job.state === "done") return job;
+    if (job.state === "error") throw new Error(job.error || "Error al procesar");
+    onProgress(job);
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+  }
+}
+
+// POST multipart con progreso real de bytes enviados (fetch no lo expone)
+function postFile(url, formData, onUploadProgress) {
+  return new Promise((resolve, reject) => {
+    const xhr = new XMLHttpRequest();
+    xhr.open("POST", url);
+    xhr.withCredentials = true;
+    xhr.upload.onprogress = (e) => {
+      if (e.lengthComputable) onUploadProgress(e.loaded, e.total);
+    };
+    xhr.onload = () => {
+      let data;
+      try {
+        data = JSON.parse(xhr.responseText);
+      } catch (e) {
+        reject(new Error("Respuesta inválida del servidor"));
+        return;
+      }
+      resolve({ ok: xhr.status >= 200 && xhr.status < 300, data });
+    };
+    xhr.onerror = () => reject(new Error("Error de conexión"));
+    xhr.send(formData);
+  });
+}
+
 // Upload Excel file
 async function uploadExcel(event) {
-  const file = event.target.files[0];
-  if (!file) return;
+  const files = Array.from(event.target.files);
+  if (!files.length) return;
+  const file = files[0];
+  // Varias tiendas (varios archivos o un zip) van a la carga masiva
+  const bulk = files.length > 1 || file.name.toLowerCase().endsWith(".zip");
 
   showUploadModal();
   updateUploadProgress(0, "Preparando archivo...", "Subiendo archivo...");
 
   const formData = new FormData();
-  formData.append("file", file);
+  files.forEach((f) => formData.append(bulk ? "files" : "file", f));
 
   try {
-    // Stage 1: Uploading (0-30%)
-    let progress = 0;
-    const uploadInterval = setInterval(() => {
-      if (progress < 30) {
-        progress += 5;
-        updateUploadProgress(progress, "Subiendo " + file.name);
-      }
-    }, 100);
-
-    const response = await fetch(`${API_URL}/upload`, {
-      method: "POST",
-      body: formData,
-      credentials: "include",
-    });
-
-    clearInterval(uploadInterval);
-    updateUploadProgress(30, "Archivo recibido");
-
-    // Stage 2: Processing (30-70%)
-    updateUploadProgress(40, "Procesando datos...", "Procesando Excel...");
+    // Stage 1: Uploading (0-30%) según los bytes enviados
+    const response = await postFile(
+      `${API_URL}/upload${bulk ? "/bulk" : ""}`,
+      formData,
+      (loaded, total) => {
+        const percent = Math.round((loaded / total) * 30);
+        updateUploadProgress(
+          percent,
+          `Subiendo ${bulk ? `${files.length} archivos` : file.name} (${formatNumber(Math.round(loaded / 1024))} KB)`,
+        );
+      },
+    );
 
-    let data;
-    try {
-      data = await response.json();
-    } catch (e) {
-      throw new Error("Respuesta inválida del servidor");
+    if (!response.ok) {
+      hideUploadModal();
+      updateStatus(false, response.data.error || "Error al cargar");
+      return;
     }
 
-    if (response.ok) {
-      updateUploadProgress(70, data.message);
+    // Stage 2: Parseo y análisis en el servidor (30-90%)
+    updateUploadProgress(30, "Archivo recibido", "Procesando Excel...");
+    const job = await pollJob(response.data.job_id, (job) => {
+      updateUploadProgress(30 + Math.round(job.progress * 0.6), job.message);
+    });
+    const data = job.result;
 
-      // Stage 3: Loading dashboard (70-100%)
-      updateUploadProgress(
-        80,
-        "Actualizando dashboard...",
-        "Cargando datos...",
-      );
-      const loadSuccess = await loadData();
-
-      if (loadSuccess) {
-        updateUploadProgress(100, "¡Completado!");
-        setTimeout(() => {
-          hideUploadModal();
-          updateStatus(true, data.message);
-        }, 500);
-      } else {
+    // Stage 3: Loading dashboard (90-100%)
+    updateUploadProgress(90, "Actualizando dashboard...", "Cargando datos...");
+    const loadSuccess = await loadData();
+
+    if (loadSuccess) {
+      updateUploadProgress(100, "¡Completado!");
+      setTimeout(() => {
         hideUploadModal();
-        updateStatus(false, "Datos subidos pero error al procesar");
-      }
+        updateStatus(true, data.message);
+      }, 500);
     } else {
       hideUploadModal();
-      updateStatus(false, data.error || "Error al cargar");
+      updateStatus(false, "Datos subidos pero error al procesar");
     }
   } catch (error) {
     console.error("Upload error:", error);
@@ -144,59 +175,33 @@ async function loadData() {
     `;
     document.getElementById("dashboard-content").classList.add("hidden");
 
-    const [
-      kpisRes,
-      stockStatusRes,
-      suppliersRes,
-      categoriesRes,
-      brandsRes,
-      topProductsRes,
-      alertsRes,
-      metadataRes,
-    ] = await Promise.all([
-      fetch(`${API_URL}/kpis`, { credentials: "include" }),
-      fetch(`${API_URL}/stock-status`, { credentials: "include" }),
-      fetch(`${API_URL}/suppliers`, { credentials: "include" }),
-      fetch(`${API_URL}/categories`, { credentials: "include" }),
-      fetch(`${API_URL}/brands`, { credentials: "include" }),
-      fetch(`${API_URL}/top-products`, { credentials: "include" }),
-      fetch(`${API_URL}/alerts`, { credentials: "include" }),
-      fetch(`${API_URL}/metadata`, { credentials: "include" }),
-    ]);
-
-    // Verificar que TODAS las respuestas sean exitosas
-    const allResponses = [
-      kpisRes,
-      stockStatusRes,
-      suppliersRes,
-      categoriesRes,
-      brandsRes,
-      topProductsRes,
-      alertsRes,
-      metadataRes,
-    ];
-    const failedRes = allResponses.find((r) => !r.ok);
-    if (failedRes) {
-      const errText = await failedRes.text().catch(() => "");
+    // Todos los paneles en una sola petición
+    const response = await fetch(`${API_URL}/dashboard`, {
+      credentials: "include",
+    });
+    if (!response.ok) {
+      const errText = await response.text().catch(() => "");
       let errData = {};
       try {
         errData = JSON.parse(errText);
       } catch (e) {}
 
-      console.error("API error:", failedRes.url, failedRes.status, errText);
+      console.error("API error:", response.url, response.status, errText);
       throw new Error(
-        errData.error || `Error ${failedRes.status} al cargar datos`,
+        errData.error || `Error ${response.status} al cargar datos`,
       );
     }
 
-    const kpis = await kpisRes.json();
-    const stockStatus = await stockStatusRes.json();
-    const suppliers = await suppliersRes.json();
-    const categories = await categoriesRes.json();
-    const brands = await brandsRes.json();
-    const topProducts = await topProductsRes.json();
-    const alerts = await alertsRes.json();
-    const metadata = await metadataRes.json();
+    const {
+      kpis,
+      stock_status: stockStatus,
+      suppliers,
+      categories,
+      brands,
+      top_products: topProducts,
+      alerts,
+      metadata,
+    } = await response.json();
 
     // Update header metadata
     if (metadata && metadata.store_name) {
@@ -219,7 +224,7 @@ async function loadData() {
     renderBrandsChart(brands);
     renderTopProductsTable(topProducts);
     renderAlertsTable(alerts);
-    populateCategoryFilter(categories);
+    populateCategoryFilter(categories || []);
     populateBrandFilter();
 
     updateStatus(true, `${formatNumber(kpis.total_skus)} productos`);
@@ -729,20 +734,49 @@ async function searchProducts(page = 1) {
   }
 }
 
-// Exportar tabla filtrada a Excel
-function exportToExcel() {
+// Exportar tabla filtrada (y en el mismo orden) a Excel
+async function exportToExcel(format = "xlsx") {
   const query = document.getElementById("search-input")?.value || "";
   const category = document.getElementById("filter-category")?.value || "";
   const brand = document.getElementById("filter-brand")?.value || "";
   const status = document.getElementById("filter-status")?.value || "";
+  const sort = getActiveSorts();
 
   const params = new URLSearchParams();
   if (query) params.append("q", query);
   if (category) params.append("category", category);
   if (brand) params.append("brand", brand);
   if (status) params.append("status", status);
+  if (sort) params.append("sort", sort);
+  if (format !== "xlsx") params.append("format", format);
+
+  if (format === "csv") {
+    // CSV se descarga en streaming: empieza de inmediato
+    window.location.href = `${API_URL}/export?${params}`;
+    return;
+  }
 
-  window.location.href = `${API_URL}/export?${params}`;
+  // Excel: el libro se genera en un job y se descarga al terminar
+  params.append("async", "1");
+  showUploadModal();
+  updateUploadProgress(0, "Preparando exportación...", "Exportando Excel...");
+  try {
+    const response = await fetch(`${API_URL}/export?${params}`, {
+      credentials: "include",
+    });
+    const data = await response.json();
+    if (!response.ok) throw new Error(data.error || "Error al exportar");
+    const job = await pollJob(data.job_id, (job) => {
+      updateUploadProgress(job.progress, job.message);
+    });
+    updateUploadProgress(100, job.message);
+    window.location.href = `${API_URL}/jobs/${job.id}/download`;
+    setTimeout(hideUploadModal, 500);
+  } catch (error) {
+    console.error("Export error:", error);
+    hideUploadModal();
+    updateStatus(false, error.message || "Error al exportar");
+  }
 }
 
 function renderSearchResults(data) {
@@ -0,0 +1,51 @@
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+# Niveles moderados: la compresión corre en cada respuesta, el máximo cuesta mucho más CPU por poco tamaño
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _encodings():
+    """Codificaciones que ofrece el servidor, en orden de preferencia."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(body, encoding):
+    """Comprime `body` (bytes) con 'br' o 'gzip'."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """Comprime las respuestas JSON de al menos COMPRESS_MIN_BYTES según el Accept-Encoding del cliente.
+
+    Las respuestas en streaming (exportaciones) y las que no son 200 se dejan como están.
+    """
+    if (response.status_code != 200 or response.mimetype != 'application/json'
+            or response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(_encodings())
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < current_app.config.get('COMPRESS_MIN_BYTES', 1024):
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """Instala la compresión de respuestas JSON (brotli si está instalado, si no gzip)."""
+    app.after_request(compress_response)
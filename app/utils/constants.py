@@ -11,3 +11,5 @@ COL_PRODUCT = 'Producto'
 COL_SKU = 'SKU'
 COL_ID = 'ID'
 COL_SUPPLIER = 'Proveedor'
+COL_CREATED = 'F. Creación'
+COL_STORE = 'Tienda'
@@ -0,0 +1,22 @@
+import pandas as pd
+import pyarrow as pa
+
+
+def to_arrow_safe(df):
+    """Prepara un DataFrame para serializarlo con Arrow (Feather/Parquet).
+
+    Las columnas object con tipos mezclados (p. ej. números y texto en la misma
+    columna del Excel) se convierten a texto conservando los nulos.
+    """
+    out = None
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if out is None:
+                out = df.copy(deep=False)
+            out[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    out = df if out is None else out
+    if not isinstance(out.index, pd.RangeIndex):
+        out = out.reset_index(drop=True)
+    return out
@@ -0,0 +1,94 @@
+import datetime
+import decimal
+import json
+import math
+
+import numpy as np
+import pandas as pd
+from flask import Response
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from app.utils.metrics import stage
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa el encoder estándar con el mismo `default`
+    orjson = None
+
+
+def _finite(obj):
+    """Copia de `obj` con NaN e infinitos como None, igual que orjson (el encoder estándar escribe NaN)."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+def _default(obj):
+    """Tipos que el encoder no conoce: escalares y arreglos de numpy/pandas, fechas y decimales."""
+    if obj is None or obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, np.generic):
+        return _finite(obj.item())
+    if isinstance(obj, (np.ndarray, pd.Series, pd.Index, pd.Categorical)):
+        return _finite(np.asarray(obj, dtype=object).tolist())
+    if isinstance(obj, (pd.Timestamp, datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj, sort_keys=True):
+    """Serializa `obj` a JSON (bytes UTF-8) con orjson si está instalado."""
+    with stage('serialize'):
+        if orjson is not None:
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=_default, option=option)
+        return json.dumps(_finite(obj), default=_default, sort_keys=sort_keys, ensure_ascii=False).encode('utf-8')
+
+
+def json_response(body, status=200):
+    """Respuesta JSON a partir de bytes ya serializados (p. ej. paneles cacheados con dumps_bytes)."""
+    return Response(body, status=status, mimetype='application/json')
+
+
+class OrjsonProvider(JSONProvider):
+    """Proveedor JSON de la app: orjson con soporte nativo de numpy y pandas.
+
+    Mantiene `sort_keys` como el proveedor por defecto de Flask; los NaN se
+    serializan como null (JSON válido) en vez de NaN.
+    """
+
+    sort_keys = True
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys)).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, sort_keys=self.sort_keys), mimetype=self.mimetype)
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Proveedor por defecto de Flask con soporte de numpy/pandas (cuando orjson no está instalado)."""
+
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        return super().dumps(_finite(obj), **kwargs)
+
+
+def init_json(app):
+    """Instala OrjsonProvider si orjson está disponible; si no, el encoder estándar con soporte de numpy."""
+    app.json = OrjsonProvider(app) if orjson is not None else NumpyJSONProvider(app)
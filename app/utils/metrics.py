@@ -0,0 +1,177 @@
+import bisect
+import logging
+import threading
+import time
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'seventeen_'
+# Límites (segundos) de los histogramas de duración
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Contadores e histogramas del proceso, expuestos en el formato de texto de Prometheus.
+
+    Cada worker de gunicorn tiene los suyos: /api/metrics muestra los del
+    worker que atiende el scrape (el label `pid` permite distinguirlos).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text):
+        self._meta[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Conteo por bucket (no acumulado), suma y total
+                histogram = self._histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+            histogram[0][bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self, gauges=()):
+        """Texto de exposición con los contadores, histogramas y `gauges` [(nombre, tipo, ayuda, [(labels, valor)])]."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self._histograms.items()}
+
+        families = {}
+        for (name, labels), value in sorted(counters.items()):
+            families.setdefault(name, []).append(f'{PREFIX}{name}{_labels(labels)} {_number(value)}')
+        for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+            lines = families.setdefault(name, [])
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + (float('inf'),), buckets):
+                cumulative += n
+                lines.append(f'{PREFIX}{name}_bucket{_labels(labels, [("le", _number(bound))])} {cumulative}')
+            lines.append(f'{PREFIX}{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{PREFIX}{name}_count{_labels(labels)} {count}')
+
+        meta = dict(self._meta)
+        for name, kind, help_text, samples in gauges:
+            meta[name] = (kind, help_text)
+            families[name] = sorted(f'{PREFIX}{name}{_labels(sorted(labels.items()))} {_number(value)}'
+                                    for labels, value in samples)
+
+        out = []
+        for name in sorted(families):
+            kind, help_text = meta.get(name, ('untyped', ''))
+            out.append(f'# HELP {PREFIX}{name} {help_text}')
+            out.append(f'# TYPE {PREFIX}{name} {kind}')
+            out.extend(families[name])
+        return '\n'.join(out) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('requests_total', 'counter', 'Requests HTTP atendidos por endpoint, método y status.')
+metrics.describe('request_seconds', 'histogram', 'Duración de los requests HTTP por endpoint.')
+metrics.describe('stage_seconds', 'histogram', 'Duración de cada etapa (parse, analysis, filter, serialize, ...).')
+metrics.describe('rows_scanned_total', 'counter', 'Filas procesadas por etapa.')
+metrics.describe('cache_requests_total', 'counter', 'Consultas a cachés internos por resultado (hit/miss).')
+
+
+class _Stage:
+    __slots__ = ('name', 'rows', 'start')
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        metrics.observe('stage_seconds', elapsed, stage=self.name)
+        if self.rows:
+            metrics.inc('rows_scanned_total', self.rows, stage=self.name)
+        if has_request_context():
+            timings = g.setdefault('stage_timings', {})
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed
+
+
+def stage(name, rows=None):
+    """Mide un bloque como etapa `name`; `rows` (o `.rows` asignado dentro del bloque) suma filas procesadas.
+
+    Dentro de un request la duración también se acumula para el header Server-Timing.
+    """
+    return _Stage(name, rows)
+
+
+def cache_access(cache, hit):
+    """Registra una consulta al caché `cache` (hit o miss)."""
+    metrics.inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def init_metrics(app):
+    """Mide cada request (métricas, Server-Timing y log de requests lentos) y, si está activado,
+    muestrea la pila de los requests para perfilar los que superan SLOW_REQUEST_SECONDS."""
+    from app.utils.profiler import SamplingProfiler
+
+    slow_seconds = app.config.get('SLOW_REQUEST_SECONDS', 1.0)
+    profiler = None
+    if app.config.get('PROFILE_SLOW_REQUESTS'):
+        profiler = SamplingProfiler(app.config.get('PROFILE_INTERVAL_MS', 5) / 1000)
+
+    @app.before_request
+    def start_request():
+        g.request_start = time.perf_counter()
+        g.stage_timings = {}
+        if profiler is not None:
+            profiler.start()
+
+    @app.after_request
+    def record_request(response):
+        elapsed = time.perf_counter() - g.request_start
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.inc('requests_total', endpoint=endpoint, method=request.method, status=str(response.status_code))
+        metrics.observe('request_seconds', elapsed, endpoint=endpoint, method=request.method)
+        timings = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in g.stage_timings.items()]
+        response.headers['Server-Timing'] = ', '.join(timings + [f'total;dur={elapsed * 1000:.1f}'])
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if 'request_start' not in g:
+            return
+        samples = profiler.stop() if profiler is not None else None
+        elapsed = time.perf_counter() - g.request_start
+        if elapsed < slow_seconds:
+            return
+        stages = ', '.join(f'{name}={seconds * 1000:.0f}ms' for name, seconds in g.stage_timings.items())
+        logger.warning('Request lento %s %s: %.2f s (%s)', request.method, request.full_path, elapsed, stages or '-')
+        if samples:
+            logger.warning('Perfil de %s (%d muestras):\n%s', request.path, sum(samples.values()),
+                           SamplingProfiler.format(samples))
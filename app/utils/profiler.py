@@ -0,0 +1,68 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Frames más internos que se conservan por muestra
+MAX_DEPTH = 40
+
+
+class SamplingProfiler:
+    """Perfilador por muestreo de los requests en curso.
+
+    Un thread de fondo toma cada `interval` segundos la pila de los threads
+    registrados con `start` (sys._current_frames); el request medido no ejecuta
+    código extra. `stop` retorna las pilas muestreadas en formato "collapsed"
+    (frames separados por ';'), listo para un flame graph.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._busy = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+            self._busy.set()
+            # Se crea al primer uso: dentro del proceso del worker y no en el master de gunicorn
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Deja de muestrear el thread actual y retorna sus muestras (Counter pila -> cantidad)."""
+        with self._lock:
+            return self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            # Sin requests registrados el thread espera en vez de despertar cada intervalo
+            self._busy.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._busy.clear()
+                    continue
+                frames = sys._current_frames()
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            code = frame.f_code
+            stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    @staticmethod
+    def format(samples, limit=15):
+        """Las `limit` pilas más frecuentes, una por línea ("pila cantidad")."""
+        return '\n'.join(f'{stack} {count}' for stack, count in samples.most_common(limit))
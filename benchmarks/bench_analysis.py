@@ -0,0 +1,114 @@
+"""Compara el análisis anterior (apply por fila) con el pipeline vectorizado de app/services/analysis.py.
+
+El análisis completo hace más trabajo que el anterior: parsea la fecha de
+creación y compacta el frame (textos repetidos como category, enteros a
+int32), que después abaratan filtros, orden y memoria de la sesión. Ese costo
+fijo domina en inventarios chicos: alrededor de 10k filas el análisis
+vectorizado es más lento que el anterior (~0.5-0.8x, unos pocos ms), y pasa a
+ser más rápido desde ~50k filas. La clasificación sola es más rápida en todos
+los tamaños.
+
+Uso: python -m benchmarks.bench_analysis [filas ...]   (por defecto 10000 100000 1000000)
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from app.services.analysis import analyze_inventory, classify_stock_status, classify_abc
+from benchmarks.generator import make_inventory
+
+
+def _legacy_status(stock):
+    if stock < 0: return 'negative'
+    if stock == 0: return 'out_of_stock'
+    if stock <= 5: return 'critical'
+    if stock <= 20: return 'low'
+    if stock <= 100: return 'optimal'
+    return 'overstock'
+
+
+def _legacy_abc(df):
+    df_sorted = df.sort_values('_cost_t', ascending=False)
+    total_value = df_sorted['_cost_t'].sum()
+    df_sorted['cumulative_pct'] = df_sorted['_cost_t'].cumsum() / total_value * 100 if total_value > 0 else 0
+    df_sorted['abc_class'] = df_sorted['cumulative_pct'].apply(lambda p: 'A' if p <= 80 else ('B' if p <= 95 else 'C'))
+    return df_sorted['abc_class']
+
+
+def legacy_classify(df):
+    """Solo la clasificación anterior (apply por fila + lambda sobre el acumulado)."""
+    df = df[['_stock', '_cost_t']].copy()
+    df['stock_status'] = df['_stock'].apply(_legacy_status)
+    df['abc_class'] = _legacy_abc(df)
+    return df
+
+
+def vectorized_classify(df):
+    return classify_stock_status(df['_stock'].to_numpy()), classify_abc(df['_cost_t'].to_numpy())
+
+
+def legacy_analyze(inventory_data):
+    """Análisis tal como estaba antes del pipeline vectorizado (referencia para el benchmark)."""
+    df = inventory_data.copy()
+
+    def get_col(idx):
+        s = pd.to_numeric(df.iloc[:, idx], errors='coerce').fillna(0)
+        return s.replace([np.inf, -np.inf], 0)
+
+    df['Marca'] = df['Marca'].fillna('SIN MARCA').astype(str).replace(['nan', 'NaN', ''], 'SIN MARCA')
+    df['Categoría'] = df['Categoría'].fillna('SIN CATEGORÍA').astype(str).replace(['nan', 'NaN', ''], 'SIN CATEGORÍA')
+    df['Producto'] = df['Producto'].fillna('').astype(str).replace(['nan', 'NaN'], '')
+    df['SKU'] = df['SKU'].fillna('').astype(str).replace(['nan', 'NaN'], '')
+    df['_stock'] = get_col(14)
+    df['_cost_u'] = get_col(15)
+    df['_cost_t'] = get_col(16)
+    df['_price'] = get_col(17)
+    df['stock_status'] = df['_stock'].apply(_legacy_status)
+    df['abc_class'] = _legacy_abc(df)
+
+    df['margin'] = df['_price'] - df['_cost_u']
+    df['margin_pct'] = np.where(df['_price'] > 0, (df['margin'] / df['_price'] * 100), 0)
+    df['margin_pct'] = df['margin_pct'].replace([np.inf, -np.inf, np.nan], 0)
+    return df
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(sizes):
+    print(f"{'filas':>10} {'etapa':>14} {'anterior (s)':>14} {'vectorizado (s)':>16} {'speedup':>8}")
+    for n_rows in sizes:
+        raw = make_inventory(n_rows)
+        analyzed = analyze_inventory(raw)
+        repeat = 3 if n_rows <= 100_000 else 1
+
+        # Mismo resultado de clasificación. En ABC solo pueden cambiar de clase filas de igual valor
+        # que caen en un corte: el sort anterior no era estable y las desempataba en otro orden
+        a = legacy_analyze(raw)
+        assert (a['stock_status'].to_numpy() == analyzed['stock_status'].astype(str).to_numpy()).all()
+        legacy_abc = a['abc_class'].to_numpy()
+        abc = analyzed['abc_class'].astype(str).to_numpy()
+        assert pd.Series(legacy_abc).value_counts().sort_index().equals(pd.Series(abc).value_counts().sort_index())
+        assert not ((legacy_abc != abc) & ~a['_cost_t'].duplicated(keep=False).to_numpy()).any()
+
+        stages = [
+            ('clasificación', lambda: legacy_classify(analyzed), lambda: vectorized_classify(analyzed)),
+            ('análisis', lambda: legacy_analyze(raw), lambda: analyze_inventory(raw)),
+        ]
+        for name, legacy_fn, vectorized_fn in stages:
+            legacy = best_of(legacy_fn, repeat)
+            vectorized = best_of(vectorized_fn, repeat)
+            print(f"{n_rows:>10,} {name:>14} {legacy:>14.3f} {vectorized:>16.3f} {legacy / vectorized:>7.1f}x")
+
+    print("El análisis vectorizado incluye fecha parseada y compact_frame, que el anterior no hace: "
+          "en inventarios chicos (~10k filas) ese costo fijo lo deja por debajo de 1x.")
+
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
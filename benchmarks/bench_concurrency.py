@@ -0,0 +1,183 @@
+"""Concurrencia del análisis con gunicorn en un worker gthread (ver gunicorn.conf.py).
+
+1. Mientras la sesión A analiza un inventario grande, la sesión B sube uno chico:
+   con un lock por dataset B termina sin esperar a A.
+2. Varias sesiones suben a la vez el mismo archivo: esperan un solo análisis
+   (single-flight) y comparten el dataset; `duplicated` debe quedar en 0.
+
+Para no generar un Excel de millones de filas, el inventario de cada archivo se
+deja antes en la caché de snapshots (clave = SHA-256 del contenido subido): el
+upload salta el parseo y el job pasa su tiempo en el análisis.
+
+Termina con error si B esperó a A o si hubo análisis repetidos. Las mismas
+verificaciones, con el cliente de pruebas de Flask, están en
+tests/test_concurrency.py.
+
+Uso: python -m benchmarks.bench_concurrency [filas_grande] [sesiones]   (por defecto 1000000 8)
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import hashlib
+import tempfile
+import subprocess
+import threading
+from http.cookiejar import CookieJar
+from urllib.request import Request, build_opener, HTTPCookieProcessor
+from app.services.snapshot_cache import SnapshotCache
+from benchmarks.generator import make_inventory
+
+SMALL_ROWS = 5_000
+SHARED_ROWS = 200_000
+THREADS = 8
+POLL_SECONDS = 0.02
+
+
+class Client:
+    """Una sesión de navegador: cookie propia y polling de jobs."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+
+    def get(self, path):
+        with self.opener.open(self.base_url + path, timeout=600) as response:
+            return json.loads(response.read())
+
+    def upload(self, filename, content):
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+        request = Request(self.base_url + '/api/upload', data=body,
+                          headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        with self.opener.open(request, timeout=600) as response:
+            return json.loads(response.read())['job_id']
+
+    def wait(self, job_id, stage=None):
+        """Espera a que el job termine (o llegue a `stage`); retorna el job."""
+        while True:
+            job = self.get(f'/api/jobs/{job_id}')
+            if job['state'] == 'error':
+                raise RuntimeError(job['error'])
+            if job['state'] == 'done' or job['stage'] == stage:
+                return job
+            time.sleep(POLL_SECONDS)
+
+
+def seed_snapshot(snapshot_dir, n_rows, seed):
+    """Contenido a subir cuyo inventario (n_rows filas) ya está en la caché de snapshots."""
+    content = f'inventario-{n_rows}-{seed}'.encode()
+    key = SnapshotCache.key_for_digest(hashlib.sha256(content).hexdigest())
+    SnapshotCache(snapshot_dir).store(key, make_inventory(n_rows, seed=seed))
+    return content
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, port):
+    config = os.path.join(workdir, 'gunicorn_bench.conf.py')
+    open(config, 'w').close()
+    env = dict(os.environ,
+               UPLOAD_FOLDER=workdir,
+               SNAPSHOT_DIR=os.path.join(workdir, 'snapshots'),
+               SESSION_SPILL_DIR=os.path.join(workdir, 'spill'),
+               SESSION_BACKEND='memory',
+               SESSION_MEMORY_BUDGET_MB='0',
+               JOB_WORKERS=str(THREADS))
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'w')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', config, '-k', 'gthread', '--threads', str(THREADS),
+         '-w', '1', '-b', f'127.0.0.1:{port}', '--timeout', '600', 'run:app'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env, stdout=log, stderr=log
+    )
+    probe = Client(f'http://127.0.0.1:{port}')
+    for _ in range(200):
+        try:
+            probe.get('/api/health')
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"gunicorn no respondió (ver {log.name})")
+
+
+def other_session_while_analysing(base_url, big, small):
+    a, b = Client(base_url), Client(base_url)
+    start_a = time.perf_counter()
+    job_a = a.upload('grande.xlsx', big)
+    a.wait(job_a, stage='analyzing')
+
+    start_b = time.perf_counter()
+    b.wait(b.upload('chica.xlsx', small))
+    b.get('/api/kpis')
+    b_seconds = time.perf_counter() - start_b
+    b_done = time.perf_counter()
+
+    a.wait(job_a)
+    a_done = time.perf_counter()
+    return b_seconds, a_done - start_a, a_done > b_done
+
+
+def same_file_sessions(base_url, content, n_sessions):
+    clients = [Client(base_url) for _ in range(n_sessions)]
+    before = clients[0].get('/api/memory')['datasets']
+    start = time.perf_counter()
+
+    def run(client):
+        client.wait(client.upload('misma.xlsx', content))
+        client.get('/api/kpis')
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    after = clients[0].get('/api/memory')['datasets']
+    return elapsed, after['built'] - before['built'], after['duplicated'] - before['duplicated']
+
+
+def main(big_rows, n_sessions):
+    with tempfile.TemporaryDirectory() as workdir:
+        snapshot_dir = os.path.join(workdir, 'snapshots')
+        print(f"Preparando snapshots ({big_rows:,}, {SHARED_ROWS:,} y {SMALL_ROWS:,} filas)...")
+        big = seed_snapshot(snapshot_dir, big_rows, 1)
+        shared = seed_snapshot(snapshot_dir, SHARED_ROWS, 2)
+        small = seed_snapshot(snapshot_dir, SMALL_ROWS, 3)
+
+        port = free_port()
+        server = start_server(workdir, port)
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            b_seconds, a_seconds, b_first = other_session_while_analysing(base_url, big, small)
+            print(f"gthread, {THREADS} threads, 1 worker")
+            print(f"  sesión B ({SMALL_ROWS:,} filas) lista en {b_seconds:.2f} s mientras A ({big_rows:,} filas) "
+                  f"analizaba; A tardó {a_seconds:.2f} s -> B {'no esperó a A' if b_first else 'ESPERÓ a A'}")
+
+            elapsed, built, duplicated = same_file_sessions(base_url, shared, n_sessions)
+            print(f"  {n_sessions} sesiones con el mismo archivo ({SHARED_ROWS:,} filas): {elapsed:.2f} s, "
+                  f"análisis ejecutados: {built}, repetidos: {duplicated}")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    failures = []
+    if not b_first:
+        failures.append("la sesión B esperó el análisis de A")
+    if duplicated:
+        failures.append(f"{duplicated} análisis repetidos del mismo archivo")
+    if failures:
+        sys.exit("FALLÓ: " + "; ".join(failures))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000, int(sys.argv[2]) if len(sys.argv) > 2 else 8)
@@ -0,0 +1,69 @@
+"""Costo de serializar a JSON las respuestas de la API: proveedor por defecto de Flask vs orjson (app/utils/json_provider.py).
+
+Uso: python -m benchmarks.bench_json [filas]   (por defecto 100000)
+"""
+import sys
+import time
+import numpy as np
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.services.analysis import analyze_inventory, DEFAULT_STOCK_THRESHOLDS
+from app.services import summary as summary_builder
+from app.services.serializers import products_to_records
+from app.utils.json_provider import dumps_bytes
+from benchmarks.generator import make_inventory
+
+SEARCH_LIMITS = (20, 1000, 10000)
+
+
+def build_payloads(df):
+    """Respuesta de cada endpoint tal como la arma la API."""
+    summary = {k: v for k, v in summary_builder.build_summary(df, DEFAULT_STOCK_THRESHOLDS).items()
+               if not k.startswith('_')}
+
+    payloads = {
+        '/kpis': summary['kpis'],
+        '/stock-status': summary['stock_status'],
+        '/categories': summary['categories'],
+        '/brands': summary['brands'],
+        '/suppliers': summary['suppliers'],
+        '/top-products': summary['top_products'],
+        '/alerts': summary['alerts'],
+        '/dashboard': dict(summary, metadata={'store_name': 'bench', 'upload_date': '-'}),
+    }
+    for limit in SEARCH_LIMITS:
+        results = products_to_records(df.iloc[:limit], include_price=True)
+        payloads[f'/search?limit={limit}'] = {
+            'results': results, 'total': len(df), 'showing': len(results), 'page': 1, 'pages': len(df) // limit
+        }
+    return payloads
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return np.median(times)
+
+
+def main(n_rows):
+    df = analyze_inventory(make_inventory(n_rows))
+    default = DefaultJSONProvider(Flask(__name__))
+
+    print(f"{n_rows:,} filas")
+    print(f"{'endpoint':>22} {'bytes antes':>12} {'bytes orjson':>13} {'flask':>9} {'orjson':>9} {'x':>6}")
+    for endpoint, payload in build_payloads(df).items():
+        repeat = 5 if endpoint.endswith('10000') else 50
+        before = median_ms(lambda: default.dumps(payload), repeat)
+        after = median_ms(lambda: dumps_bytes(payload), repeat)
+        size_before = len(default.dumps(payload).encode('utf-8'))
+        size_after = len(dumps_bytes(payload))
+        print(f"{endpoint:>22} {size_before:>12,} {size_after:>13,} {before:>7.2f}ms {after:>7.3f}ms {before / after:>5.0f}x")
+    print("Los paneles del dashboard se codifican una vez por dataset (InventoryService.get_panel_json);"
+          " los pedidos siguientes devuelven los bytes ya serializados.")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,66 @@
+"""Latencia de /api/search por texto: recorrido lineal anterior vs índice de trigramas (app/services/search_index.py).
+
+Uso: python -m benchmarks.bench_search [filas ...]   (por defecto 100000 1000000)
+"""
+import sys
+import time
+import numpy as np
+from app.utils.constants import *
+from app.services.analysis import analyze_inventory
+from app.services.search_index import SearchIndex
+from benchmarks.generator import make_inventory
+
+QUERIES = [
+    ('contains', 'taza blanco'),
+    ('contains', 'lámpara'),
+    ('contains', 'sk000042'),
+    ('contains', 'nova'),
+    ('contains', 'zz'),
+    ('prefix', 'sk00004'),
+    ('sku', 'sk0000042'),
+]
+
+
+def linear_scan(df, query):
+    """Filtro de texto tal como estaba antes del índice."""
+    return (
+        df[COL_PRODUCT].astype(str).str.lower().str.contains(query, na=False, regex=False) |
+        df[COL_SKU].astype(str).str.lower().str.contains(query, na=False, regex=False) |
+        df[COL_CATEGORY].astype(str).str.lower().str.contains(query, na=False, regex=False) |
+        df[COL_BRAND].astype(str).str.lower().str.contains(query, na=False, regex=False)
+    ).to_numpy()
+
+
+def percentiles_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return np.percentile(times, 50), np.percentile(times, 95)
+
+
+def main(sizes):
+    for n_rows in sizes:
+        df = analyze_inventory(make_inventory(n_rows))
+        start = time.perf_counter()
+        index = SearchIndex(df)
+        build = time.perf_counter() - start
+        print(f"\n{n_rows:,} filas: índice construido en {build:.2f} s, {index.memory_usage() / 2**20:.1f} MB")
+        print(f"{'match':>9} {'q':>16} {'filas':>8} {'lineal p50':>11} {'índice p50':>11} {'índice p95':>11}")
+
+        repeat = 5 if n_rows <= 100_000 else 3
+        for match, query in QUERIES:
+            hits = index.mask(query, match)
+            if match == 'contains':
+                assert (hits == linear_scan(df, query)).all(), query
+                linear, _ = percentiles_ms(lambda: linear_scan(df, query), repeat)
+                linear = f"{linear:.1f}ms"
+            else:
+                linear = '-'
+            p50, p95 = percentiles_ms(lambda: index.mask(query, match), repeat * 4)
+            print(f"{match:>9} {query:>16} {int(hits.sum()):>8,} {linear:>11} {p50:>9.2f}ms {p95:>9.2f}ms")
+
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [100_000, 1_000_000])
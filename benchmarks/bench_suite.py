@@ -0,0 +1,467 @@
+"""Suite de benchmarks de punta a punta con inventarios sintéticos (benchmarks/generator.py).
+
+Por cada tamaño mide, con el test client de Flask y la configuración de producción:
+  ingest     /api/upload (parseo + análisis), el mismo contenido desde otra sesión,
+             /api/upload/bulk (4 tiendas) y /api/upload/delta (1% de filas)
+  analysis   InventoryService.get_analysis sobre el inventario ya parseado
+  endpoints  cada endpoint de lectura de /api/* (más revalidaciones 304 con ETag y búsquedas
+             con el caché de consultas vacío)
+  export     /api/export en csv y xlsx, completo y filtrado, y como job
+
+Cada medición reporta n, media, mínimo, p50, p90, p99 y máximo en ms, el pico
+de RSS del proceso (y cuánto creció sobre el RSS al empezar) y, en endpoints y
+exportaciones, el status y los bytes enviados. Cada tamaño corre en un proceso
+nuevo para que el pico de memoria no arrastre el tamaño anterior. Los
+resultados van a un JSON (benchmarks/results/ por defecto) comparable con
+--compare. Los archivos generados se guardan en --data-dir y se reutilizan.
+
+Uso: python -m benchmarks.bench_suite [filas ...] [--repeat N] [--ingest-repeat N] [--seed N] [--output ruta.json]
+     python -m benchmarks.bench_suite --compare base.json nuevo.json
+     (por defecto 10000 100000; se puede llegar a 1000000)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from benchmarks.generator import make_inventory, write_workbook
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, 'benchmarks', 'results')
+
+BROWSER_HEADERS = {'Accept-Encoding': 'gzip, deflate, br'}
+BULK_STORES = ('Lima', 'Arequipa', 'Cusco', 'Trujillo')
+DELTA_SHARE = 0.01
+POLL_SECONDS = 0.01
+
+ENDPOINTS = [
+    '/api/health',
+    '/api/metadata',
+    '/api/memory',
+    '/api/metrics',
+    '/api/dashboard',
+    '/api/kpis',
+    '/api/stock-status',
+    '/api/categories',
+    '/api/brands',
+    '/api/suppliers',
+    '/api/alerts',
+    '/api/top-products',
+    '/api/unique-brands',
+    '/api/unique-brands?category=Cocina',
+    '/api/search',
+    '/api/search?q=taza',
+    '/api/search?q=l%C3%A1mpara&limit=1000',
+    '/api/search?q=sk00001&match=prefix',
+    '/api/search?q=sk0000042&match=sku',
+    '/api/search?category=Cocina&status=critical&sort=value_desc',
+    '/api/search?sort=date_asc,stock_desc&page=50',
+    '/api/facets',
+    '/api/facets?q=taza&category=Cocina',
+]
+# Con la sesión de la carga masiva (varias tiendas)
+STORE_ENDPOINTS = [
+    '/api/stores',
+    '/api/dashboard?store=Cusco',
+    '/api/kpis?store=Cusco',
+    '/api/search?store=Cusco&q=taza',
+]
+# Además con el caché de consultas vacío: filtrado y orden completos en cada petición
+UNCACHED_ENDPOINTS = ['/api/search?category=Cocina&status=critical&sort=value_desc', '/api/search?sort=date_asc,stock_desc&page=50',
+                      '/api/facets?q=taza&category=Cocina']
+# Segunda petición con el ETag de la primera (dashboard que se recarga sin cambios de datos)
+CONDITIONAL_ENDPOINTS = ['/api/dashboard', '/api/search?q=taza']
+EXPORTS = [
+    '/api/export?format=csv',
+    '/api/export?format=csv&q=taza',
+    '/api/export?format=xlsx&q=taza',
+    '/api/export?format=xlsx',
+]
+
+
+class PeakMemory:
+    """Pico de RSS del proceso durante un bloque (VmHWM de Linux, reiniciado con /proc/self/clear_refs)."""
+
+    def __enter__(self):
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+        self.start_kb = self._status('VmRSS')
+        return self
+
+    def __exit__(self, *exc):
+        self.peak_kb = self._status('VmHWM')
+
+    @staticmethod
+    def _status(field):
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith(field + ':'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    def report(self):
+        if self.peak_kb is None:
+            return {}
+        return {'peak_rss_mb': round(self.peak_kb / 1024, 1),
+                'peak_growth_mb': round((self.peak_kb - self.start_kb) / 1024, 1)}
+
+
+def latency_stats(times_ms):
+    times = np.asarray(times_ms)
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    return {
+        'n': len(times),
+        'mean_ms': round(float(times.mean()), 3),
+        'min_ms': round(float(times.min()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p90_ms': round(float(p90), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(times.max()), 3),
+    }
+
+
+def measure(run, repeat, setup=None, teardown=None):
+    """Ejecuta `run(estado)` `repeat` veces (estado = setup(), fuera del tiempo medido).
+
+    `run` puede retornar un dict con datos de la respuesta (status, bytes); se
+    conserva el de la última ejecución.
+    """
+    times, info = [], {}
+    with PeakMemory() as memory:
+        for _ in range(repeat):
+            state = setup() if setup else None
+            start = time.perf_counter()
+            info = run(state) or {}
+            times.append((time.perf_counter() - start) * 1000)
+            if teardown:
+                teardown(state)
+    return {**latency_stats(times), **memory.report(), **info}
+
+
+# --- Archivos de entrada -------------------------------------------------------------------------------
+
+def _cached(path, write):
+    if not os.path.exists(path):
+        tmp = path + '.tmp'
+        write(tmp)
+        os.replace(tmp, path)
+    return path
+
+
+def prepare_files(df, rows, seed, data_dir, variants):
+    """Workbooks del inventario completo, de la carga masiva y deltas; uno por repetición.
+
+    Cada repetición usa un archivo distinto (cambia el título del reporte) para
+    que la carga no salga del registro de datasets y se mida el parseo real.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    stem = os.path.join(data_dir, f'inventario-{rows}-s{seed}')
+    files = {'full': [], 'bulk': [], 'delta': []}
+    for k in range(variants):
+        files['full'].append(_cached(f'{stem}-{k}.xlsx', lambda p: write_workbook(
+            df, p, f'Reporte de Inventario ({k + 1})')))
+
+        parts = np.array_split(np.arange(len(df)), len(BULK_STORES))
+        files['bulk'].append([
+            (f'{store}.xlsx', _cached(f'{stem}-{store}-{k}.xlsx', lambda p, rows=part, store=store: write_workbook(
+                df.iloc[rows], p, f'Inventario {store} ({k + 1})')))
+            for store, part in zip(BULK_STORES, parts)
+        ])
+
+        def write_delta(path, k=k):
+            rng = np.random.default_rng(seed + 1000 + k)
+            delta = df.iloc[np.sort(rng.choice(len(df), max(1, int(len(df) * DELTA_SHARE)), replace=False))].copy()
+            delta['Stock'] = delta['Stock'] + rng.integers(1, 30, len(delta))
+            delta['Costo T'] = np.round(delta['Stock'] * delta['Costo U'], 2)
+            write_workbook(delta, path, f'Delta ({k + 1})')
+        files['delta'].append(_cached(f'{stem}-delta-{k}.xlsx', write_delta))
+    return files
+
+
+# --- Cliente -----------------------------------------------------------------------------------------------
+
+def _wait_job(client, response):
+    if response.status_code != 202:
+        raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+    job_id = response.get_json()['job_id']
+    while True:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['state'] == 'error':
+            raise RuntimeError(job['error'])
+        if job['state'] == 'done':
+            return job
+        time.sleep(POLL_SECONDS)
+
+
+def _post_files(client, url, field, files, form=None):
+    handles = [(open(path, 'rb'), name) for name, path in files]
+    try:
+        data = dict(form or {})
+        data[field] = handles if len(handles) > 1 else handles[0]
+        _wait_job(client, client.post(url, data=data, content_type='multipart/form-data'))
+    finally:
+        for handle, _ in handles:
+            handle.close()
+
+
+def _get(client, url, headers=None):
+    response = client.get(url, headers=headers or BROWSER_HEADERS)
+    size = len(response.get_data())
+    response.close()
+    return {'status': response.status_code, 'bytes': size}
+
+
+def _cycle(items):
+    state = {'i': 0}
+
+    def next_item():
+        item = items[state['i'] % len(items)]
+        state['i'] += 1
+        return item
+    return next_item
+
+
+# --- Secciones ---------------------------------------------------------------------------------------------
+
+def bench_ingest(app, files, repeat):
+    results = {}
+    client = app.test_client()
+    full = _cycle(files['full'])
+    results['upload'] = measure(lambda path: _post_files(client, '/api/upload', 'file', [('inventario.xlsx', path)]),
+                                repeat, setup=full)
+
+    # Mismo contenido que la sesión anterior: la otra sesión comparte el dataset ya analizado
+    last = files['full'][(repeat - 1) % len(files['full'])]
+    results['upload_same_content'] = measure(
+        lambda other: _post_files(other, '/api/upload', 'file', [('inventario.xlsx', last)]),
+        repeat, setup=app.test_client)
+
+    bulk_client = app.test_client()
+    bulk = _cycle(files['bulk'])
+    results['upload_bulk'] = measure(lambda parts: _post_files(bulk_client, '/api/upload/bulk', 'files', parts),
+                                     repeat, setup=bulk)
+    return results, client, bulk_client
+
+
+def bench_delta(client, files, repeat):
+    delta = _cycle(files['delta'])
+    return {'upload_delta': measure(
+        lambda path: _post_files(client, '/api/upload/delta', 'file', [('delta.xlsx', path)], {'store': ''}),
+        repeat, setup=delta)}
+
+
+def bench_analysis(app, raw, repeat):
+    from app.services.inventory_service import InventoryService
+
+    def setup():
+        ctx = app.test_request_context()
+        ctx.push()
+        user_data = InventoryService.get_user_session()
+        InventoryService.set_inventory(user_data, raw, {'store_name': 'benchmark', 'upload_date': ''})
+        return ctx, user_data
+
+    def teardown(state):
+        ctx, user_data = state
+        InventoryService.set_inventory(user_data, None, {})
+        ctx.pop()
+
+    def run(state):
+        InventoryService.get_analysis()
+
+    return {'get_analysis': measure(run, repeat, setup, teardown)}
+
+
+def _clear_query_cache():
+    from app.services import inventory_service
+    inventory_service._queries.clear()
+
+
+def bench_endpoints(client, bulk_client, repeat):
+    results = {}
+    for url in ENDPOINTS:
+        results[url] = measure(lambda _: _get(client, url), repeat)
+    for url in UNCACHED_ENDPOINTS:
+        results[f'{url} (sin caché)'] = measure(lambda _: _get(client, url), repeat, setup=_clear_query_cache)
+    for url in STORE_ENDPOINTS:
+        results[f'{url} (bulk)'] = measure(lambda _: _get(bulk_client, url), repeat)
+    for url in CONDITIONAL_ENDPOINTS:
+        etag = client.get(url, headers=BROWSER_HEADERS).headers.get('ETag')
+        headers = {**BROWSER_HEADERS, 'If-None-Match': etag or ''}
+        results[f'{url} (If-None-Match)'] = measure(lambda _: _get(client, url, headers), repeat)
+    return results
+
+
+def bench_export(client, repeat):
+    results = {url: measure(lambda _: _get(client, url), repeat) for url in EXPORTS}
+
+    def export_job(_):
+        job = _wait_job(client, client.get('/api/export?format=xlsx&async=1'))
+        return _get(client, f"/api/jobs/{job['id']}/download")
+    results['/api/export?format=xlsx&async=1'] = measure(export_job, repeat)
+    return results
+
+
+def _progress(rows, step):
+    print(f"[{rows:,} filas] {step}...", file=sys.stderr)
+
+
+def run_rows(rows, options, result_path):
+    """Mide un tamaño (en un proceso propio) y escribe sus resultados en `result_path`."""
+    from app import create_app
+    from app.config import config, ProductionConfig
+    from app.services.excel_reader import read_inventory_excel
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config['benchmark'] = type('BenchmarkConfig', (ProductionConfig,), {
+            'UPLOAD_FOLDER': workdir,
+            'SNAPSHOT_DIR': None,  # cada carga parsea el Excel (sin caché de snapshots)
+            'SESSION_MEMORY_BUDGET_MB': 0,
+            'SESSION_SPILL_DIR': os.path.join(workdir, 'spill'),
+            'LOG_LEVEL': 'WARNING',  # el log por upload no debe mezclarse con el progreso ni pesar en los tiempos
+        })
+        df = make_inventory(rows, options['seed'])
+        _progress(rows, f"preparando archivos en {options['data_dir']}")
+        files = prepare_files(df, rows, options['seed'], options['data_dir'], options['ingest_repeat'])
+        with open(files['full'][0], 'rb') as f:
+            raw = read_inventory_excel(f, '.xlsx')
+
+        app = create_app('benchmark')
+        repeat, ingest_repeat = options['repeat'], options['ingest_repeat']
+        _progress(rows, 'ingest')
+        ingest, client, bulk_client = bench_ingest(app, files, ingest_repeat)
+        _progress(rows, 'analysis')
+        analysis = bench_analysis(app, raw, ingest_repeat)
+        _progress(rows, 'endpoints')
+        endpoints = bench_endpoints(client, bulk_client, repeat)
+        _progress(rows, 'export')
+        export = bench_export(client, ingest_repeat)
+        # Al final: el delta modifica los datos de la sesión usada por endpoints y exportaciones
+        _progress(rows, 'delta')
+        ingest.update(bench_delta(client, files, ingest_repeat))
+        results = {'ingest': ingest, 'analysis': analysis, 'endpoints': endpoints, 'export': export}
+
+    with open(result_path, 'w') as f:
+        json.dump(results, f)
+
+
+# --- Resultados --------------------------------------------------------------------------------------------
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, timeout=30).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'orjson': getattr(orjson, '__version__', None),
+        'brotli': getattr(brotli, '__version__', None),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def _flatten(results):
+    return {
+        (rows, section, name): entry
+        for rows, sections in results['runs'].items()
+        for section, entries in sections.items()
+        for name, entry in entries.items()
+    }
+
+
+def compare(base_path, new_path):
+    """Tabla de p50 y pico de memoria de dos archivos de resultados (ratio > 1: más lento)."""
+    with open(base_path) as f:
+        base = _flatten(json.load(f))
+    with open(new_path) as f:
+        new = _flatten(json.load(f))
+    print(f"{'filas':>9}  {'medición':<62} {'p50 base':>10} {'p50 nuevo':>10} {'ratio':>6} {'pico MB':>15}")
+    for key in sorted(base.keys() & new.keys(), key=lambda k: (int(k[0]), k[1], k[2])):
+        old, cur = base[key], new[key]
+        ratio = cur['p50_ms'] / old['p50_ms'] if old['p50_ms'] else float('nan')
+        memory = f"{old.get('peak_rss_mb', '-')} -> {cur.get('peak_rss_mb', '-')}"
+        print(f"{int(key[0]):>9,}  {key[1] + ' ' + key[2]:<62} {old['p50_ms']:>10.2f} {cur['p50_ms']:>10.2f} "
+              f"{ratio:>6.2f} {memory:>15}")
+    for key in sorted(base.keys() ^ new.keys()):
+        print(f"{int(key[0]):>9,}  {key[1] + ' ' + key[2]:<62} solo en {'base' if key in base else 'nuevo'}")
+
+
+def print_summary(results):
+    for rows, sections in results['runs'].items():
+        print(f"\n{int(rows):,} filas")
+        for section, entries in sections.items():
+            for name, entry in entries.items():
+                extra = f"  {entry['bytes']:,} B" if 'bytes' in entry else ''
+                print(f"  {section:<9} {name:<62} p50 {entry['p50_ms']:>9.2f} ms  p99 {entry['p99_ms']:>9.2f} ms  "
+                      f"pico {entry.get('peak_rss_mb', '-')} MB{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de ingesta, análisis, endpoints y exportación.')
+    parser.add_argument('rows', type=int, nargs='*', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=20, help='repeticiones por endpoint')
+    parser.add_argument('--ingest-repeat', type=int, default=3, help='repeticiones de cargas, análisis y exportaciones')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'seventeen_bench'))
+    parser.add_argument('--output', help='archivo de resultados (por defecto benchmarks/results/<fecha>-<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NUEVO'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    options = {'seed': args.seed, 'repeat': args.repeat, 'ingest_repeat': args.ingest_repeat, 'data_dir': args.data_dir}
+    results = {'meta': {**environment(), **options, 'rows': args.rows}, 'runs': {}}
+    context = multiprocessing.get_context('spawn')
+    for rows in args.rows:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
+            result_path = tmp.name
+        try:
+            process = context.Process(target=run_rows, args=(rows, options, result_path))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise SystemExit(f"el benchmark de {rows:,} filas terminó con código {process.exitcode}")
+            with open(result_path) as f:
+                results['runs'][str(rows)] = json.load(f)
+        finally:
+            os.remove(result_path)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{results['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print_summary(results)
+    print(f"\nResultados: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Generador determinista (por semilla) de inventarios sintéticos con el layout real del Excel.
+
+Las 18 columnas siguen constants.py: ID, F. Creación, SKU, Producto,
+Categoría, Marca, Proveedor, siete columnas de detalle y Stock, Costo U,
+Costo T, Precio en las posiciones IDX_STOCK..IDX_PRICE. Las distribuciones
+imitan un inventario de tienda: pocas categorías/marcas concentran la mayoría
+de los productos, hay vacíos, stock negativo o en cero y productos sin precio.
+
+Uso: python -m benchmarks.generator filas salida.xlsx|salida.csv [--seed N] [--title TEXTO]
+"""
+import argparse
+import csv
+import os
+import numpy as np
+import pandas as pd
+
+CATEGORIES = [
+    'Hogar', 'Cocina', 'Oficina', 'Electrónica', 'Ferretería', 'Limpieza', 'Juguetes', 'Deportes',
+    'Jardín', 'Iluminación', 'Baño', 'Papelería', 'Mascotas', 'Automotriz', 'Bebés', 'Textil',
+    'Decoración', 'Herramientas', 'Pinturas', 'Electricidad', 'Gasfitería', 'Seguridad', 'Regalos',
+    'Temporada', 'Camping', 'Computación', 'Telefonía', 'Audio', 'Salud', 'Belleza',
+]
+SUPPLIERS = [f'Distribuidora {name}' for name in (
+    'Andina', 'del Sur', 'Norte', 'Central', 'Pacífico', 'Lima', 'Arequipa', 'Cusco', 'Trujillo', 'Piura',
+)] + [f'Importaciones {i:02d}' for i in range(1, 31)]
+BRANDS = [f'{prefix}{suffix}' for prefix in ('Alfa', 'Nova', 'Max', 'Eco', 'Pro', 'Star', 'Tec', 'Home',
+                                             'Fix', 'Top') for suffix in ('', 'plus', 'line', 'tek', ' Home',
+                                                                          'ware', ' Pro', 'mart', 'ex', 'on',
+                                                                          'ia', 'co', 'ix', 'al', 'max',
+                                                                          'ora', 'us', 'net', 'go', 'ly')]
+NOUNS = ['Taza', 'Mesa', 'Silla', 'Lámpara', 'Cable', 'Cuaderno', 'Martillo', 'Balde', 'Foco', 'Olla',
+         'Sartén', 'Toalla', 'Cortina', 'Pelota', 'Audífono', 'Cargador', 'Mouse', 'Teclado', 'Maceta',
+         'Manguera', 'Candado', 'Tijera', 'Brocha', 'Enchufe', 'Linterna', 'Mochila', 'Termo', 'Espejo']
+ADJECTIVES = ['Blanco', 'Negro', 'Grande', 'Pequeño', 'Premium', 'Económico', 'Plegable', 'Inalámbrico',
+              'Reforzado', 'Clásico', 'Compacto', 'Deluxe', 'Mini', 'XL', 'Ecológico', 'Portátil']
+UNITS = ['UND', 'CAJA', 'PAQ', 'KG', 'MT', 'JGO']
+COLORS = ['Blanco', 'Negro', 'Rojo', 'Azul', 'Verde', 'Gris', 'Plateado', None]
+
+# Columnas de detalle entre Proveedor y Stock (el análisis no las usa; ocupan las posiciones 7..13)
+DETAIL_COLUMNS = ['Unidad', 'Ubicación', 'Código de Barras', 'Modelo', 'Color', 'Stock Mínimo', 'Stock Máximo']
+
+
+def _zipf_choice(rng, values, n, skew=1.1):
+    """Elige entre `values` con pesos 1/rank^skew (unos pocos valores concentran la mayoría de filas)."""
+    weights = 1 / np.arange(1, len(values) + 1) ** skew
+    order = rng.permutation(len(values))
+    return np.asarray(values, dtype=object)[order][rng.choice(len(values), n, p=weights / weights.sum())]
+
+
+def _with_gaps(rng, values, null_share, empty_share=0.0):
+    """`values` con una fracción de nulos (celda vacía) y de textos vacíos."""
+    values = values.copy()
+    draw = rng.random(len(values))
+    values[draw < null_share] = None
+    values[(draw >= null_share) & (draw < null_share + empty_share)] = ''
+    return values
+
+
+def make_inventory(n_rows, seed=0):
+    """Inventario crudo de `n_rows` filas (mismo resultado para la misma semilla)."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n_rows + 1)
+
+    # Stock: ~3% negativo, ~8% en cero y el resto con cola larga
+    stock = np.round(rng.lognormal(2.8, 1.1, n_rows)).astype(np.int64)
+    draw = rng.random(n_rows)
+    stock[draw < 0.08] = 0
+    stock[draw < 0.03] = -rng.integers(1, 20, int((draw < 0.03).sum()))
+    cost_u = np.round(rng.lognormal(2.5, 1.0, n_rows), 2)
+    price = np.round(cost_u * rng.uniform(1.05, 1.9, n_rows), 1)
+    price[rng.random(n_rows) < 0.02] = 0
+
+    created = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365, n_rows), unit='D')
+    nouns = rng.choice(NOUNS, n_rows)
+    adjectives = rng.choice(ADJECTIVES, n_rows)
+    models = rng.integers(100, 9999, n_rows)
+    minimum = rng.integers(0, 20, n_rows)
+
+    data = {
+        'ID': ids,
+        'F. Creación': created,
+        'SKU': [f'SK{i:07d}' for i in ids],
+        'Producto': [f'{n} {a} {m}' for n, a, m in zip(nouns, adjectives, models)],
+        'Categoría': _with_gaps(rng, _zipf_choice(rng, CATEGORIES, n_rows), 0.02),
+        'Marca': _with_gaps(rng, _zipf_choice(rng, BRANDS, n_rows), 0.02, 0.01),
+        'Proveedor': _with_gaps(rng, _zipf_choice(rng, SUPPLIERS, n_rows, skew=0.8), 0.01),
+        'Unidad': rng.choice(UNITS, n_rows),
+        'Ubicación': [f'{chr(65 + a)}-{b:02d}' for a, b in zip(rng.integers(0, 8, n_rows), rng.integers(1, 40, n_rows))],
+        'Código de Barras': [f'775{v:010d}' for v in rng.integers(0, 10 ** 10, n_rows)],
+        'Modelo': [f'M-{m}' for m in models],
+        'Color': rng.choice(np.asarray(COLORS, dtype=object), n_rows),
+        'Stock Mínimo': minimum,
+        'Stock Máximo': minimum + rng.integers(20, 300, n_rows),
+        'Stock': stock,
+        'Costo U': cost_u,
+        'Costo T': np.round(stock * cost_u, 2),
+        'Precio': price,
+    }
+    return pd.DataFrame(data)
+
+
+def _cell(value):
+    if value is None or value is pd.NaT or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def write_workbook(df, path, title='Reporte de Inventario'):
+    """Escribe `df` como el reporte real: título en la fila 1, encabezado en la 2 y datos desde la 3."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Inventario')
+    ws.append([title])
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append([_cell(v) for v in row])
+    wb.save(path)
+    return path
+
+
+def write_csv(df, path):
+    """Escribe `df` como CSV UTF-8 (encabezado en la primera fila, fechas ISO)."""
+    df.to_csv(path, index=False, quoting=csv.QUOTE_MINIMAL, date_format='%Y-%m-%d')
+    return path
+
+
+def write_inventory(df, path, title='Reporte de Inventario'):
+    """Escribe `df` en el formato que indica la extensión de `path` (.xlsx o .csv)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return write_csv(df, path)
+    if ext == '.xlsx':
+        return write_workbook(df, path, title)
+    raise ValueError(f'formato no soportado: {ext}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Genera un inventario sintético (.xlsx o .csv).')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--title', default='Reporte de Inventario')
+    args = parser.parse_args()
+    write_inventory(make_inventory(args.rows, args.seed), args.output, args.title)
+    print(f'{args.output}: {args.rows:,} filas (semilla {args.seed})')
@@ -1,16 +1,25 @@
 # Gunicorn configuration file for large file uploads
 import multiprocessing
+import os
 
 # Binding
 bind = "0.0.0.0:10000"
 
-# Workers - Usar 1 porque los datos se guardan en memoria del proceso (SESSIONS dict).
-# Con >1 worker, los datos subidos en un worker no son visibles en otro.
-workers = 1
-worker_class = "sync"
+# Workers - Con SESSION_BACKEND=shared los datasets viven en /dev/shm y todos los workers los ven,
+# así que se usa un worker por core. Con el backend en memoria (por defecto) los datos subidos
+# en un worker no son visibles en otro, por lo que se mantiene 1.
+if os.environ.get('SESSION_BACKEND') == 'shared':
+    workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count())
+else:
+    workers = 1
+# Threads por worker: los requests de distintas sesiones se atienden en paralelo (el análisis usa un lock
+# por dataset, ver InventoryService.analyze_session, y numpy/pandas liberan el GIL en los cálculos pesados)
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS') or 8)
 
-# Timeouts - Aumentados para procesar archivos grandes
-timeout = 300  # 5 minutos para procesar archivos grandes
+# Timeouts - El parseo y el análisis de las subidas corren en jobs en segundo plano (ver jobs.py),
+# así que un request solo ocupa al worker mientras recibe el archivo
+timeout = 120
 graceful_timeout = 120
 keepalive = 5
 
@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import pytest
+
+# Los tests importan `app` y `benchmarks` desde la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from app.config import Config
+
+POLL_SECONDS = 0.01
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App con sesiones en memoria y archivos temporales propios del test."""
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(Config, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    monkeypatch.setattr(Config, 'SESSION_SPILL_DIR', str(tmp_path / 'spill'))
+    monkeypatch.setattr(Config, 'SESSION_BACKEND', 'memory')
+    monkeypatch.setattr(Config, 'SESSION_MEMORY_BUDGET_MB', 0)
+    monkeypatch.setattr(Config, 'JOB_WORKERS', 8)
+    return create_app('default')
+
+
+def _wait(client, job_id, stage=None):
+    """Hace polling del job hasta que termina (o llega a `stage`); falla si termina con error."""
+    while True:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        assert job['state'] != 'error', job['error']
+        if job['state'] == 'done' or job['stage'] == stage:
+            return job
+        time.sleep(POLL_SECONDS)
+
+
+def _upload_file(client, path, url='/api/upload'):
+    """Sube el archivo `path` y espera el job; retorna su resultado."""
+    with open(path, 'rb') as f:
+        response = client.post(url, data={'file': (f, os.path.basename(path))}, content_type='multipart/form-data')
+    assert response.status_code == 202, response.get_json()
+    return _wait(client, response.get_json()['job_id'])['result']
@@ -0,0 +1,63 @@
+import io
+import zipfile
+import pandas as pd
+import pytest
+from app.utils.constants import COL_ID, COL_SKU
+from benchmarks.generator import make_inventory, write_workbook
+from tests.conftest import _wait
+
+STORES = {'Centro': make_inventory(40, seed=1), 'Sur': make_inventory(25, seed=2)}
+
+
+@pytest.fixture
+def files(tmp_path):
+    for store, df in STORES.items():
+        write_workbook(df, tmp_path / f'{store}.xlsx')
+    # Sur llega dentro de un zip
+    with zipfile.ZipFile(tmp_path / 'tiendas.zip', 'w') as zf:
+        zf.write(tmp_path / 'Sur.xlsx', 'Sur.xlsx')
+    # Libro válido sin tabla de inventario (falla al parsear la hoja) y archivo que no es un Excel
+    write_workbook(pd.DataFrame({'Nota': ['sin datos']}), tmp_path / 'Vacia.xlsx', title='Reporte vacío')
+    (tmp_path / 'Rota.xlsx').write_bytes(b'esto no es un libro de Excel')
+    return [tmp_path / name for name in ('Centro.xlsx', 'tiendas.zip', 'Vacia.xlsx', 'Rota.xlsx')]
+
+
+def _bulk_upload(client, paths):
+    data = {'files': [(io.BytesIO(path.read_bytes()), path.name) for path in paths]}
+    response = client.post('/api/upload/bulk', data=data, content_type='multipart/form-data')
+    assert response.status_code == 202
+    return _wait(client, response.get_json()['job_id'])['result']
+
+
+def test_bulk_upload_merges_stores_and_skips_broken_files(app, files):
+    client = app.test_client()
+    result = _bulk_upload(client, files)
+    assert result['stores'] == ['Centro', 'Sur']
+    assert sorted(result['skipped']) == ['Rota', 'Vacia']
+    assert result['total_rows'] == sum(len(df) for df in STORES.values())
+
+    # Dataset unido: filas de cada tienda en orden, con su tienda
+    response = client.get('/api/search?limit=1000&sort=')
+    results = response.get_json()['results']
+    assert [(r['store'], r['id']) for r in results] == [
+        (store, int(i)) for store, df in STORES.items() for i in df[COL_ID]]
+
+    for store, df in STORES.items():
+        page = client.get(f'/api/search?store={store}&limit=1000').get_json()
+        assert page['total'] == len(df)
+        assert {r['store'] for r in page['results']} == {store}
+        assert [r['sku'] for r in page['results']] == df[COL_SKU].tolist()
+        kpis = client.get(f'/api/kpis?store={store}').get_json()
+        assert kpis['total_skus'] == len(df)
+
+    stores = {s['store']: s for s in client.get('/api/dashboard?panels=stores').get_json()['stores']}
+    assert {store: stores[store]['products'] for store in STORES} == {store: len(df) for store, df in STORES.items()}
+    assert client.get('/api/kpis?store=Rota').status_code == 404
+
+
+def test_bulk_upload_fails_when_no_sheet_can_be_parsed(app, files):
+    client = app.test_client()
+    data = {'files': [(io.BytesIO(path.read_bytes()), path.name) for path in files[2:]]}
+    response = client.post('/api/upload/bulk', data=data, content_type='multipart/form-data')
+    with pytest.raises(AssertionError, match='No se pudo parsear ninguna hoja'):
+        _wait(client, response.get_json()['job_id'])
@@ -0,0 +1,64 @@
+import io
+import time
+import threading
+from benchmarks.bench_concurrency import seed_snapshot
+from tests.conftest import _wait
+
+BIG_ROWS = 300_000
+SMALL_ROWS = 2_000
+SHARED_ROWS = 20_000
+SESSIONS = 6
+
+
+def _upload(client, filename, content):
+    response = client.post('/api/upload', data={'file': (io.BytesIO(content), filename)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 202
+    return response.get_json()['job_id']
+
+
+def test_small_upload_does_not_wait_for_other_analysis(app):
+    big = seed_snapshot(app.config['SNAPSHOT_DIR'], BIG_ROWS, 1)
+    small = seed_snapshot(app.config['SNAPSHOT_DIR'], SMALL_ROWS, 3)
+    a, b = app.test_client(), app.test_client()
+    finished = {}
+
+    def run_a(job_id):
+        _wait(a, job_id)
+        finished['a'] = time.perf_counter()
+
+    job_a = _upload(a, 'grande.xlsx', big)
+    _wait(a, job_a, stage='analyzing')
+    thread = threading.Thread(target=run_a, args=(job_a,))
+    thread.start()
+    _wait(b, _upload(b, 'chica.xlsx', small))
+    assert b.get('/api/kpis').status_code == 200
+    finished['b'] = time.perf_counter()
+    thread.join()
+
+    assert finished['b'] < finished['a']
+
+
+def test_same_file_is_analysed_once(app):
+    content = seed_snapshot(app.config['SNAPSHOT_DIR'], SHARED_ROWS, 2)
+    clients = [app.test_client() for _ in range(SESSIONS)]
+    before = clients[0].get('/api/memory').get_json()['datasets']
+    errors = []
+
+    def run(client):
+        try:
+            _wait(client, _upload(client, 'misma.xlsx', content))
+            assert client.get('/api/kpis').status_code == 200
+        except AssertionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    after = clients[0].get('/api/memory').get_json()['datasets']
+
+    assert errors == []
+    assert after['duplicated'] - before['duplicated'] == 0
+    assert after['built'] - before['built'] == 1
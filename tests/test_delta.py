@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.constants import COL_BRAND, COL_ID, COL_SKU, COL_STORE
+from app.services.analysis import analyze_inventory, classify_abc, update_abc
+from app.services.delta import apply_delta
+from app.services.summary import summary_totals, combine_totals
+from benchmarks.generator import make_inventory, write_workbook
+from tests.conftest import _wait
+
+ROWS = 2000
+
+
+def _with_value(delta, stock):
+    delta = delta.copy()
+    delta['Stock'] = stock
+    delta['Costo T'] = np.round(delta['Stock'] * delta['Costo U'], 2)
+    return delta
+
+
+def _merge(base, delta, key):
+    """Inventario completo tras la carga: filas del delta reemplazadas en su lugar y nuevas al final."""
+    merged = base.set_index(key)
+    delta = delta.set_index(key)
+    existing = delta.index.isin(merged.index)
+    merged.loc[delta.index[existing]] = delta[existing]
+    return pd.concat([merged, delta[~existing]]).reset_index()[base.columns]
+
+
+def _updates(base):
+    # Productos de poco valor con cambios chicos: update_abc no mueve los cortes
+    rows = np.argsort(base['Costo T'].to_numpy(), kind='stable')[ROWS // 4:ROWS // 4 + 5]
+    delta = base.iloc[rows]
+    return _with_value(delta, delta['Stock'] + 1)
+
+
+def _inserts(base):
+    delta = make_inventory(30, seed=7)
+    delta[COL_ID] = np.arange(ROWS + 1, ROWS + 31)
+    delta[COL_SKU] = [f'NEW{i:04d}' for i in range(30)]
+    delta.loc[:4, COL_BRAND] = 'Marca Nueva'
+    return delta
+
+
+def _abc_boundary(base):
+    # Un producto C pasa a ser el de más valor: se mueven los dos cortes
+    cheapest = base.iloc[[int(np.argmin(base['Costo T'].to_numpy()))]]
+    return _with_value(cheapest, [base['Stock'].max() * 1000])
+
+
+SCENARIOS = {'updates': _updates, 'inserts': _inserts, 'abc_boundary': _abc_boundary}
+
+
+def _assert_totals_equal(totals, expected):
+    assert totals.keys() == expected.keys()
+    for key, value in expected.items():
+        if key == 'groups':
+            for col, table in value.items():
+                pd.testing.assert_frame_equal(totals[key][col].sort_index(), table.sort_index(),
+                                              check_dtype=False, check_index_type=False)
+        else:
+            assert totals[key] == pytest.approx(value), key
+
+
+def _check_delta(base, delta, key):
+    df = analyze_inventory(base)
+    result = apply_delta(df, delta)
+    expected = analyze_inventory(_merge(base, delta, key))
+    # Las categorías nuevas quedan al final de las existentes en vez de ordenadas: se comparan los valores
+    pd.testing.assert_frame_equal(result['df'], expected, check_categorical=False)
+
+    # Mismos totales incrementales que usa InventoryService._store_delta
+    changed = np.concatenate((result['updated'], result['added']))
+    totals = combine_totals(summary_totals(df), summary_totals(result['df'].iloc[changed]),
+                            summary_totals(result['old_rows']))
+    _assert_totals_equal(totals, summary_totals(expected))
+    return result
+
+
+@pytest.mark.parametrize('scenario', sorted(SCENARIOS))
+def test_delta_matches_full_analysis(scenario):
+    base = make_inventory(ROWS, seed=1)
+    result = _check_delta(base, SCENARIOS[scenario](base), [COL_ID])
+    if scenario != 'inserts':
+        # 'updates' recorre el camino incremental de update_abc y 'abc_boundary' el de reclasificar todo
+        assert result['abc_recomputed'] == (scenario == 'abc_boundary')
+
+
+def test_delta_matches_full_analysis_with_stores():
+    stores = []
+    for i, store in enumerate(('Lima', 'Cusco')):
+        df = make_inventory(ROWS // 2, seed=i)
+        df[COL_STORE] = store
+        stores.append(df)
+    base = pd.concat(stores, ignore_index=True)
+    # Mismos ID en ambas tiendas: el delta de Cusco no debe tocar Lima
+    delta = _with_value(base[base[COL_STORE] == 'Cusco'].iloc[:20], 0)
+    extra = make_inventory(5, seed=9)
+    extra[COL_ID] = np.arange(ROWS, ROWS + 5)
+    extra[COL_STORE] = 'Cusco'
+    delta = pd.concat([delta, extra], ignore_index=True)
+    delta[COL_STORE] = 'cusco '
+
+    result = _check_delta(base, delta.assign(**{COL_STORE: 'Cusco'}), [COL_STORE, COL_ID])
+    assert len(result['updated']) == 20 and len(result['added']) == 5
+    pd.testing.assert_frame_equal(apply_delta(analyze_inventory(base), delta)['df'].drop(columns=COL_STORE),
+                                  result['df'].drop(columns=COL_STORE))
+
+
+def test_update_abc_matches_classify_abc():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        values = np.round(rng.lognormal(3, 1.5, 200), 2)
+        abc = classify_abc(values)
+        changed = rng.choice(len(values), rng.integers(1, 6), replace=False)
+        new_values = values.copy()
+        new_values[changed] = np.round(new_values[changed] * rng.uniform(0, 3, len(changed)), 2)
+        updated = update_abc(abc, new_values, changed)
+        if updated is not None:
+            assert list(updated) == list(classify_abc(new_values))
+
+
+def test_delta_upload_updates_dashboard_like_full_upload(app, tmp_path):
+    base = make_inventory(ROWS, seed=1)
+    delta = pd.concat([_updates(base), _inserts(base), _abc_boundary(base)], ignore_index=True)
+    write_workbook(base, tmp_path / 'base.xlsx')
+    write_workbook(delta, tmp_path / 'delta.xlsx')
+    write_workbook(_merge(base, delta, [COL_ID]), tmp_path / 'full.xlsx')
+
+    def upload(client, path, url='/api/upload'):
+        with open(path, 'rb') as f:
+            response = client.post(url, data={'file': (f, path.name)}, content_type='multipart/form-data')
+        assert response.status_code == 202
+        return _wait(client, response.get_json()['job_id'])['result']
+
+    a, b = app.test_client(), app.test_client()
+    upload(a, tmp_path / 'base.xlsx')
+    a.get('/api/dashboard')
+    result = upload(a, tmp_path / 'delta.xlsx', '/api/upload/delta')
+    assert (result['updated'], result['added']) == (6, 30)
+    upload(b, tmp_path / 'full.xlsx')
+
+    dashboards = []
+    for client in (a, b):
+        dashboard = client.get('/api/dashboard').get_json()
+        dashboard.pop('metadata')
+        dashboards.append(dashboard)
+    assert dashboards[0] == dashboards[1]
@@ -0,0 +1,46 @@
+import io
+import datetime
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from app.services import excel_reader
+from app.services.excel_reader import read_inventory_excel
+
+HEADER = ['ID', 'F. Creación', 'SKU', 'Producto', 'Categoría', 'Marca', 'Proveedor', 'Mixto', 'Flag', 'Fecha',
+          'Texto', 'Entero', 'Decimal', 'Vacía', 'Stock', 'Costo U', 'Costo T', 'Precio']
+ROWS = [
+    [1, '01/02/2024', 'SK1', 'Taza', 'Cocina', 'Alfa', 'Prov', 2, True, datetime.datetime(2024, 1, 5), 'a', 1, 1.5, None, 10, 2.5, 25, 4],
+    [2, '02/02/2024', 'SK2', 'Mesa', None, 'NA', 'Prov', None, False, datetime.datetime(2024, 1, 6, 10, 30), 'b', 2, 2.5, None, 0, 3, 0, 5],
+    [None] * 18,
+    [3, '03/02/2024', 'SK3', 'Silla', 'Hogar', '', 'Prov', True, None, None, 'c', 3, 3, None, -2, 1, -2, 0],
+    [4, None, 'SK4', 'Foco', 'Hogar', 'Beta', None, False, True, datetime.date(2024, 3, 1), None, 4, 4.5, None, 5, 1.25, 6.25, 2],
+    [5, '05/02/2024', 1234, 'Olla', 'Cocina', 'Beta', 'Prov', 'texto', False, datetime.datetime(2024, 1, 8), 'e', 5, 5, None, 3, 2, 6, 3],
+    [6, '06/02/2024', 'SK6', 'Balde', 'Cocina', '#DIV/0!', 'Prov', 7, True, datetime.datetime(2024, 1, 9), '12', 6, 6, None, 1, 1, 1, 1],
+    [None] * 18,
+    [None] * 18,
+    [7, '07/02/2024', 'SK7', 'Cable', 'Oficina', 'Gamma', 'Prov', 8, False, datetime.datetime(2024, 1, 10), 'g', 7, 7, None, 9, 1, 9, 2],
+    [None] * 18,
+]
+
+
+def _workbook():
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['Reporte de Inventario'])
+    ws.append(HEADER)
+    for row in ROWS:
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 3, 20000])
+def test_openpyxl_reader_matches_read_excel(monkeypatch, chunk_rows):
+    monkeypatch.setattr(excel_reader, 'CHUNK_ROWS', chunk_rows)
+    buf = _workbook()
+    buf.seek(0)
+    df = read_inventory_excel(buf, '.xlsx')
+    buf.seek(0)
+    expected = pd.read_excel(buf, skiprows=1)
+    pd.testing.assert_frame_equal(df, expected)
@@ -0,0 +1,88 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.constants import COL_BRAND, COL_CATEGORY, COL_CREATED, COL_PRODUCT, COL_SKU
+from app.services.analysis import analyze_inventory
+from app.services import exporter
+from app.services.exporter import SHEET_NAME
+from benchmarks.generator import make_inventory, write_workbook
+from tests.conftest import _upload_file, _wait
+
+ROWS = 2500
+# Bloques chicos: la exportación se escribe en varios (el último incompleto)
+CHUNK_ROWS = 1000
+HEADERS = ['Fecha', COL_SKU, COL_PRODUCT, COL_CATEGORY, COL_BRAND, 'Stock', 'Costo Unitario', 'Costo Total',
+           'Precio', 'Estado']
+
+
+@pytest.fixture(scope='module')
+def raw():
+    raw = make_inventory(ROWS, seed=8)
+    # Textos con separadores, comillas, saltos de línea y acentos
+    raw.loc[:4, COL_PRODUCT] = ['Taza, blanca', 'Mesa\t"plegable"', 'Silla\nnueva', 'Ñandú ü €', "+51 999 'x'"]
+    return raw
+
+
+@pytest.fixture
+def client(app, raw, tmp_path, monkeypatch):
+    monkeypatch.setattr(exporter, 'EXPORT_CHUNK_ROWS', CHUNK_ROWS)
+    client = app.test_client()
+    _upload_file(client, write_workbook(raw, tmp_path / 'tienda.xlsx'))
+    return client
+
+
+def _expected(raw, category=None, sort_by=None):
+    df = analyze_inventory(raw)
+    if category:
+        df = df[df[COL_CATEGORY] == category]
+    if sort_by:
+        df = df.sort_values(sort_by, ascending=False, kind='stable')
+    expected = df[[COL_CREATED, COL_SKU, COL_PRODUCT, COL_CATEGORY, COL_BRAND, '_stock', '_cost_u', '_cost_t',
+                   '_price', 'stock_status']].copy()
+    expected.columns = HEADERS
+    for col in (COL_CATEGORY, COL_BRAND, 'Estado'):
+        expected[col] = expected[col].astype(str)
+    expected['Stock'] = expected['Stock'].astype(np.int64)
+    return expected.reset_index(drop=True)
+
+
+def _read(body, export_format):
+    if export_format == 'xlsx':
+        df = pd.read_excel(io.BytesIO(body), sheet_name=SHEET_NAME, dtype={COL_SKU: str})
+    else:
+        df = pd.read_csv(io.BytesIO(body), sep=',' if export_format == 'csv' else '\t', encoding='utf-8-sig',
+                         dtype={COL_SKU: str, COL_PRODUCT: str}, keep_default_na=False, parse_dates=['Fecha'])
+    for col in (COL_PRODUCT, COL_CATEGORY, COL_BRAND, 'Estado'):
+        df[col] = df[col].astype(str)
+    return df
+
+
+def _assert_round_trip(body, export_format, expected):
+    exported = _read(body, export_format)
+    assert list(exported.columns) == HEADERS
+    pd.testing.assert_frame_equal(exported, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'tsv', 'xlsx'])
+def test_export_round_trip(client, raw, export_format):
+    response = client.get(f'/api/export?format={export_format}')
+    assert response.status_code == 200
+    assert f'tienda_export.{export_format}' in response.headers['Content-Disposition']
+    _assert_round_trip(response.get_data(), export_format, _expected(raw))
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'xlsx'])
+def test_filtered_sorted_async_export_round_trip(client, raw, export_format):
+    response = client.get(f'/api/export?format={export_format}&category=Hogar&sort=value_desc&async=1')
+    assert response.status_code == 202
+    job = _wait(client, response.get_json()['job_id'])
+    download = client.get(f"/api/jobs/{job['id']}/download")
+    assert download.status_code == 200
+    _assert_round_trip(download.get_data(), export_format, _expected(raw, 'Hogar', '_cost_t'))
+    # El archivo se entrega una sola vez
+    assert client.get(f"/api/jobs/{job['id']}/download").status_code == 410
+
+
+def test_export_rejects_unknown_format(client):
+    assert client.get('/api/export?format=pdf').status_code == 400
@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+from app.utils.constants import COL_BRAND, COL_CATEGORY, COL_ID, COL_SUPPLIER
+from app.services.analysis import analyze_inventory
+from app.services.excel_reader import read_inventory_excel
+from app.services.filter_index import NO_BRAND, NO_BRAND_KEYS
+from benchmarks.generator import make_inventory, write_workbook
+from tests.conftest import _upload_file
+
+COLUMNS = {'status': 'stock_status', 'category': COL_CATEGORY, 'brand': COL_BRAND, 'supplier': COL_SUPPLIER}
+
+
+@pytest.fixture
+def loaded(app, tmp_path):
+    """Cliente con el inventario cargado y el análisis de referencia del mismo libro."""
+    raw = make_inventory(1500, seed=7)
+    raw.loc[:5, COL_BRAND] = [None, '', '  ', 'nan', 'None', 'SIN MARCA']
+    raw.loc[10:12, COL_CATEGORY] = [' Hogar', 'HOGAR ', 'Hogar']
+    path = write_workbook(raw, tmp_path / 'facets.xlsx')
+
+    client = app.test_client()
+    _upload_file(client, path)
+    with open(path, 'rb') as f:
+        df = analyze_inventory(read_inventory_excel(f, '.xlsx'))
+    return client, df
+
+
+def _expected(df, param):
+    """Facet con un groupby de pandas: filas y suma de Costo T por valor normalizado, de más a menos filas."""
+    s = df[COLUMNS[param]]
+    key = s.astype(str).str.strip().str.lower().where(s.notna(), '')
+    if param == 'brand':
+        key = key.mask(key.isin(NO_BRAND_KEYS), NO_BRAND)
+    groups = df.assign(_key=key, _label=s.astype(str).str.strip()).groupby('_key', sort=False)
+    facet = [(NO_BRAND if k == NO_BRAND else g['_label'].iloc[0], len(g), round(float(g['_cost_t'].sum()), 2))
+             for k, g in groups if k != '']
+    return sorted(facet, key=lambda item: (-item[1], item[0]))
+
+
+def _facets(client, **params):
+    response = client.get('/api/facets', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def _check(body, df, filters):
+    selected = _select(df, filters)
+    assert body['total'] == len(selected)
+    assert body['value'] == pytest.approx(round(float(selected['_cost_t'].sum()), 2))
+    for param in COLUMNS:
+        # El facet de un filtro activo se cuenta sin ese filtro
+        others = _select(df, {p: v for p, v in filters.items() if p != param})
+        got = [(item[param], item['count'], item['value']) for item in body['facets'][param]]
+        expected = _expected(others, param)
+        assert [g[:2] for g in got] == [e[:2] for e in expected], param
+        assert [g[2] for g in got] == pytest.approx([e[2] for e in expected], abs=0.011), param
+
+
+def _select(df, filters):
+    mask = pd.Series(True, index=df.index)
+    for param, value in filters.items():
+        s = df[COLUMNS[param]]
+        key = s.astype(str).str.strip().str.lower().where(s.notna(), '')
+        mask &= key.isin(NO_BRAND_KEYS) if param == 'brand' and value == NO_BRAND else key == value.strip().lower()
+    return df[mask.to_numpy()]
+
+
+def test_facets_match_groupby(loaded):
+    client, df = loaded
+    body = _facets(client)
+    assert 'store' not in body['facets']
+    assert any(item['brand'] == NO_BRAND for item in body['facets']['brand'])
+    hogar = [item for item in body['facets']['category'] if item['category'].lower() == 'hogar']
+    assert len(hogar) == 1
+    _check(body, df, {})
+
+
+@pytest.mark.parametrize('filters', [
+    {'status': 'critical'},
+    {'category': 'hogar '},
+    {'brand': NO_BRAND},
+    {'status': 'low', 'category': 'Hogar'},
+    {'category': 'No existe'},
+])
+def test_facets_with_filters_match_groupby(loaded, filters):
+    client, df = loaded
+    _check(_facets(client, **filters), df, filters)
+
+
+def test_facets_with_search_query(loaded):
+    client, df = loaded
+    for q, match in (('taza', 'contains'), ('sk00001', 'prefix')):
+        ids = {r['id'] for r in client.get('/api/search', query_string={
+            'q': q, 'match': match, 'limit': 5000}).get_json()['results']}
+        assert ids
+        body = _facets(client, q=q, match=match, status='critical')
+        hits = df[df[COL_ID].astype(int).isin(ids)]
+        critical = _select(hits, {'status': 'critical'})
+        assert body['total'] == len(critical)
+        assert body['value'] == pytest.approx(round(float(critical['_cost_t'].sum()), 2))
+        assert [(i['status'], i['count']) for i in body['facets']['status']] == \
+            [e[:2] for e in _expected(hits, 'status')]
+        assert [(i['brand'], i['count']) for i in body['facets']['brand']] == \
+            [e[:2] for e in _expected(critical, 'brand')]
+
+
+def test_facets_reject_bad_match(loaded):
+    client, _ = loaded
+    assert client.get('/api/facets?q=taza&match=regex').status_code == 400
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.constants import COL_BRAND, COL_CATEGORY, COL_SUPPLIER
+from app.services.analysis import analyze_inventory
+from app.services.filter_index import FilterIndex, NO_BRAND
+from benchmarks.generator import make_inventory
+
+# Marcas sin valor tal como llegan del Excel y como quedan tras el análisis
+BLANK_BRANDS = [None, '', '  ', 'nan', 'NaN', 'None', 'SIN MARCA', np.nan]
+
+
+@pytest.fixture(scope='module', params=['raw', 'analyzed'])
+def df(request):
+    raw = make_inventory(2000, seed=5)
+    raw.loc[:len(BLANK_BRANDS) - 1, COL_BRAND] = BLANK_BRANDS
+    # Mismo valor con distinto formato: el filtro no distingue mayúsculas ni espacios en los extremos
+    raw.loc[20:22, COL_CATEGORY] = [' hogar', 'HOGAR ', 'Hogar']
+    return raw if request.param == 'raw' else analyze_inventory(raw)
+
+
+def _key(s):
+    return s.astype(str).str.strip().str.lower().where(s.notna(), '')
+
+
+def _pandas_mask(df, filters):
+    """Filtros de /api/search con máscaras booleanas de pandas."""
+    mask = pd.Series(True, index=df.index)
+    for param, value in filters.items():
+        if not value:
+            continue
+        if param == 'status':
+            mask &= _key(df['stock_status']) == value.lower()
+        elif param == 'brand' and value == NO_BRAND:
+            mask &= _key(df[COL_BRAND]).isin(['', 'nan', 'none', 'sin marca'])
+        else:
+            col = {'category': COL_CATEGORY, 'brand': COL_BRAND, 'supplier': COL_SUPPLIER}.get(param)
+            mask &= (_key(df[col]) == value.strip().lower()) if col in df.columns else False
+    return mask.to_numpy()
+
+
+def _cases(df):
+    category = df[COL_CATEGORY].dropna().iloc[100]
+    brand = df[COL_BRAND].dropna().iloc[100]
+    supplier = df[COL_SUPPLIER].dropna().iloc[100]
+    cases = [
+        {},
+        {'category': 'Hogar'},
+        {'category': ' hogar '},
+        {'category': 'No existe'},
+        {'brand': NO_BRAND},
+        {'brand': str(brand).upper()},
+        {'brand': NO_BRAND, 'category': 'Hogar'},
+        {'category': str(category), 'brand': str(brand)},
+        {'category': str(category), 'supplier': str(supplier)},
+        {'category': str(category), 'brand': str(brand), 'supplier': str(supplier)},
+        {'store': 'Cusco'},
+        {'category': 'Hogar', 'store': 'Cusco'},
+    ]
+    if 'stock_status' in df.columns:
+        cases += [{'status': 'critical'}, {'status': 'low', 'category': 'Hogar'},
+                  {'status': 'out_of_stock', 'brand': NO_BRAND}, {'status': 'no_existe'}]
+    return cases
+
+
+def test_mask_matches_pandas_filters(df):
+    index = FilterIndex(df)
+    for filters in _cases(df):
+        expected = _pandas_mask(df, filters) if 'store' not in filters else np.zeros(len(df), dtype=bool)
+        np.testing.assert_array_equal(index.mask(filters), expected, err_msg=str(filters))
+        rows = index.select(filters)
+        if filters:
+            np.testing.assert_array_equal(rows, np.flatnonzero(expected))
+        else:
+            assert rows is None
+
+
+def test_brand_values(df):
+    index = FilterIndex(df)
+    keys = _key(df[COL_BRAND])
+    labels = df[COL_BRAND][~keys.isin(['', 'nan', 'none', 'sin marca'])].astype(str).str.strip()
+    assert index.values('brand') == sorted(labels.unique()) + [NO_BRAND]
+
+    rows = index.select({'category': 'Hogar'})
+    in_category = labels[_key(df[COL_CATEGORY]).loc[labels.index] == 'hogar']
+    expected = sorted(in_category.unique())
+    if keys.iloc[rows].isin(['', 'nan', 'none', 'sin marca']).any():
+        expected.append(NO_BRAND)
+    assert index.values('brand', rows) == expected
@@ -0,0 +1,81 @@
+import gzip
+import json
+import zlib
+from types import SimpleNamespace
+import pytest
+from app.utils import compression
+from benchmarks.generator import make_inventory, write_workbook
+from tests.conftest import _upload_file
+
+
+@pytest.fixture
+def client(app, tmp_path):
+    client = app.test_client()
+    _upload_file(client, write_workbook(make_inventory(300, seed=1), tmp_path / 'tienda.xlsx'))
+    return client
+
+
+def test_matching_etag_returns_304(client):
+    response = client.get('/api/dashboard')
+    etag = response.headers['ETag']
+    assert response.status_code == 200 and etag.startswith('W/"')
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    for url in ('/api/dashboard', '/api/kpis', '/api/search?q=taza'):
+        cached = client.get(url, headers={'If-None-Match': etag})
+        assert cached.status_code == 304, url
+        assert cached.get_data() == b''
+        assert cached.headers['ETag'] == etag
+
+    assert client.get('/api/dashboard', headers={'If-None-Match': 'W/"otra"'}).status_code == 200
+
+
+def test_new_upload_changes_etag(client, tmp_path):
+    etag = client.get('/api/dashboard').headers['ETag']
+    _upload_file(client, write_workbook(make_inventory(200, seed=2), tmp_path / 'otra.xlsx'))
+
+    response = client.get('/api/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['kpis']['total_skus'] == 200
+
+
+def test_responses_are_compressed_per_accept_encoding(client, monkeypatch):
+    plain = client.get('/api/dashboard', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    body = plain.get_data()
+
+    gzipped = client.get('/api/dashboard', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gzipped.get_data()) == body
+    assert len(gzipped.get_data()) < len(body)
+
+    # Sin brotli instalado se ofrece solo gzip
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert client.get('/api/dashboard', headers={'Accept-Encoding': 'br'}).headers.get('Content-Encoding') is None
+    assert client.get('/api/dashboard', headers={'Accept-Encoding': 'br, gzip'}).headers['Content-Encoding'] == 'gzip'
+
+    # Con brotli se prefiere br (el compresor real es opcional: acá basta con uno que se pueda invertir)
+    monkeypatch.setattr(compression, 'brotli', SimpleNamespace(compress=lambda data, quality: zlib.compress(data)))
+    br = client.get('/api/dashboard', headers={'Accept-Encoding': 'gzip, deflate, br'})
+    assert br.headers['Content-Encoding'] == 'br'
+    assert zlib.decompress(br.get_data()) == body
+    # La preferencia del cliente manda sobre la del servidor
+    weighted = client.get('/api/dashboard', headers={'Accept-Encoding': 'br;q=0.5, gzip'})
+    assert weighted.headers['Content-Encoding'] == 'gzip'
+
+
+def test_small_304_and_streamed_responses_are_not_compressed(client):
+    small = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert len(small.get_data()) < 1024
+    assert 'Content-Encoding' not in small.headers
+    json.loads(small.get_data())
+
+    etag = client.get('/api/dashboard').headers['ETag']
+    cached = client.get('/api/dashboard', headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+    assert cached.status_code == 304 and 'Content-Encoding' not in cached.headers
+
+    export = client.get('/api/export?format=csv', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in export.headers
+    assert export.get_data().startswith('\ufeff'.encode('utf-8'))
@@ -0,0 +1,88 @@
+import json
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.services.analysis import analyze_inventory, DEFAULT_STOCK_THRESHOLDS
+from app.services import summary as summary_builder
+from app.services.serializers import products_to_records
+from app.utils import json_provider
+from app.utils.json_provider import dumps_bytes, NumpyJSONProvider
+from benchmarks.generator import make_inventory
+
+
+def _native(obj):
+    """`obj` con tipos de Python, como lo armaban los endpoints para el encoder anterior (NaN -> None)."""
+    if isinstance(obj, dict):
+        return {str(k): _native(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, np.ndarray)):
+        return [_native(v) for v in obj]
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+
+def _previous(obj):
+    """JSON del proveedor por defecto de Flask (el encoder anterior) para el mismo contenido."""
+    return DefaultJSONProvider(Flask(__name__)).dumps(_native(obj))
+
+
+def _pairs(body):
+    # Pares en orden: compara también el orden de las claves
+    return json.loads(body, object_pairs_hook=list)
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def encoder(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    elif json_provider.orjson is None:
+        pytest.skip('orjson no está instalado')
+    return request.param
+
+
+def _payloads():
+    df = analyze_inventory(make_inventory(300, seed=4))
+    summary = {k: v for k, v in summary_builder.build_summary(df, DEFAULT_STOCK_THRESHOLDS).items()
+               if not k.startswith('_')}
+    return {
+        'summary': summary,
+        'search': {'results': products_to_records(df.iloc[:50], include_price=True), 'total': np.int64(len(df))},
+        'numpy': {
+            'int64': np.int64(2 ** 40), 'int32': np.int32(-7), 'uint8': np.uint8(255), 'bool': np.bool_(True),
+            'float': np.float64(1.25), 'float32': np.float32(0.5), 'nan': np.float64('nan'), 'py_nan': float('nan'),
+            'inf': np.float32('inf'),
+            'array': np.array([1, 2, 3], dtype=np.int64), 'floats': np.array([0.5, np.nan, -np.inf]),
+            'nested': [{'b': np.int16(1), 'a': None}], 'text': 'Ñandú ü €',
+        },
+    }
+
+
+@pytest.mark.parametrize('name', ['summary', 'search', 'numpy'])
+def test_matches_previous_encoder(encoder, name):
+    obj = _payloads()[name]
+    assert _pairs(dumps_bytes(obj)) == _pairs(_previous(obj))
+
+
+def test_nan_and_missing_values_become_null(encoder):
+    body = dumps_bytes({'a': np.nan, 'b': pd.NaT, 'c': pd.NA, 'd': (np.float64('nan'), 1, float('inf'))})
+    assert 'NaN' not in body.decode() and 'Infinity' not in body.decode()
+    assert json.loads(body) == {'a': None, 'b': None, 'c': None, 'd': [None, 1, None]}
+
+
+def test_fallback_provider_writes_null_for_nan():
+    provider = NumpyJSONProvider(Flask(__name__))
+    body = provider.dumps({'x': np.float64('nan'), 'y': [np.array([np.nan, 2.0])]})
+    assert json.loads(body) == {'x': None, 'y': [[None, 2.0]]}
+
+
+def test_app_responses_use_the_provider(app):
+    with app.test_request_context():
+        response = app.json.response({'n': np.int64(3), 'x': np.float64('nan'), 'z': 1, 'a': [np.int32(1)]})
+    assert response.mimetype == 'application/json'
+    assert response.get_data() == dumps_bytes({'a': [1], 'n': 3, 'x': None, 'z': 1})
+    assert app.json.loads(response.get_data()) == {'a': [1], 'n': 3, 'x': None, 'z': 1}
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from app.services.query_cache import ENTRY_OVERHEAD, QueryCache
+from benchmarks.generator import make_inventory, write_workbook
+from tests.conftest import _upload_file
+
+
+def _rows(n):
+    return np.arange(n, dtype=np.int32)
+
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = QueryCache(max_entries=2)
+    a = cache.put('a', _rows(1))
+    cache.put('b', _rows(2))
+    assert cache.get('a') is a  # 'a' pasa a ser la más reciente
+    c = cache.put('c', _rows(3))
+    assert cache.get('b') is None
+    assert cache.get('a') is a and cache.get('c') is c
+    assert cache.stats()['evicted'] == 1
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (3, 1)
+
+
+def test_byte_budget_evicts_and_skips_oversized_results():
+    entry = _rows(1000).nbytes + ENTRY_OVERHEAD
+    cache = QueryCache(max_entries=100, max_bytes=2 * entry)
+    cache.put('a', _rows(1000))
+    cache.put('b', _rows(1000))
+    cache.put('c', _rows(1000))
+    assert cache.get('a') is None and cache.get('b') is not None
+    assert cache.stats()['bytes'] == 2 * entry
+
+    # No entra en el presupuesto: se devuelve pero no se guarda ni desaloja a las demás
+    big = cache.put('big', _rows(3000))
+    assert not big.flags.writeable
+    assert cache.get('big') is None and cache.stats()['entries'] == 2
+
+    # Reemplazar una clave no cuenta sus bytes dos veces
+    cache.put('b', _rows(10))
+    assert cache.stats()['bytes'] == entry + _rows(10).nbytes + ENTRY_OVERHEAD
+
+
+@pytest.mark.parametrize('limits', [(0, 1024), (10, 0)])
+def test_disabled_cache_stores_nothing(limits):
+    cache = QueryCache(*limits)
+    assert not cache.enabled
+    rows = cache.put('a', _rows(5))
+    assert not rows.flags.writeable
+    assert cache.get('a') is None
+
+
+def _query_stats():
+    from app.services.inventory_service import InventoryService
+    return InventoryService.memory_report()['query_cache']
+
+
+def test_search_results_follow_data_version(app, tmp_path):
+    client = app.test_client()
+    base = make_inventory(400, seed=1)
+    _upload_file(client, write_workbook(base, tmp_path / 'base.xlsx'))
+
+    def critical():
+        """Total de la búsqueda (caché de consultas) y del resumen (sin caché) para los productos críticos."""
+        search = client.get('/api/search?status=critical&sort=value_desc').get_json()['total']
+        return search, client.get('/api/kpis').get_json()['alerts']['critical']
+
+    first = critical()
+    hits = _query_stats()['hits']
+    assert critical() == first and first[0] == first[1]
+    assert _query_stats()['hits'] == hits + 1
+
+    # Carga delta: otra versión de la sesión, la misma consulta ya no usa el resultado anterior
+    delta = base[base['Stock'] > 50].head(10).copy()
+    delta['Stock'] = 1
+    delta['Costo T'] = delta['Costo U']
+    _upload_file(client, write_workbook(delta, tmp_path / 'delta.xlsx'), '/api/upload/delta')
+    after_delta = critical()
+    assert after_delta[0] == after_delta[1] == first[0] + 10
+
+    # Inventario nuevo completo
+    _upload_file(client, write_workbook(make_inventory(150, seed=2), tmp_path / 'otra.xlsx'))
+    after_upload = critical()
+    assert after_upload[0] == after_upload[1] != after_delta[0]
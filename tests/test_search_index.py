@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from app.utils.constants import COL_BRAND, COL_CATEGORY, COL_PRODUCT, COL_SKU
+from app.services.analysis import analyze_inventory
+from app.services.search_index import SearchIndex
+from benchmarks.generator import make_inventory
+
+QUERIES = [
+    'a', 'ta', 'á', 'ñ', 'lá', 'LÁ', 'lámpara', 'LÁMPARA', 'taza blanco', 'año', 'ÑANDÚ', 'cción',
+    'sk00001', 'SK0000042', 'hogar', 'sin marca', 'sin categoría', 'nova', ' ', 'zzz', 'x' * 40,
+]
+
+
+@pytest.fixture(scope='module')
+def analyzed():
+    raw = make_inventory(3000, seed=3)
+    # Textos con acentos y eñes que no genera el generador
+    raw.loc[:4, COL_PRODUCT] = ['Ñandú de peluche', 'Árbol de Navidad', 'Año nuevo kit', 'PIÑA colada', None]
+    raw.loc[:4, COL_CATEGORY] = ['Decoración', 'Decoración', None, '', 'Acción']
+    raw.loc[:4, COL_BRAND] = ['Ñuñoa', '', None, 'nan', 'Él']
+    return analyze_inventory(raw)
+
+
+def _linear_scan(df, query):
+    """Filtro de texto de /api/search antes del índice."""
+    mask = np.zeros(len(df), dtype=bool)
+    for col in (COL_PRODUCT, COL_SKU, COL_CATEGORY, COL_BRAND):
+        mask |= df[col].astype(str).str.contains(query, case=False, regex=False, na=False).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_contains_matches_linear_scan(analyzed, query):
+    index = SearchIndex(analyzed)
+    np.testing.assert_array_equal(index.mask(query), _linear_scan(analyzed, query))
+
+
+def test_prefix_and_sku_match_string_comparison(analyzed):
+    index = SearchIndex(analyzed)
+    product = analyzed[COL_PRODUCT].astype(str).str.lower()
+    sku = analyzed[COL_SKU].astype(str).str.lower()
+    for query in ('sk00001', 'SK0000042', 'ñan', 'lámpara', 'z'):
+        expected = (sku.str.startswith(query.lower()) | product.str.startswith(query.lower())).to_numpy()
+        np.testing.assert_array_equal(index.mask(query, 'prefix'), expected)
+    for query in ('SK0000042', 'sk0000042', 'sk000004'):
+        np.testing.assert_array_equal(index.mask(query, 'sku'), (sku == query.lower()).to_numpy())
+
+
+def test_empty_frame():
+    df = analyze_inventory(make_inventory(0))
+    index = SearchIndex(df)
+    assert len(index.mask('taza')) == 0
+    assert len(index.mask('ta')) == 0
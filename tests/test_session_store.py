@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import gc
+import uuid
+import pandas as pd
+import pyarrow as pa
+from app.services.session_store import MemorySessionStore, SharedSessionStore
+
+
+def _frame(n=50):
+    return pd.DataFrame({'ID': range(n), 'Producto': [f'p{i}' for i in range(n)], 'Stock': [1.5] * n})
+
+
+def _save_session(store, user_id, dataset_key=None):
+    user_data = store.get(user_id)
+    user_data['inventory_data'] = _frame()
+    user_data['dataset_key'] = dataset_key
+    user_data['version'] = uuid.uuid4().hex
+    store.save(user_data)
+    return user_data
+
+
+def _index(base_dir):
+    with open(os.path.join(base_dir, 'index.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_shared_store_expires_index_entries_and_files(tmp_path):
+    store = SharedSessionStore(str(tmp_path), ttl=0.5)
+    for i in range(5):
+        _save_session(store, f'user{i}')
+    assert len(_index(tmp_path)) == 5
+    assert len(os.listdir(tmp_path / 'data')) == 5
+
+    time.sleep(0.8)
+    store.get('other')
+    assert _index(tmp_path) == {}
+    assert os.listdir(tmp_path / 'data') == []
+
+
+def test_shared_store_does_not_reopen_expired_session(tmp_path):
+    writer = SharedSessionStore(str(tmp_path), ttl=0.5)
+    _save_session(writer, 'user')
+
+    time.sleep(0.8)
+    # Otro worker (sin copia local) no debe revivirla desde el índice
+    reader = SharedSessionStore(str(tmp_path), ttl=0.5)
+    user_data = reader.get('user')
+    assert user_data['inventory_data'] is None
+    assert user_data['version'] is None
+    assert writer.get('user')['inventory_data'] is None
+
+
+def test_shared_store_keeps_content_file_while_in_use(tmp_path):
+    store = SharedSessionStore(str(tmp_path), ttl=0.5)
+    _save_session(store, 'old', dataset_key='content')
+    time.sleep(0.8)
+    _save_session(store, 'new', dataset_key='content')
+    store._last_index_sweep = 0
+    store.get('new')
+    assert list(_index(tmp_path)) == ['new']
+    assert os.listdir(tmp_path / 'data') == ['content.arrow']
+
+
+def test_shared_store_keeps_sessions_in_use(tmp_path):
+    store = SharedSessionStore(str(tmp_path), ttl=0.5)
+    _save_session(store, 'user')
+    for _ in range(8):
+        time.sleep(0.2)
+        assert store.get('user')['inventory_data'] is not None
+    assert 'user' in _index(tmp_path)
+
+
+def test_new_store_keeps_spill_files_of_live_processes(tmp_path):
+    spill_dir = tmp_path / 'spill'
+    live = MemorySessionStore(spill_dir=str(spill_dir))
+    user_data = live.get('user')
+    user_data['inventory_data'] = _frame()
+    user_data['version'] = uuid.uuid4().hex
+    path = live._spill('user', user_data)
+    dead = spill_dir / '999999999'
+    dead.mkdir()
+    (dead / 'old.arrow').write_bytes(b'')
+
+    # Otro proceso (o el pool de parseo que reimporta la app) crea su store sobre el mismo directorio
+    MemorySessionStore(spill_dir=str(spill_dir))
+    assert os.path.exists(path)
+    assert not dead.exists()
+
+
+def test_shared_store_maps_numeric_columns_without_copy(tmp_path):
+    writer = SharedSessionStore(str(tmp_path))
+    user_data = writer.get('user')
+    # Más filas que un record batch por defecto de Feather y dos columnas float del mismo bloque
+    n = 70000
+    user_data['inventory_data'] = pd.DataFrame({'ID': range(n), 'Stock': [1.5] * n, 'Costo U': [2.0] * n})
+    user_data['version'] = uuid.uuid4().hex
+    writer.save(user_data)
+
+    # Otro worker: abre el archivo compartido en vez de recibir el frame en memoria
+    reader = SharedSessionStore(str(tmp_path))
+    allocated = pa.total_allocated_bytes()
+    df = reader.get('user')['inventory_data']
+    gc.collect()
+    assert pa.total_allocated_bytes() - allocated < n
+    pd.testing.assert_frame_equal(df, user_data['inventory_data'])
+
+
+def test_memory_store_job_state_is_a_snapshot():
+    store = MemorySessionStore()
+    job = {'id': 'job1', 'state': 'running', 'detail': {'rows': 10}, 'finished': None}
+    store.save_job(job)
+    # El worker sigue actualizando `detail` entre reportes: lo guardado no cambia
+    job['detail']['rows'] = 20
+    assert store.load_job('job1')['detail'] == {'rows': 10}
+
+    loaded = store.load_job('job1')
+    loaded['detail']['rows'] = 30
+    assert store.load_job('job1')['detail'] == {'rows': 10}
@@ -0,0 +1,62 @@
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.sort_index import SORT_KEYS, SortIndex, parse_sort
+
+ROWS = 3000
+
+
+@pytest.fixture(scope='module')
+def df():
+    rng = np.random.default_rng(11)
+    # Pocos valores distintos (muchos empates) y nulos en cada clave
+    stock = rng.integers(-3, 8, ROWS).astype(np.float64)
+    stock[rng.random(ROWS) < 0.05] = np.nan
+    cost = np.round(rng.choice([0.0, 1.5, 2.25, 10.0, 99.9], ROWS) * rng.integers(1, 4, ROWS), 2)
+    cost[rng.random(ROWS) < 0.05] = np.nan
+    created = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 30, ROWS), unit='D')
+    created = pd.Series(created).where(rng.random(ROWS) >= 0.05)
+    return pd.DataFrame({'_stock': stock, '_cost_t': cost, '_created': created})
+
+
+def _expected(df, mask, sort_keys):
+    """Posiciones de las filas seleccionadas según sort_values estable (nulos al final)."""
+    selected = df[mask].assign(_pos=np.flatnonzero(mask))
+    if sort_keys:
+        selected = selected.sort_values([SORT_KEYS[k] for k, _ in sort_keys],
+                                         ascending=[asc for _, asc in sort_keys], kind='stable', na_position='last')
+    return selected['_pos'].to_numpy()
+
+
+def _sort_cases():
+    cases = [[]]
+    for n in (1, 2, 3):
+        for keys in itertools.permutations(SORT_KEYS, n):
+            for directions in itertools.product((True, False), repeat=n):
+                cases.append(list(zip(keys, directions)))
+    return cases
+
+
+@pytest.mark.parametrize('sort_keys', _sort_cases(), ids=str)
+def test_order_matches_stable_sort_values(df, sort_keys):
+    index = SortIndex(df)
+    mask = np.random.default_rng(len(sort_keys)).random(ROWS) < 0.6
+    for m in (mask, np.ones(ROWS, dtype=bool), np.zeros(ROWS, dtype=bool)):
+        np.testing.assert_array_equal(index.order(m, sort_keys), _expected(df, m, sort_keys))
+
+
+def test_lexsort_fallback_matches_stable_sort_values(df, monkeypatch):
+    index = SortIndex(df)
+    # Sin lugar para la clave int64 compuesta: orden lexicográfico
+    monkeypatch.setattr(index, '_composite', lambda rows, sort_keys: None)
+    mask = np.random.default_rng(0).random(ROWS) < 0.6
+    sort_keys = [('stock', False), ('date', True), ('value', False)]
+    np.testing.assert_array_equal(index.order(mask, sort_keys), _expected(df, mask, sort_keys))
+
+
+def test_parse_sort():
+    keys = ('stock', 'value')
+    assert parse_sort('value_desc, stock_asc', keys) == [('value', False), ('stock', True)]
+    assert parse_sort('date_desc,value_up,,stock_desc', keys) == [('stock', False)]
+    assert parse_sort('', keys) == []